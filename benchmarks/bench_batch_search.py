@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Batched Search Throughput Benchmark
+
+Compares answering N queries with N sequential search_definitions calls
+against one search_definitions_batch call (one embedding call, one
+nearest-neighbour lookup), for each search engine. Both must return the
+same results in the same order.
+Usage: python benchmarks/bench_batch_search.py [--db-path ./vector_db] [--batch-sizes 1 8 32 64]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from definition_chunker import SEARCH_ENGINES, DefinitionChunker
+
+SAMPLE_QUERIES = [
+    "What law established PRMSU?",
+    "What are the four types of cross enrolment?",
+    "How many units can I take during midyear?",
+    "What is the consequence of 20% absence?",
+    "What is the prescribed uniform for male students?",
+    "What GWA do graduating students need for honors?",
+    "What are the admission requirements?",
+    "What is the grading system?",
+    "What is the vision statement of the university?",
+    "How do I apply for a scholarship?",
+    "What happens if I fail a subject twice?",
+    "Can I shift to another program?",
+    "What is the policy on cheating during exams?",
+    "How do I request a leave of absence?",
+    "Who can become a student assistant?",
+    "What are the penalties for bringing liquor on campus?",
+]
+
+
+def same_results(first, second, tolerance: float = 1e-3) -> bool:
+    """Same documents at the same distances; duplicate chunks tie, so their order is ignored."""
+    if len(first) != len(second):
+        return False
+    first = sorted((r['distance'], r['document']) for r in first)
+    second = sorted((r['distance'], r['document']) for r in second)
+    return all(a_doc == b_doc and abs(a_dist - b_dist) < tolerance
+               for (a_dist, a_doc), (b_dist, b_doc) in zip(first, second))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sequential vs. batched vector search")
+    parser.add_argument("--db-path", default="./vector_db", help="Path to vector database")
+    parser.add_argument("--collection", default="definitions", help="Collection name")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per batch size")
+    args = parser.parse_args()
+
+    print(f"{'engine':>8} {'batch':>6} {'sequential q/s':>15} {'batched q/s':>12} {'speedup':>8}")
+    for engine in SEARCH_ENGINES:
+        chunker = DefinitionChunker(db_path=args.db_path, collection_name=args.collection, search_engine=engine)
+        for size in args.batch_sizes:
+            queries = [SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)] + ("" if i < len(SAMPLE_QUERIES) else f" ({i})")
+                       for i in range(size)]
+
+            sequential = [chunker.search_definitions(query, n_results=args.k) for query in queries]
+            batched = chunker.search_definitions_batch(queries, n_results=args.k)
+            assert all(map(same_results, sequential, batched)), f"{engine}: batch results differ"
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for query in queries:
+                    chunker.search_definitions(query, n_results=args.k)
+            sequential_qps = size * args.repeat / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                chunker.search_definitions_batch(queries, n_results=args.k)
+            batched_qps = size * args.repeat / (time.perf_counter() - start)
+
+            print(f"{engine:>8} {size:>6} {sequential_qps:>15.1f} {batched_qps:>12.1f} "
+                  f"{batched_qps / sequential_qps:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
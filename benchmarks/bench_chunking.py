@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Chunking Throughput Benchmark
+
+Generates synthetic handbook text of a given size in each input format and
+runs every chunking mode over it, both on the whole string (chunk_by_*) and
+streamed from a file (iter_chunks_by_*). Reports chunks/second and peak
+traced memory, and a digest of the chunk output: the string and streaming
+variants must agree, and digests can be compared with an earlier results
+file to catch chunking changes hidden inside an optimization.
+Usage: python benchmarks/bench_chunking.py [--size-mb 4] [--output chunking.json] [--compare old.json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from definition_chunker import DefinitionChunker
+
+EXAMPLE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "example_definitions.txt")
+
+# No word contains "end", so the blank-line formats aren't taken over by the end-marker parser
+WORDS = ("student", "university", "course", "grade", "policy", "semester", "campus", "office", "library",
+         "program", "faculty", "credit", "unit", "class", "record", "form", "fee", "rule", "board", "council",
+         "honor", "scholar", "degree", "subject", "schedule", "exam", "permit", "dean", "registrar", "college")
+
+MODES = ("end_markers", "definitions", "sections")
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def gen_end_markers(rng: random.Random, n: int) -> str:
+    """TERM - definition sections closed by 'end' lines (the handbook format)."""
+    return "\nend\n".join(
+        f"{sentence(rng, 3)[:-1].upper()} {n} - {sentence(rng, 12)}\n{sentence(rng, 15)}" for n in range(n)
+    ) + "\nend\n"
+
+
+def gen_definitions(rng: random.Random, n: int) -> str:
+    """Blank-line separated 'Term: definition' and 'Term - definition' blocks."""
+    return "\n\n".join(
+        f"{sentence(rng, 2)[:-1]} {n}{':' if n % 2 else ' -'} {sentence(rng, 14)}\n{sentence(rng, 10)}"
+        for n in range(n)
+    ) + "\n"
+
+
+def gen_sections(rng: random.Random, n: int) -> str:
+    """Capitalized headings with numbered items, as in the student handbook."""
+    parts = []
+    for n in range(n):
+        items = "\n".join(f"{i}. {sentence(rng, 8)}\n{sentence(rng, 6)}" for i in range(1, rng.randint(2, 6)))
+        parts.append(f"{sentence(rng, 3)[:-1].upper()} {n}:\n{items}\n")
+    return "\n".join(parts)
+
+
+def gen_example(rng: random.Random, n: int) -> str:
+    """example_definitions.txt repeated with numbered headings, so chunks stay distinct."""
+    with open(EXAMPLE_FILE, "r", encoding="utf-8") as f:
+        text = f.read()
+    return "\n\n".join(text.replace("REQUIREMENTS:", f"REQUIREMENTS {n}:") for n in range(n)) + "\n"
+
+
+FORMATS: Dict[str, Callable[[random.Random, int], str]] = {
+    "end_markers": gen_end_markers,
+    "definitions": gen_definitions,
+    "sections": gen_sections,
+    "example": gen_example,
+}
+
+
+def generate(name: str, size_bytes: int, seed: int) -> str:
+    """Synthetic text of about `size_bytes`, scaled from a sample of the format."""
+    sample = FORMATS[name](random.Random(seed), 20)
+    repeats = max(1, round(20 * size_bytes / len(sample)))
+    return FORMATS[name](random.Random(seed), repeats)
+
+
+def digest(chunks: Iterable[Dict]) -> Dict:
+    """Count and sha256 of the chunk output, order included."""
+    sha = hashlib.sha256()
+    count = 0
+    for chunk in chunks:
+        sha.update(json.dumps(chunk, sort_keys=True).encode("utf-8"))
+        count += 1
+    return {"chunks": count, "digest": sha.hexdigest()}
+
+
+def run_mode(mode: str, variant: str, text: str, path: str) -> Iterable[Dict]:
+    """Chunks of one mode, from the string or streamed from the file."""
+    if variant == "string":
+        return getattr(DefinitionChunker, f"chunk_by_{mode}")(text)
+
+    def stream():
+        with open(path, "r", encoding="utf-8") as f:
+            yield from getattr(DefinitionChunker, f"iter_chunks_by_{mode}")(f)
+    return stream()
+
+
+def measure(mode: str, variant: str, text: str, path: str, repeat: int) -> Dict:
+    """Best-of-`repeat` throughput, then one traced run for peak memory."""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = sum(1 for _ in run_mode(mode, variant, text, path))
+        seconds.append(time.perf_counter() - start)
+
+    # The string variant's input is already in memory; only chunking itself is traced
+    tracemalloc.start()
+    output = digest(run_mode(mode, variant, text, path))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    best = min(seconds)
+    return {
+        "mode": mode,
+        "variant": variant,
+        "seconds": round(best, 4),
+        "chunks_per_sec": round(count / best, 1) if best else 0.0,
+        "mb_per_sec": round(len(text.encode("utf-8")) / 1e6 / best, 2) if best else 0.0,
+        "peak_mb": round(peak / 1e6, 2),
+        **output
+    }
+
+
+def compare(results: List[Dict], baseline_path: str) -> List[str]:
+    """Mismatched digests against an earlier results file with the same sizes and seed."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if (baseline.get("size_mb"), baseline.get("seed")) != (results[0]["size_mb"], results[0]["seed"]):
+        return [f"{baseline_path} was run with a different --size-mb/--seed, digests not comparable"]
+    previous = {(r["format"], r["mode"], r["variant"]): r["digest"] for r in baseline["results"]}
+    return [
+        f"{r['format']}/{r['mode']}/{r['variant']}: output changed since {baseline_path}"
+        for r in results
+        if (r["format"], r["mode"], r["variant"]) in previous
+        and previous[(r["format"], r["mode"], r["variant"])] != r["digest"]
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chunking modes on synthetic handbook text")
+    parser.add_argument("--size-mb", type=float, default=4.0, help="Approximate size of each generated file")
+    parser.add_argument("--formats", nargs="+", choices=sorted(FORMATS), default=list(FORMATS))
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per mode (best is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier --output file whose chunk digests must still match")
+    args = parser.parse_args()
+
+    results, problems = [], []
+    workdir = tempfile.mkdtemp(prefix="bench_chunking_")
+    try:
+        print(f"{'format':<12} {'mode':<12} {'variant':<8} {'chunks':>8} {'chunks/s':>11} {'MB/s':>7} {'peak MB':>8}")
+        for name in args.formats:
+            text = generate(name, int(args.size_mb * 1e6), args.seed)
+            path = os.path.join(workdir, f"{name}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+
+            for mode in args.modes:
+                by_variant = {}
+                for variant in ("string", "stream"):
+                    row = measure(mode, variant, text, path, args.repeat)
+                    row.update({"format": name, "size_mb": args.size_mb, "seed": args.seed})
+                    results.append(row)
+                    by_variant[variant] = row["digest"]
+                    print(f"{name:<12} {mode:<12} {variant:<8} {row['chunks']:>8} {row['chunks_per_sec']:>11.0f} "
+                          f"{row['mb_per_sec']:>7.2f} {row['peak_mb']:>8.2f}")
+                if by_variant["string"] != by_variant["stream"]:
+                    problems.append(f"{name}/{mode}: streaming output differs from chunk_by_{mode}")
+    finally:
+        for entry in os.listdir(workdir):
+            os.remove(os.path.join(workdir, entry))
+        os.rmdir(workdir)
+
+    if args.compare:
+        problems.extend(compare(results, args.compare))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "size_mb": args.size_mb,
+                "seed": args.seed,
+                "results": results
+            }, f, indent=2)
+        print(f"📝 Results written to {args.output}")
+
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        sys.exit(1)
+    print("✅ Chunk output consistent")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Delete Latency Benchmark
+
+Fills throwaway collections of increasing size with synthetic chunks and
+times delete_by_term / delete_by_source / delete_by_section_id removing a
+handful of chunks, against the old approach of reading the whole collection
+and filtering metadata in Python. The filtered deletes should stay roughly
+flat as the collection grows.
+Usage: python benchmarks/bench_deletes.py [--sizes 1000 10000 100000] [--dim 384]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from definition_chunker import DefinitionChunker
+
+# Chunks matched by each timed delete
+TARGET_ROWS = 5
+
+
+def fill(chunker: DefinitionChunker, size: int, dim: int, batch: int = 5000):
+    """Add `size` chunks with random embeddings (no embedding model needed)."""
+    rng = np.random.default_rng(0)
+    for start in range(0, size, batch):
+        count = min(batch, size - start)
+        ids = [f"chunk-{i}" for i in range(start, start + count)]
+        metadatas = [{
+            'term': f"TERM {i}",
+            'term_lower': f"term {i}",
+            'definition': f"Definition number {i}",
+            'source': f"file:source_{i % 200}.txt",
+            'chunk_index': i,
+            'type': 'definition',
+            'section_id': f"S{i % 500}"
+        } for i in range(start, start + count)]
+        chunker.collection.add(
+            ids=ids,
+            documents=[f"TERM {i} Definition number {i}" for i in range(start, start + count)],
+            metadatas=metadatas,
+            embeddings=rng.random((count, dim), dtype=np.float32)
+        )
+
+
+def add_targets(chunker: DefinitionChunker, dim: int, tag: str):
+    """Add TARGET_ROWS chunks sharing one term, source and section_id."""
+    chunker.collection.add(
+        ids=[f"target-{tag}-{i}" for i in range(TARGET_ROWS)],
+        documents=[f"TARGET {tag}"] * TARGET_ROWS,
+        metadatas=[{
+            'term': f"TARGET {tag}",
+            'term_lower': f"target {tag}",
+            'definition': "target",
+            'source': f"file:target_{tag}.txt",
+            'chunk_index': i,
+            'type': 'definition',
+            'section_id': f"TARGET-{tag}"
+        } for i in range(TARGET_ROWS)],
+        embeddings=np.random.default_rng(1).random((TARGET_ROWS, dim), dtype=np.float32)
+    )
+
+
+def legacy_delete_by_term(chunker: DefinitionChunker, term: str) -> int:
+    """The old implementation: read every row and filter in Python."""
+    results = chunker.collection.get()
+    ids_to_delete = [
+        results['ids'][i] for i, metadata in enumerate(results['metadatas'])
+        if metadata.get('term', '').lower() == term.lower()
+    ]
+    if ids_to_delete:
+        chunker.collection.delete(ids=ids_to_delete)
+    return len(ids_to_delete)
+
+
+def timed(func, *args) -> float:
+    """Milliseconds taken by one call; the call must delete exactly TARGET_ROWS chunks."""
+    start = time.perf_counter()
+    deleted = func(*args)
+    elapsed = (time.perf_counter() - start) * 1000
+    assert deleted == TARGET_ROWS, f"{func.__name__} deleted {deleted} chunks"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark delete latency against collection size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension of the synthetic chunks")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed deletes per method and size")
+    args = parser.parse_args()
+
+    print(f"{'chunks':>8} {'full scan (ms)':>15} {'by_term (ms)':>13} {'by_source (ms)':>15} {'by_section (ms)':>16}")
+    for size in args.sizes:
+        db_path = tempfile.mkdtemp(prefix="bench_deletes_")
+        try:
+            # Quiet the per-delete prints so they don't drown the table
+            with open(os.devnull, "w") as devnull:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    chunker = DefinitionChunker(db_path=db_path, collection_name="bench", embedding_cache_size=0)
+                    fill(chunker, size, args.dim)
+
+                    columns = {"legacy": [], "term": [], "source": [], "section": []}
+                    errors = []
+                    for run in range(args.repeat):
+                        for name, func, key in (
+                            ("legacy", legacy_delete_by_term, "TARGET legacy{run}"),
+                            ("term", chunker.delete_by_term, "target term{run}"),
+                            ("source", chunker.delete_by_source, "file:target_source{run}.txt"),
+                            ("section", chunker.delete_by_section_id, "TARGET-section{run}"),
+                        ):
+                            tag = f"{name}{run}"
+                            add_targets(chunker, args.dim, tag)
+                            if name == "legacy":
+                                try:
+                                    columns[name].append(timed(func, chunker, key.format(run=run)))
+                                except Exception as e:
+                                    # Large unfiltered get() calls can exceed sqlite's variable limit
+                                    errors.append(f"{size} chunks: full scan failed: {e}")
+                                    columns[name].append(float("nan"))
+                            else:
+                                columns[name].append(timed(func, key.format(run=run)))
+                finally:
+                    sys.stdout = stdout
+
+            medians = {name: float(np.median(values)) for name, values in columns.items()}
+            print(f"{size:>8} {medians['legacy']:>15.2f} {medians['term']:>13.2f} "
+                  f"{medians['source']:>15.2f} {medians['section']:>16.2f}")
+            for error in dict.fromkeys(errors):
+                print(f"  ⚠️  {error}")
+        finally:
+            shutil.rmtree(db_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
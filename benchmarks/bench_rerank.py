@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Search Result Reranking Benchmark
+
+Times the reordering step of search_relevant_context (rerank_results) against
+the list-based implementation it replaced, kept below as legacy_rerank. That
+version re-lowercased terms in every stage and tested membership with
+`r not in list` over result dicts, so its cost grew quadratically with the
+number of fetched results. Results are synthetic handbook-like chunks, so no
+database or embedding model is needed.
+Usage: python benchmarks/bench_rerank.py [--max-results 8 32 128 512] [--multiplier 3] [--iterations 20]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot import rerank_results
+from rules import SEARCH_SECTION, SEARCH_TOPIC, SEARCH_UNIVERSITY_INFO, match_question
+
+# One question per reordering rule, plus plain, exact-term and university info questions
+SAMPLE_QUESTIONS = [
+    "What GWA is needed for summa cum laude graduation honors?",
+    "What is the grading system?",
+    "What is the consequence of 20% absence?",
+    "What are the admission requirements?",
+    "How does admission work?",
+    "What does section 2 say about uniforms?",
+    "How many campuses does PRMSU have?",
+    "What is the vision statement of the university?",
+    "define leave of absence",
+    "How do I apply for a scholarship?",
+]
+
+# Term fragments that trigger the topic and section rules
+TERM_FRAGMENTS = ["GRADUATION HONORS", "ATHLETE REQUIREMENTS", "GRADING SYSTEM", "CLASS ATTENDANCE",
+                  "ADMISSION REQUIREMENTS", "ADMISSION POLICY", "SECTION 2", "LEAVE OF ABSENCE",
+                  "SCHOLARSHIP", "UNIFORM", "STUDENT ASSISTANT", "LIBRARY SERVICES"]
+
+
+def synthetic_results(count: int, seed: int) -> List[Dict]:
+    """Search results shaped like DefinitionChunker output (with precomputed lowercase fields), best distance first."""
+    rng = random.Random(seed)
+
+    def words(n):
+        return " ".join("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+                        for _ in range(n))
+
+    results = []
+    for i, distance in enumerate(sorted(rng.uniform(0.4, 2.0) for _ in range(count))):
+        fragment = rng.choice(TERM_FRAGMENTS)
+        term = f"{fragment} {words(rng.randint(0, 2)).upper()}".strip()
+        definition = f"{words(rng.randint(8, 30))} {rng.choice(['seven campuses', 'students', 'honors', words(1)])}"
+        results.append({'id': f"chunk-{seed}-{i}", 'document': f"{term}: {definition}", 'term': term,
+                        'definition': definition, 'term_lower': term.lower(), 'definition_lower': definition.lower(),
+                        'source': 'synthetic', 'distance': distance})
+    return results
+
+
+def legacy_rerank(query: str, results: List[Dict], max_results: int) -> List[Dict]:
+    """The reordering from search_relevant_context before the bucketed rewrite, unchanged."""
+    query_lower = query.lower()
+    query_clean = query_lower.replace('what is ', '').replace('what are ', '').replace('define ', '').replace('the ', '').replace('tell me about ', '').replace('?', '').strip()
+    match = match_question(query_lower)
+    university_info = match.first(SEARCH_UNIVERSITY_INFO)
+
+    # Check for exact or near-exact term matches
+    exact_matches = []
+    partial_matches = []
+    keyword_priority_matches = []
+    other_results = []
+
+    for result in results:
+        term_lower = result.get('term', '').lower()
+        definition_lower = result.get('definition', '').lower()
+
+        # Special priority for university basic info
+        if university_info:
+            if any(info in definition_lower for info in university_info.payload):
+                keyword_priority_matches.append(result)
+                continue
+
+        # Exact match - prioritize these regardless of similarity score
+        if term_lower == query_clean:
+            exact_matches.append(result)
+        # Partial match - term contains the query or query contains the term
+        elif query_clean in term_lower or term_lower in query_clean:
+            partial_matches.append(result)
+        else:
+            other_results.append(result)
+
+    # Reorder results: keyword priority first, then exact matches, then partial matches, then others
+    prioritized_results = keyword_priority_matches + exact_matches + partial_matches + other_results
+
+    # Enhanced keyword-based prioritization with specific fixes
+    topic = match.first(SEARCH_TOPIC)
+    topic_id = topic.rule_id if topic else None
+
+    # Fix graduation honors vs athlete confusion
+    if topic_id == 'search.graduation_honors':
+        # Prioritize graduation policies over athlete requirements
+        graduation_results = [r for r in prioritized_results if 'graduation' in r.get('term', '').lower() or 'policies for graduation' in r.get('term', '').lower()]
+        athlete_results = [r for r in prioritized_results if 'athlete' in r.get('term', '').lower()]
+        other_results = [r for r in prioritized_results if r not in graduation_results and r not in athlete_results]
+        prioritized_results = graduation_results + other_results + athlete_results  # Put athlete results last
+
+    # Fix grading system queries
+    elif topic_id == 'search.grading_system':
+        # Prioritize grading system results
+        grading_results = [r for r in prioritized_results if 'grading system' in r.get('term', '').lower()]
+        other_results = [r for r in prioritized_results if 'grading system' not in r.get('term', '').lower()]
+        prioritized_results = grading_results + other_results
+
+    # Fix attendance/absence percentage queries
+    elif topic_id == 'search.attendance':
+        # Prioritize class attendance results
+        attendance_results = [r for r in prioritized_results if 'attendance' in r.get('term', '').lower() or 'class attendance' in r.get('term', '').lower()]
+        other_results = [r for r in prioritized_results if 'attendance' not in r.get('term', '').lower()]
+        prioritized_results = attendance_results + other_results
+
+    # Original admission requirements logic
+    elif topic_id == 'search.requirements':
+        # Filter and prioritize admission requirements results
+        req_results = [r for r in prioritized_results if 'requirements' in r.get('term', '').lower()]
+        other_results = [r for r in prioritized_results if 'requirements' not in r.get('term', '').lower()]
+        prioritized_results = req_results + other_results
+    elif topic_id == 'search.admission':
+        # Filter and prioritize general admission results (not requirements)
+        adm_results = [r for r in prioritized_results if 'admission' in r.get('term', '').lower() and 'requirements' not in r.get('term', '').lower()]
+        req_results = [r for r in prioritized_results if 'requirements' in r.get('term', '').lower()]
+        other_results = [r for r in prioritized_results if 'admission' not in r.get('term', '').lower() and 'requirements' not in r.get('term', '').lower()]
+        prioritized_results = adm_results + req_results + other_results
+
+    # If user specifically mentions a section, prioritize that section
+    section = match.first(SEARCH_SECTION)
+    if section:
+        # Filter and prioritize results of that section
+        section_label = section.payload
+        section_results = [r for r in prioritized_results if section_label in r.get('term', '').upper()]
+        other_results = [r for r in prioritized_results if section_label not in r.get('term', '').upper()]
+        prioritized_results = section_results + other_results
+
+    # Now filter by similarity score with improved logic
+    final_results = []
+    for result in prioritized_results:
+        distance = result.get('distance', 1)
+        similarity = 1 - distance if distance is not None else 0
+        term_lower = result.get('term', '').lower()
+        definition_lower = result.get('definition', '').lower()
+
+        # Always include exact matches, regardless of similarity score
+        if term_lower == query_clean:
+            final_results.append(result)
+        # Include keyword priority matches (university info)
+        elif result in keyword_priority_matches:
+            final_results.append(result)
+        # Include results with key terms in definition
+        elif any(keyword in definition_lower for keyword in query_clean.split()):
+            final_results.append(result)
+        # For other matches, use improved similarity threshold
+        elif similarity > -0.3:  # Slightly more restrictive but still lenient
+            final_results.append(result)
+
+    # If we still don't have enough results, include the best available
+    if len(final_results) < 3 and prioritized_results:
+        for result in prioritized_results:
+            if result not in final_results:
+                final_results.append(result)
+                if len(final_results) >= max_results:
+                    break
+
+    return final_results[:max_results]
+
+
+def time_per_call(rerank, cases, max_results: int, iterations: int) -> float:
+    """Average microseconds to rerank one result list."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for question, results in cases:
+            rerank(question, results, max_results)
+    return (time.perf_counter() - start) / (iterations * len(cases)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark search result reranking")
+    parser.add_argument("--max-results", type=int, nargs="+", default=[8, 32, 128, 512],
+                        help="Results requested per question")
+    parser.add_argument("--multiplier", type=int, default=3, help="Results fetched per requested result")
+    parser.add_argument("--iterations", type=int, default=20, help="Passes over the sample questions")
+    args = parser.parse_args()
+
+    print(f"{'max':>5} {'fetched':>8} {'legacy (us)':>12} {'bucketed (us)':>14} "
+          f"{'legacy/result':>14} {'bucketed/result':>16} {'speedup':>8}")
+    for max_results in args.max_results:
+        fetched = max_results * args.multiplier
+        cases = [(question, synthetic_results(fetched, seed)) for seed, question in enumerate(SAMPLE_QUESTIONS)]
+
+        # Both implementations must agree before timing them
+        for question, results in cases:
+            expected = [r['id'] for r in legacy_rerank(question, results, max_results)]
+            actual = [r['id'] for r in rerank_results(question, results, max_results)]
+            assert expected == actual, question
+
+        iterations = max(1, args.iterations * 8 // max_results)
+        before = time_per_call(legacy_rerank, cases, max_results, iterations)
+        after = time_per_call(rerank_results, cases, max_results, args.iterations)
+        print(f"{max_results:>5} {fetched:>8} {before:>12.1f} {after:>14.1f} "
+              f"{before / fetched:>14.2f} {after / fetched:>16.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Retrieval Quality vs. Latency Benchmark
+
+Runs the golden question set (benchmarks/golden_questions.json, one question
+per canned answer in rules.py with the handbook terms that answer it) through
+each retrieval configuration and reports recall@k, MRR and per-query latency:
+- search: raw nearest neighbours from search_definitions
+- context: search_relevant_context, which over-fetches max_results times the
+  fetch multiplier and reorders with the keyword heuristics
+for each search engine, with plain vector search or hybrid (vector + BM25
+keyword) retrieval, and with the query embedding cache warm or disabled.
+A result is relevant when its term starts with one of the expected terms.
+Usage: python benchmarks/bench_retrieval.py [--db-path ./vector_db] [--multipliers 1 2 3 5] [--output retrieval.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot import VectorDatabaseChatbot
+from definition_chunker import SEARCH_ENGINES
+from mock_cohere import MockCohereClient
+from rules import CANNED_ANSWER, RULES, match_question
+
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_questions.json")
+
+
+def load_golden(path: str) -> List[Dict]:
+    """Golden entries, checked against the rule table so the set follows rules.py."""
+    with open(path, "r", encoding="utf-8") as f:
+        golden = json.load(f)
+
+    covered = set()
+    for entry in golden:
+        rule = match_question(entry["question"]).first(CANNED_ANSWER)
+        if rule is None or rule.rule_id != entry["rule"]:
+            print(f"⚠️  '{entry['question']}' is answered by {rule.rule_id if rule else 'no canned rule'}, "
+                  f"not {entry['rule']}")
+        covered.add(entry["rule"])
+    missing = [rule.rule_id for rule in RULES if rule.group == CANNED_ANSWER and rule.rule_id not in covered]
+    if missing:
+        print(f"ℹ️  Canned answers without a golden question (or shadowed by an earlier rule): {', '.join(missing)}")
+    return golden
+
+
+def first_relevant_rank(results: List[Dict], expected_terms: List[str]) -> Optional[int]:
+    """1-based rank of the first result whose term starts with an expected term."""
+    prefixes = tuple(term.upper() for term in expected_terms)
+    for rank, result in enumerate(results, 1):
+        if result.get("term", "").upper().startswith(prefixes):
+            return rank
+    return None
+
+
+def evaluate(search, golden: List[Dict], ks: List[int], repeat: int) -> Dict:
+    """recall@k (share of questions with a relevant result in the top k), MRR and latency of `search`."""
+    for entry in golden:
+        search(entry["question"])  # warm-up: model load, caches, index pages
+
+    latencies, ranks, per_query = [], [], []
+    for entry in golden:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = search(entry["question"])
+            timings.append((time.perf_counter() - start) * 1000)
+        rank = first_relevant_rank(results, entry["expected_terms"])
+        ranks.append(rank)
+        latencies.extend(timings)
+        per_query.append({
+            "question": entry["question"],
+            "rank": rank,
+            "top_terms": [result.get("term", "")[:60] for result in results[:3]],
+            "median_ms": round(float(np.median(timings)), 3)
+        })
+
+    return {
+        **{f"recall@{k}": round(sum(1 for r in ranks if r is not None and r <= k) / len(ranks), 3) for k in ks},
+        "mrr": round(sum(1 / r for r in ranks if r is not None) / len(ranks), 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "queries": per_query
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality against latency on the golden set")
+    parser.add_argument("--db-path", default="./vector_db", help="Path to vector database")
+    parser.add_argument("--collection", default="definitions", help="Collection name")
+    parser.add_argument("--golden", default=GOLDEN_FILE, help="Golden question file")
+    parser.add_argument("--engines", nargs="+", choices=SEARCH_ENGINES, default=list(SEARCH_ENGINES))
+    parser.add_argument("--retrieval", nargs="+", choices=["vector", "hybrid"], default=["vector", "hybrid"],
+                        help="Plain vector search and/or vector + BM25 keyword fusion")
+    parser.add_argument("--multipliers", type=int, nargs="+", default=[1, 2, 3, 5],
+                        help="search_relevant_context fetch multipliers to compare")
+    parser.add_argument("--max-results", type=int, default=8, help="Results requested per question")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 8], help="Cut-offs for recall@k")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per question")
+    parser.add_argument("--output", help="Write results (including per-question ranks) as JSON to this file")
+    args = parser.parse_args()
+
+    golden = load_golden(args.golden)
+    ks = [k for k in args.k if k <= args.max_results]
+    rows = []
+
+    header = f"{'engine':<7} {'mode':<6} {'config':<14} {'cache':<5} " + " ".join(f"{'R@' + str(k):>6}" for k in ks)
+    print(header + f" {'MRR':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    runs = [(engine, mode, cache) for engine in args.engines for mode in args.retrieval
+            for cache in ((10000, "warm"), (0, "off"))]
+    for engine, mode, (cache_size, cache_label) in runs:
+        # Quiet the constructor's status prints so they don't break up the table
+        with contextlib.redirect_stdout(io.StringIO()):
+            bot = VectorDatabaseChatbot(api_key="", db_path=args.db_path, collection_name=args.collection,
+                                        search_engine=engine, embedding_cache_size=cache_size,
+                                        cohere_client=MockCohereClient(), hybrid=mode == "hybrid")
+
+        configs = [("search", lambda q: bot.chunker.search_definitions(q, n_results=args.max_results))]
+        configs += [(f"context x{m}", lambda q, m=m: bot.search_relevant_context(
+            q, max_results=args.max_results, fetch_multiplier=m)) for m in args.multipliers]
+
+        for name, search in configs:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = evaluate(search, golden, ks, args.repeat)
+            rows.append({"engine": engine, "retrieval": mode, "config": name, "embedding_cache": cache_label,
+                         **result})
+            print(f"{engine:<7} {mode:<6} {name:<14} {cache_label:<5} "
+                  + " ".join(f"{result[f'recall@{k}']:>6.2f}" for k in ks)
+                  + f" {result['mrr']:>6.3f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}")
+
+        if bot.chunker.query_embedding_cache:
+            bot.chunker.query_embedding_cache.close()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "golden": os.path.basename(args.golden),
+                "questions": len(golden),
+                "max_results": args.max_results,
+                "results": rows
+            }, f, indent=2)
+        print(f"📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
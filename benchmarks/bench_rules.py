@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Rule Engine Micro-benchmark
+
+Compares per-question rule matching time of the compiled RuleEngine with
+evaluating every rule through its own substring scans (how the keyword
+chains in chatbot.py used to work), and shows how each scales as rules are added.
+Usage: python benchmarks/bench_rules.py [--iterations 2000] [--extra-rules 0 100 1000]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rules import RULES, Rule, RuleEngine
+
+SAMPLE_QUESTIONS = [
+    "What law established PRMSU?",
+    "What are the four types of cross enrolment?",
+    "How many units can I take during midyear?",
+    "What is the consequence of 20% absence?",
+    "What is the prescribed uniform for male students?",
+    "What is the penalty for the first offense of liquor?",
+    "What GWA do graduating students need for honors?",
+    "What are the admission requirements?",
+    "Tell me about inbound cross enrolment",
+    "What is the vision statement of the university?",
+    "Where is PRMSU located?",
+    "What does PRMSU stand for?",
+    "What is academic residency?",
+    "Can I take a leave of absence mid-year and why is it unnecessary?",
+]
+
+
+def synthetic_rules(count: int, seed: int = 7):
+    """Random two-group rules that behave like real handbook rules."""
+    rng = random.Random(seed)
+
+    def word():
+        return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+
+    return [Rule(f'synthetic.{i}', 'synthetic', [[word(), word()], [word()]]) for i in range(count)]
+
+
+def time_per_question(match, questions, iterations: int) -> float:
+    """Average microseconds to match one question."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for question in questions:
+            match(question)
+    return (time.perf_counter() - start) / (iterations * len(questions)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark question rule matching")
+    parser.add_argument("--iterations", type=int, default=2000, help="Passes over the sample questions")
+    parser.add_argument("--extra-rules", type=int, nargs="+", default=[0, 100, 1000],
+                        help="Synthetic rules added on top of the real table")
+    args = parser.parse_args()
+
+    questions = [question.lower() for question in SAMPLE_QUESTIONS]
+
+    print(f"{'rules':>6} {'linear scans (us)':>18} {'compiled (us)':>14} {'speedup':>8}")
+    for extra in args.extra_rules:
+        rules = RULES + synthetic_rules(extra)
+        engine = RuleEngine(rules)
+
+        def linear(question):
+            return {rule.rule_id for rule in rules if rule.matches_text(question)}
+
+        # Both implementations must agree before timing them
+        for question in questions:
+            assert engine.match(question).ids == linear(question), question
+
+        before = time_per_question(linear, questions, args.iterations)
+        after = time_per_question(engine.match, questions, args.iterations)
+        print(f"{len(rules):>6} {before:>18.2f} {after:>14.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Vector Search Latency Benchmark
+
+Compares top-k query latency (p50/p99) of Chroma's collection.query with the
+in-memory NumPy index on the same collection. Query embeddings are computed
+once up front so only the search itself is timed, and the result IDs of both
+engines are compared (Chroma's HNSW index is approximate, NumPy is exact).
+Usage: python benchmarks/bench_vector_index.py [--db-path ./vector_db] [--k 24] [--repeat 50]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from definition_chunker import DefinitionChunker
+
+SAMPLE_QUERIES = [
+    "What law established PRMSU?",
+    "What are the four types of cross enrolment?",
+    "How many units can I take during midyear?",
+    "What is the consequence of 20% absence?",
+    "What is the prescribed uniform for male students?",
+    "What GWA do graduating students need for honors?",
+    "What are the admission requirements?",
+    "What is the grading system?",
+    "What is the vision statement of the university?",
+    "How do I apply for a scholarship?",
+    "What happens if I fail a subject twice?",
+    "Can I shift to another program?",
+]
+
+
+def latencies(search, embeddings, repeat: int) -> np.ndarray:
+    """Per-query latencies in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        for embedding in embeddings:
+            start = time.perf_counter()
+            search(embedding)
+            timings.append((time.perf_counter() - start) * 1000)
+    return np.asarray(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Chroma vs. NumPy vector search")
+    parser.add_argument("--db-path", default="./vector_db", help="Path to vector database")
+    parser.add_argument("--collection", default="definitions", help="Collection name")
+    parser.add_argument("--k", type=int, default=24, help="Results per query (chatbot asks for max_results * 3)")
+    parser.add_argument("--repeat", type=int, default=50, help="Passes over the sample queries")
+    args = parser.parse_args()
+
+    chunker = DefinitionChunker(db_path=args.db_path, collection_name=args.collection, search_engine="numpy")
+    index = chunker.vector_index
+    embeddings = chunker.embed_texts(SAMPLE_QUERIES)
+
+    def chroma_search(embedding):
+        return chunker.collection.query(query_embeddings=[embedding], n_results=args.k)
+
+    def numpy_search(embedding):
+        return index.query(embedding, n_results=args.k)
+
+    # Warm both paths (HNSW index load, page faults on the memory-mapped matrix)
+    for embedding in embeddings:
+        chroma_search(embedding)
+        numpy_search(embedding)
+
+    def same_results(first, second, tolerance: float = 1e-3):
+        # Duplicate chunks tie on distance, so compare (distance, document) pairs rather than IDs
+        first = sorted(zip(first['distances'][0], first['documents'][0]))
+        second = sorted(zip(second['distances'][0], second['documents'][0]))
+        return len(first) == len(second) and all(
+            a_doc == b_doc and abs(a_dist - b_dist) < tolerance
+            for (a_dist, a_doc), (b_dist, b_doc) in zip(first, second)
+        )
+
+    identical = sum(same_results(chroma_search(embedding), numpy_search(embedding)) for embedding in embeddings)
+    print(f"Collection: {len(index)} embeddings, space={index.space}, k={args.k}")
+    print(f"Identical results: {identical}/{len(embeddings)} queries")
+    print()
+
+    print(f"{'engine':>8} {'p50 (ms)':>10} {'p99 (ms)':>10} {'mean (ms)':>10}")
+    for name, search in (("chroma", chroma_search), ("numpy", numpy_search)):
+        timings = latencies(search, embeddings, args.repeat)
+        print(f"{name:>8} {np.percentile(timings, 50):>10.3f} {np.percentile(timings, 99):>10.3f} "
+              f"{timings.mean():>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+API Load Test
+
+Replays a question log against a running API server at a fixed request rate
+(open loop: requests are sent on schedule whether or not earlier ones have
+finished) and reports throughput, p50/p95/p99 latency and error rates per
+endpoint. Latency is measured from each request's scheduled send time, so a
+backed-up server is not hidden by the load generator slowing down.
+Start the server with COHERE_MOCK=1 to test without using Cohere quota.
+Usage: python benchmarks/load_test.py [--url http://127.0.0.1:8000] [--questions log.txt]
+       [--qps 10] [--duration 30] [--mix chat=3,search=1] [--output load.json]
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+SAMPLE_QUESTIONS = [
+    "What law established PRMSU?",
+    "What are the four types of cross enrolment?",
+    "How many units can I take during midyear?",
+    "What is the consequence of 20% absence?",
+    "What is the prescribed uniform for male students?",
+    "What GWA do graduating students need for honors?",
+    "What are the admission requirements?",
+    "What is the grading system?",
+    "What is the vision statement of the university?",
+    "How do I apply for a scholarship?",
+    "What happens if I fail a subject twice?",
+    "Can I shift to another program?",
+    "What is the policy on cheating during exams?",
+    "How do I request a leave of absence?",
+    "Who can become a student assistant?",
+    "What are the penalties for bringing liquor on campus?",
+]
+
+ENDPOINTS = {
+    "chat": ("/chat", lambda question: {"question": question}),
+    "search": ("/search", lambda question: {"query": question}),
+}
+
+
+def load_questions(path: str) -> List[str]:
+    """Questions from a log: JSON lines with a "question" or "query" field, or plain text, one per line."""
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                line = record.get("question") or record.get("query") or ""
+            if line:
+                questions.append(line)
+    return questions
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """'chat=3,search=1' -> {'chat': 3.0, 'search': 1.0}"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in --mix: {name} (choose from {', '.join(ENDPOINTS)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def send(url: str, path: str, body: Dict, timeout: float) -> Dict:
+    """POST one request; returns status, served_by and the Server-Timing stages (ms)."""
+    request = urllib.request.Request(
+        url + path, data=json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json"}, method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            payload = json.loads(response.read() or b"{}")
+            stages = {}
+            for entry in (response.headers.get("Server-Timing") or "").split(","):
+                name, _, duration = entry.strip().partition(";dur=")
+                if name and duration:
+                    stages[name] = float(duration)
+            return {"status": response.status, "served_by": payload.get("served_by"), "stages": stages}
+    except urllib.error.HTTPError as e:
+        return {"status": e.code}
+    except Exception as e:
+        return {"status": type(e).__name__}
+
+
+def summarize(records: List[Dict], elapsed: float) -> Dict:
+    """Throughput, latency percentiles, error rate and answer paths for one endpoint's requests."""
+    latencies = np.array([r["latency_ms"] for r in records if r["status"] == 200])
+    errors: Dict[str, int] = {}
+    served_by: Dict[str, int] = {}
+    stages: Dict[str, List[float]] = {}
+    for r in records:
+        if r["status"] != 200:
+            errors[str(r["status"])] = errors.get(str(r["status"]), 0) + 1
+            continue
+        if r.get("served_by"):
+            served_by[r["served_by"]] = served_by.get(r["served_by"], 0) + 1
+        for stage, ms in r.get("stages", {}).items():
+            stages.setdefault(stage, []).append(ms)
+
+    def pct(q):
+        return round(float(np.percentile(latencies, q)), 1) if len(latencies) else None
+
+    return {
+        "requests": len(records),
+        "ok": int(len(latencies)),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(1 - len(latencies) / len(records), 4) if records else 0.0,
+        "errors": errors,
+        "p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99),
+        "mean_ms": round(float(latencies.mean()), 1) if len(latencies) else None,
+        "served_by": served_by,
+        # Server-side breakdown from the Server-Timing header, median per stage
+        "stage_p50_ms": {stage: round(float(np.median(values)), 2) for stage, values in sorted(stages.items())}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay questions against the API at a target rate")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the API server")
+    parser.add_argument("--questions", help="Question log (JSON lines or plain text); default: built-in samples")
+    parser.add_argument("--qps", type=float, default=10.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to send requests for")
+    parser.add_argument("--mix", default="chat=1", help="Endpoint weights, e.g. chat=3,search=1")
+    parser.add_argument("--poisson", action="store_true", help="Exponential gaps between requests instead of even spacing")
+    parser.add_argument("--concurrency", type=int, default=256, help="Most requests in flight at once")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions) if args.questions else SAMPLE_QUESTIONS
+    if not questions:
+        raise SystemExit("No questions to send")
+    weights = parse_mix(args.mix)
+    names, probabilities = list(weights), np.array(list(weights.values())) / sum(weights.values())
+    rng = random.Random(args.seed)
+
+    # Build the whole schedule up front: (send offset, endpoint, question), questions replayed in order
+    schedule, offset, i = [], 0.0, 0
+    while offset < args.duration:
+        endpoint = names[int(np.searchsorted(np.cumsum(probabilities), rng.random(), side="right"))]
+        schedule.append((offset, endpoint, questions[i % len(questions)]))
+        i += 1
+        offset += rng.expovariate(args.qps) if args.poisson else 1 / args.qps
+
+    records: List[Dict] = []
+    lock = threading.Lock()
+
+    def run(planned: float, endpoint: str, question: str):
+        path, body = ENDPOINTS[endpoint]
+        result = send(args.url, path, body(question), args.timeout)
+        result["endpoint"] = endpoint
+        result["latency_ms"] = (time.perf_counter() - planned) * 1000
+        with lock:
+            records.append(result)
+
+    print(f"🚀 {len(schedule)} requests to {args.url} at {args.qps} req/s for {args.duration}s ({args.mix})")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for offset, endpoint, question in schedule:
+            planned = start + offset
+            delay = planned - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, planned, endpoint, question)
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "url": args.url, "target_qps": args.qps, "duration": args.duration, "mix": weights,
+        "elapsed": round(elapsed, 2),
+        "endpoints": {name: summarize([r for r in records if r["endpoint"] == name], elapsed) for name in names}
+    }
+
+    print(f"{'endpoint':<8} {'requests':>8} {'ok/s':>7} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, summary in report["endpoints"].items():
+        print(f"{name:<8} {summary['requests']:>8} {summary['throughput_rps']:>7.2f} {summary['error_rate']:>7.1%} "
+              f"{summary['p50_ms'] or 0:>8.1f} {summary['p95_ms'] or 0:>8.1f} {summary['p99_ms'] or 0:>8.1f}")
+        if summary["errors"]:
+            print(f"  ⚠️  errors: {summary['errors']}")
+        if summary["stage_p50_ms"]:
+            print(f"  server stages (p50 ms): {summary['stage_p50_ms']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Report written to {args.output}")
+
+    failed = sum(s["requests"] - s["ok"] for s in report["endpoints"].values())
+    sys.exit(1 if failed and failed == len(records) else 0)
+
+
+if __name__ == "__main__":
+    main()
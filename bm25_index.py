@@ -0,0 +1,146 @@
+"""
+Keyword index for hybrid search
+
+Okapi BM25 over each chunk's term and definition, held in memory as an
+inverted index. It is built from the collection at load time and kept in
+sync through DefinitionChunker change notifications. Exact keyword hits that
+embeddings tend to miss ("section 1", "20%", "summa cum laude", "inbound")
+score high here; DefinitionChunker fuses both rankings with reciprocal-rank fusion.
+"""
+
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from term_index import NORMALIZED_VERSION
+
+# Numbers keep their decimals and percent sign ("1.75", "20%"), words are split on anything else
+TOKEN_PATTERN = re.compile(r"\d+(?:\.\d+)?%?|[a-z]+")
+
+# Question words that would otherwise match half the handbook
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how", "i", "in",
+    "is", "it", "me", "my", "of", "on", "or", "tell", "that", "the", "there", "to", "what", "when", "where",
+    "which", "who", "why", "will", "with", "about", "define"
+))
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word and number tokens without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Thread-safe in-memory BM25 index over a Chroma collection's term/definition metadata."""
+
+    def __init__(self, collection, k1: float = 1.2, b: float = 0.75, term_weight: int = 2,
+                 page_size: int = 1000):
+        """
+        Index every chunk in `collection`. Term tokens count `term_weight` times,
+        so a keyword in the heading outweighs the same keyword deep in a definition.
+        """
+        self.collection = collection
+        self.k1 = k1
+        self.b = b
+        self.term_weight = term_weight
+        self.page_size = page_size
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self.rebuild()
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def rebuild(self):
+        """Re-read all chunk metadata from the collection."""
+        with self._lock:
+            self._postings, self._doc_terms, self._doc_lengths, self._total_length = {}, {}, {}, 0
+            offset = 0
+            while True:
+                page = self.collection.get(limit=self.page_size, offset=offset, include=["metadatas", "documents"])
+                if not page["ids"]:
+                    break
+                offset += len(page["ids"])
+                for doc_id, metadata, document in zip(page["ids"], page["metadatas"] or [], page["documents"] or []):
+                    self._add(doc_id, metadata, document)
+        print(f"✅ Built keyword index with {len(self._doc_lengths)} chunks")
+
+    def _tokens(self, metadata: Optional[Dict[str, Any]], document: Optional[str]) -> Counter:
+        metadata = metadata or {}
+        term = str(metadata.get("term", ""))
+        definition = str(metadata.get("definition", ""))
+        if definition and metadata.get("normalized_version") == NORMALIZED_VERSION and "keywords" in metadata:
+            # Tokens stored with the chunk by store_chunks
+            counts = Counter(str(metadata["keywords"]).split())
+        else:
+            counts = Counter(tokenize(definition or document or ""))
+        for token in tokenize(term):
+            counts[token] += self.term_weight
+        return counts
+
+    def _add(self, doc_id: str, metadata: Optional[Dict[str, Any]], document: Optional[str]):
+        if doc_id in self._doc_terms:
+            self._remove(doc_id)
+        counts = self._tokens(metadata, document)
+        self._doc_terms[doc_id] = counts
+        length = sum(counts.values())
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+        for token, count in counts.items():
+            self._postings.setdefault(token, {})[doc_id] = count
+
+    def _remove(self, doc_id: str):
+        counts = self._doc_terms.pop(doc_id, None)
+        if counts is None:
+            return
+        self._total_length -= self._doc_lengths.pop(doc_id, 0)
+        for token in counts:
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[token]
+
+    def on_change(self, event: str, ids: List[str]):
+        """DefinitionChunker change listener keeping the index in sync with the collection."""
+        with self._lock:
+            if event == "clear":
+                self._postings, self._doc_terms, self._doc_lengths, self._total_length = {}, {}, {}, 0
+            elif event == "reload":
+                self.rebuild()
+            elif event == "delete":
+                for doc_id in ids:
+                    self._remove(doc_id)
+            elif event == "add":
+                ids = list(ids)
+                for start in range(0, len(ids), self.page_size):
+                    added = self.collection.get(ids=ids[start:start + self.page_size],
+                                                include=["metadatas", "documents"])
+                    for doc_id, metadata, document in zip(added["ids"], added["metadatas"] or [],
+                                                          added["documents"] or []):
+                        self._add(doc_id, metadata, document)
+
+    def query(self, text: str, n_results: int = 10) -> List[Tuple[str, float]]:
+        """Top `n_results` (id, BM25 score) pairs for a query, best first; chunks without a matching token are left out."""
+        tokens = set(tokenize(text))
+        with self._lock:
+            total_docs = len(self._doc_lengths)
+            if not tokens or not total_docs or n_results <= 0:
+                return []
+            average_length = self._total_length / total_docs
+            scores: Dict[str, float] = {}
+            for token in tokens:
+                postings = self._postings.get(token)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return heapq.nlargest(n_results, scores.items(), key=lambda item: (item[1], item[0]))
@@ -8,9 +8,38 @@ using Cohere API for natural language processing.
 
 import argparse
 import sys
-from typing import List, Dict
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+import re
 import cohere
-from definition_chunker import DefinitionChunker
+from circuit_breaker import CircuitBreaker
+from definition_chunker import SEARCH_ENGINES, DefinitionChunker
+from timings import span, timed
+from term_index import clean_query, normalize_term, term_aliases
+from rules import (
+    ANSWER_CATEGORY, CANNED_ANSWER, EXTRACT_ITEM, SEARCH_SECTION, SEARCH_TOPIC,
+    SEARCH_UNIVERSITY_INFO, PRMSU_ACRONYM_ANSWER, match_question
+)
+
+# Only block very obvious non-PRMSU topics
+NON_PRMSU_PATTERNS = [
+    # Math calculations only
+    r'\d+\s*[\+\-\*\/]\s*\d+',  # Basic math operations like 1+1, 2*3, etc.
+    r'what\s+is\s+\d+\s*[\+\-\*\/]',  # "what is 1+1", "what is 2*3"
+
+    # Very specific non-academic topics
+    r'weather|temperature|climate',
+    r'cooking|recipe|food|restaurant',
+    r'movie|film|cinema|actor|actress',
+    r'music|song|singer|band',
+    r'celebrity|famous\s+person',
+    r'sports|football|basketball|soccer',
+
+    # Other specific universities only
+    r'harvard\s+university|mit\s+university|stanford\s+university',
+    r'university\s+of\s+the\s+philippines|ateneo|de\s+la\s+salle'
+]
+NON_PRMSU_PATTERN = re.compile('|'.join(f'(?:{pattern})' for pattern in NON_PRMSU_PATTERNS))
 
 
 def validate_prmsu_relevance(question: str) -> bool:
@@ -18,32 +47,9 @@ def validate_prmsu_relevance(question: str) -> bool:
     Validate if the question is related to PRMSU student handbook topics.
     More lenient validation - only blocks obvious non-academic topics.
     """
-    question_lower = question.lower()
-
-    # Only block very obvious non-PRMSU topics
-    non_prmsu_patterns = [
-        # Math calculations only
-        r'\d+\s*[\+\-\*\/]\s*\d+',  # Basic math operations like 1+1, 2*3, etc.
-        r'what\s+is\s+\d+\s*[\+\-\*\/]',  # "what is 1+1", "what is 2*3"
-
-        # Very specific non-academic topics
-        r'weather|temperature|climate',
-        r'cooking|recipe|food|restaurant',
-        r'movie|film|cinema|actor|actress',
-        r'music|song|singer|band',
-        r'celebrity|famous\s+person',
-        r'sports|football|basketball|soccer',
-
-        # Other specific universities only
-        r'harvard\s+university|mit\s+university|stanford\s+university',
-        r'university\s+of\s+the\s+philippines|ateneo|de\s+la\s+salle'
-    ]
-
     # Check for non-PRMSU patterns - but be more lenient
-    import re
-    for pattern in non_prmsu_patterns:
-        if re.search(pattern, question_lower):
-            return False
+    if NON_PRMSU_PATTERN.search(question.lower()):
+        return False
 
     # If it's not obviously non-academic, assume it could be PRMSU-related
     # This makes the validation much more lenient for student handbook questions
@@ -56,74 +62,33 @@ def format_user_friendly_response(answer: str, question: str) -> str:
     if not answer:
         return answer
 
-    question_lower = question.lower()
+    match = match_question(question)
 
     # Clean up the answer
     answer = answer.strip()
 
     # Add appropriate emoji and formatting based on question type
-    if any(word in question_lower for word in ['stands for', 'acronym', 'what does']):
-        # For acronym questions
-        if 'prmsu' in question_lower:
-            return f"🏫 **PRMSU** stands for:\n**President Ramon Magsaysay State University**\n\n📍 The main campus is located in **Iba, Zambales**."
-
-    elif any(word in question_lower for word in ['vision', 'mission']):
-        # For vision/mission questions
-        emoji = "🎯" if 'vision' in question_lower else "🎯"
-        title = "Vision" if 'vision' in question_lower else "Mission"
-        return f"{emoji} **PRMSU {title}:**\n{answer}"
-
-    elif any(word in question_lower for word in ['penalty', 'offense', 'violation']):
-        # For disciplinary questions
-        return f"⚖️ **Disciplinary Policy:**\n{answer}"
-
-    elif any(word in question_lower for word in ['scholarship', 'financial assistance']):
-        # For scholarship questions
-        return f"💰 **Scholarship Information:**\n{answer}"
-
-    elif any(word in question_lower for word in ['uniform', 'dress code']):
-        # For uniform questions
-        return f"👔 **Uniform Policy:**\n{answer}"
-
-    elif any(word in question_lower for word in ['admission', 'requirement', 'enroll']):
-        # For admission questions
-        return f"📝 **Admission Information:**\n{answer}"
-
-    elif any(word in question_lower for word in ['gwa', 'grade', 'grading']):
-        # For grading questions
-        return f"📊 **Academic Information:**\n{answer}"
-
-    elif any(word in question_lower for word in ['graduation', 'honors', 'cum laude']):
-        # For graduation questions
-        return f"🎓 **Graduation Information:**\n{answer}"
+    category = match.first(ANSWER_CATEGORY)
 
-    elif any(word in question_lower for word in ['where', 'located', 'location']):
-        # For location questions
-        return f"📍 **University Location:**\n{answer}"
-
-    elif any(word in question_lower for word in ['campus', 'how many', 'established', 'when']):
-        # For general university information
-        return f"🏛️ **University Information:**\n{answer}"
-
-    elif any(word in question_lower for word in ['student assistant', 'work-study']):
-        # For student assistant questions
-        return f"💼 **Student Assistant Program:**\n{answer}"
-
-    else:
+    if category is None:
         # Default formatting with university emoji
         return f"📚 **PRMSU Student Handbook:**\n{answer}"
 
-def enhance_response_specificity(question: str, answer: str, search_results: List[Dict]) -> str:
-    """
-    Post-process the answer to make it more specific and prevent truncation.
-    """
-    question_lower = question.lower()
+    if category.rule_id == 'category.acronym':
+        # For acronym questions
+        if 'prmsu' in match.keywords:
+            return PRMSU_ACRONYM_ANSWER
+        return f"📚 **PRMSU Student Handbook:**\n{answer}"
 
-    # First, validate if the question is PRMSU-related
-    if not validate_prmsu_relevance(question):
-        return "🚫 **Sorry, I can only answer questions related to PRMSU (President Ramon Magsaysay State University) student handbook.**\n\nI cannot help with:\n• Math calculations or general knowledge\n• Weather, news, or entertainment topics\n• Other universities or non-academic subjects\n• Personal advice or general information\n\nPlease ask about:\n• PRMSU policies and regulations\n• Academic requirements and procedures\n• Student services and programs\n• University information and guidelines\n\n**Example questions:**\n• 'What are the admission requirements for PRMSU?'\n• 'What is the grading system at PRMSU?'\n• 'What are the scholarship requirements?'"
+    if category.rule_id == 'category.vision_mission':
+        # For vision/mission questions
+        title = "Vision" if 'vision' in match.keywords else "Mission"
+        return f"🎯 **PRMSU {title}:**\n{answer}"
 
-    # Fix truncation issues first - if answer ends abruptly, try to complete it
+    return f"{category.payload}\n{answer}"
+
+def complete_truncated_answer(answer: str, search_results: List[Dict]) -> str:
+    """If the answer ends abruptly, replace it with a longer definition that contains it."""
     if answer and not answer.strip().endswith(('.', '!', '?', ':', '%')):
         # Try to find a complete answer from search results
         for result in search_results:
@@ -131,71 +96,11 @@ def enhance_response_specificity(question: str, answer: str, search_results: Lis
             if definition and len(definition) > len(answer):
                 # Use the complete definition if it contains the partial answer
                 if answer.strip() in definition:
-                    answer = definition
-                    break
-
-    # Specific question handlers with complete answers
-    if 'what law' in question_lower and 'established' in question_lower:
-        return "President Ramon Magsaysay State University (PRMSU) was officially established by Republic Act No. 11015 on April 20, 2018."
-
-    if 'four types' in question_lower and 'cross' in question_lower:
-        return "The four types of cross-enrolment at PRMSU are: 1) Inbound Cross Enrolment (students from other institutions enrolling at PRMSU), 2) Outbound Cross Enrolment (PRMSU students enrolling in external institutions), 3) In-Campus Cross Enrolment (PRMSU students enrolling in different colleges within the same campus), and 4) Out-Campus Cross Enrolment (PRMSU students enrolling in another PRMSU campus)."
-
-    if 'how many units' in question_lower and 'midyear' in question_lower:
-        return "Students may take a maximum of 9 units during midyear classes. Graduating students may overload up to 12 units only with approval from the Registrar upon recommendation of the Dean. Students with academic deficiencies are not allowed to overload."
-
-    if 'consequence' in question_lower and '20%' in question_lower and 'absence' in question_lower:
-        return "Students who accumulate 20% unexcused absences in any subject automatically receive a grade of 5.0 (failing grade) for that subject."
-
-    if 'prescribed uniform' in question_lower or ('uniform' in question_lower and ('male' in question_lower or 'female' in question_lower)):
-        return "Male students must wear white polo shirt, black pants, and black formal shoes. Female students must wear blue skirt or blue slacks, white blouse, necktie, and black shoes. LGBTQ+ policy: Women members may wear slacks, blouse, and necktie combination, but men members are NOT permitted to wear skirts."
-
-    if 'what grade' in question_lower and 'transferee' in question_lower:
-        return "Transferee students must have earned a minimum grade of 3.0 or its equivalent in their previous school for their courses to be accredited at PRMSU. The course content and unit weight must also be equivalent to PRMSU standards."
-
-    if 'grounds for termination' in question_lower and 'scholarship' in question_lower:
-        return "Grounds for termination of scholarship or financial assistance include: 1) Failure to maintain the required GWA, 2) Dropping out without proper notice, 3) Carrying fewer units than prescribed, 4) Failure to comply with reapplication requirements, and 5) Violation of university rules and regulations."
-
-    if 'maximum number of hours' in question_lower and 'student assistant' in question_lower:
-        return "Student assistants receive ₱25.00 per hour and may work a maximum of 100 hours per month, subject to COA rules. Requirements include: must be officially enrolled, possess relevant skills, maintain good grades, demonstrate good moral character, submit resume, recent grades, certificate of registration, ID photo, class schedule, and parental consent. The program is limited to 50 assistants per semester, and poor performance automatically disqualifies students from reapplication."
-
-    if 'penalty' in question_lower and 'liquor' in question_lower:
-        if 'first offense' in question_lower:
-            return "First offense for being under the influence of liquor on campus results in 15 days suspension, 12 hours of transformative experience, and mandatory guidance intervention."
-        elif 'second offense' in question_lower:
-            return "Second offense for liquor-related violations at PRMSU results in 30 days suspension, 24 hours of transformative experience, and continued guidance intervention."
-        elif 'third offense' in question_lower:
-            return "Third offense for liquor-related violations at PRMSU results in one-year suspension from the university."
-        else:
-            # If no specific offense number mentioned, provide all penalties
-            return "PRMSU liquor-related offenses carry progressive penalties: First offense: 15 days suspension, 12 hours transformative experience, mandatory guidance intervention. Second offense: 30 days suspension, 24 hours transformative experience, continued guidance intervention. Third offense: One-year suspension."
-
-    if 'honors' in question_lower and 'graduating' in question_lower and 'gwa' in question_lower:
-        return "Three honors are awarded to graduating students: 1) Summa Cum Laude requires 1.0-1.25 GWA with no grade below 1.5, 2) Magna Cum Laude requires 1.26-1.5 GWA with no grade below 1.75, and 3) Cum Laude requires 1.51-1.75 GWA with no grade below 2.0."
-
-    # Advanced question handlers
-    if 'maximum number of hours' in question_lower and 'semester' in question_lower and 'student assistant' in question_lower:
-        return "Student assistants work a maximum of 100 hours per month. In a typical 4-month semester, this equals approximately 400 hours per semester (100 hours/month × 4 months = 400 hours/semester)."
-
-    if 'deficiencies' in question_lower and 'cleared' in question_lower and 'council' in question_lower:
-        return "All deficiencies must be cleared three (3) working days before the University-wide Academic Council meeting."
+                    return definition
+    return answer
 
-    if 'transferee' in question_lower and 'honors' in question_lower and ('residency' in question_lower or 'additional' in question_lower):
-        return "For transferees to graduate with honors at PRMSU, they must meet additional requirements beyond GWA: 1) Complete all academic units at PRMSU (residency requirement), 2) Carry the regular academic load throughout their studies, 3) Finish within the prescribed time frame for their program, and 4) Have no failing grades, incomplete grades, or disciplinary violations on record. Those meeting GWA requirements but not residency or load requirements receive a Certificate of Graduation with Academic Distinction instead."
-
-    if 'outbound cross' in question_lower and 'approve' in question_lower:
-        return "Outbound cross-enrolment requests must be approved by the Dean and Registrar. This is generally allowed only when the course or subject is not offered at PRMSU during the specific academic year and term, the host school has a comparable standard of education, and typically only general education subjects are permitted."
-
-    if 'liquor' in question_lower and 'related' in question_lower and 'violation' in question_lower:
-        return "PRMSU's liquor-related offense policy covers multiple violations: entering the university intoxicated, possessing alcohol on campus, using alcohol on campus, selling alcohol on campus, and consuming alcohol on campus. All these violations carry progressive penalties."
-
-    if 'private scholarship' in question_lower and ('gwa' in question_lower or 'average' in question_lower):
-        return "Private scholarship applicants at PRMSU must maintain a minimum General Weighted Average (GWA) of 1.75. Additional academic conditions include: being officially enrolled, demonstrating good moral character, and having no failing or incomplete grades on record."
-
-    if any(word in question_lower for word in ['where', 'located']) and 'prmsu' in question_lower:
-        return "📍 **University Location:**\nPresident Ramon Magsaysay State University (PRMSU) is located in Iba, Zambales, Philippines. The university has seven campuses throughout Zambales province."
-
-    # Clean up any remaining truncation issues
+def remove_sentence_fragments(answer: str) -> str:
+    """Drop very short sentence fragments and make sure the answer ends with a period."""
     if answer and len(answer) > 10:
         # Remove incomplete sentences at the end
         sentences = answer.split('.')
@@ -210,19 +115,155 @@ def enhance_response_specificity(question: str, answer: str, search_results: Lis
             result = '. '.join(complete_sentences)
             if not result.endswith('.'):
                 result += '.'
-            answer = result
+            return result
+
+    return answer
+
+@timed("enhance")
+def enhance_response_specificity(question: str, answer: str, search_results: List[Dict]) -> str:
+    """
+    Post-process the answer to make it more specific and prevent truncation.
+    """
+    # First, validate if the question is PRMSU-related
+    if not validate_prmsu_relevance(question):
+        return "🚫 **Sorry, I can only answer questions related to PRMSU (President Ramon Magsaysay State University) student handbook.**\n\nI cannot help with:\n• Math calculations or general knowledge\n• Weather, news, or entertainment topics\n• Other universities or non-academic subjects\n• Personal advice or general information\n\nPlease ask about:\n• PRMSU policies and regulations\n• Academic requirements and procedures\n• Student services and programs\n• University information and guidelines\n\n**Example questions:**\n• 'What are the admission requirements for PRMSU?'\n• 'What is the grading system at PRMSU?'\n• 'What are the scholarship requirements?'"
+
+    # Fix truncation issues first - if answer ends abruptly, try to complete it
+    answer = complete_truncated_answer(answer, search_results)
+
+    # Specific question handlers with complete answers
+    canned = match_question(question).first(CANNED_ANSWER)
+    if canned:
+        return canned.payload
+
+    # Clean up any remaining truncation issues
+    answer = remove_sentence_fragments(answer)
 
     # Apply user-friendly formatting
     formatted_answer = format_user_friendly_response(answer, question)
     return formatted_answer
 
+def find_canned_answer(question: str) -> Optional[str]:
+    """
+    Return the hardcoded answer (or off-topic notice) for a question, if one applies.
+    These answers don't depend on search results or the AI output.
+    """
+    # With an empty answer only the validation and specific question handlers can produce text
+    return enhance_response_specificity(question, '', []) or None
+
+
+def _topic_bucket(topic_id: Optional[str], term_lower: str) -> int:
+    """Position of a result under the matched search topic rule: lower buckets come first."""
+    if topic_id == 'search.graduation_honors':
+        # Graduation policies first, athlete requirements last
+        return 0 if 'graduation' in term_lower else 2 if 'athlete' in term_lower else 1
+    if topic_id == 'search.grading_system':
+        return 0 if 'grading system' in term_lower else 1
+    if topic_id == 'search.attendance':
+        return 0 if 'attendance' in term_lower else 1
+    if topic_id == 'search.requirements':
+        return 0 if 'requirements' in term_lower else 1
+    if topic_id == 'search.admission':
+        # General admission, then admission requirements, then the rest
+        return 1 if 'requirements' in term_lower else 0 if 'admission' in term_lower else 2
+    return 0
+
+
+def _lowered(result: Dict, field: str) -> str:
+    """Lowercase 'term' or 'definition' of a search result, using the form DefinitionChunker precomputed."""
+    value = result.get(f'{field}_lower')
+    return value if value is not None else result.get(field, '').lower()
+
+
+def _result_key(result: Dict) -> Tuple:
+    """Hashable identity of a search result; duplicate chunks with the same content share one."""
+    return (result.get('term'), result.get('definition'), result.get('source'), result.get('document'),
+            result.get('distance'))
+
+
+def rerank_results(query: str, results: List[Dict], max_results: int, match=None) -> List[Dict]:
+    """
+    Order search results for the prompt in a single stable pass.
+    Each result goes in a bucket keyed by (mentioned section, search topic rule,
+    university info / exact / partial term match); buckets are read in key order
+    and keep search order inside. Results failing the relevance checks are only
+    used to make up at least three. `match` is the question's match_question() result.
+    """
+    query_lower = query.lower()
+    query_clean = clean_query(query)
+    query_keywords = query_clean.split()
+    if match is None:
+        match = match_question(query_lower)
+    university_info = match.first(SEARCH_UNIVERSITY_INFO)
+    topic = match.first(SEARCH_TOPIC)
+    topic_id = topic.rule_id if topic else None
+    section = match.first(SEARCH_SECTION)
+
+    buckets: Dict[Tuple[int, int, int], List[Tuple[Dict, bool]]] = {}
+    for result in results:
+        term = result.get('term', '')
+        term_lower = _lowered(result, 'term')
+        definition_lower = _lowered(result, 'definition')
+
+        # Keyword priority (university info), then exact, then partial term matches
+        if university_info and any(info in definition_lower for info in university_info.payload):
+            match_bucket = 0
+        elif term_lower == query_clean:
+            match_bucket = 1
+        elif query_clean in term_lower or term_lower in query_clean:
+            match_bucket = 2
+        else:
+            match_bucket = 3
+        section_bucket = 0 if section is None or section.payload in term.upper() else 1
+        key = (section_bucket, _topic_bucket(topic_id, term_lower), match_bucket)
+
+        # Exact and keyword priority matches always count; others need enough similarity or a query keyword
+        distance = result.get('distance', 1)
+        similarity = 1 - distance if distance is not None else 0
+        relevant = (match_bucket <= 1 or similarity > -0.3
+                    or any(keyword in definition_lower for keyword in query_keywords))
+        buckets.setdefault(key, []).append((result, relevant))
+
+    ordered = [entry for key in sorted(buckets) for entry in buckets[key]]
+    final_results = [result for result, relevant in ordered if relevant][:max_results]
+
+    # If we still don't have enough results, include the best available
+    if len(final_results) < 3 and ordered:
+        seen = {_result_key(result) for result in final_results}
+        for result, _ in ordered:
+            if _result_key(result) not in seen:
+                seen.add(_result_key(result))
+                final_results.append(result)
+                if len(final_results) >= max_results:
+                    break
+    return final_results[:max_results]
+
 
 class VectorDatabaseChatbot:
-    def __init__(self, api_key: str, db_path: str = "./vector_db", collection_name: str = "definitions"):
-        """Initialize the chatbot with Cohere API and vector database."""
+    def __init__(self, api_key: str, db_path: str = "./vector_db", collection_name: str = "definitions",
+                 search_engine: str = "chroma", embedding_cache_size: int = 10000, cohere_client=None,
+                 fetch_multiplier: Optional[int] = None, hybrid: bool = False, embedding_function=None,
+                 defer_indexes: bool = False):
+        """
+        Initialize the chatbot with Cohere API and vector database.
+        `cohere_client` replaces the real client (e.g. mock_cohere.MockCohereClient for load tests).
+        `embedding_function` and `defer_indexes` are passed to DefinitionChunker.
+        Searches fetch `fetch_multiplier` times the requested results before reordering them
+        (default 3, or 1 with `hybrid` search, whose keyword ranking already surfaces exact hits).
+        """
         try:
-            self.cohere_client = cohere.Client(api_key)
-            self.chunker = DefinitionChunker(db_path=db_path, collection_name=collection_name)
+            self.cohere_client = cohere_client if cohere_client is not None else cohere.Client(api_key)
+            # Cohere health is judged from real call outcomes; while open, answers use the fallback
+            self.cohere_breaker = CircuitBreaker("cohere")
+            self.fetch_multiplier = fetch_multiplier or (1 if hybrid else 3)
+            self.chunker = DefinitionChunker(db_path=db_path, collection_name=collection_name,
+                                             search_engine=search_engine,
+                                             embedding_cache_size=embedding_cache_size,
+                                             hybrid=hybrid,
+                                             embedding_function=embedding_function,
+                                             defer_indexes=defer_indexes)
+            # Per-thread scratch state so concurrent requests don't see each other's results
+            self._local = threading.local()
 
             print("🤖 Vector Database Chatbot initialized!")
             print("📚 Connected to vector database")
@@ -231,140 +272,56 @@ class VectorDatabaseChatbot:
         except Exception as e:
             print(f"❌ Error initializing Cohere client: {e}")
             raise
-    
-    def search_relevant_context(self, query: str, max_results: int = 8) -> List[Dict]:
+
+    @property
+    def _last_search_results(self) -> List[Dict]:
+        """Prioritized results of the last search made by the current thread."""
+        return self._local.last_search_results
+
+    @_last_search_results.setter
+    def _last_search_results(self, results: List[Dict]):
+        self._local.last_search_results = results
+
+    @property
+    def _last_good_matches(self) -> List[Dict]:
+        """Filtered matches of the last response generated by the current thread."""
+        return self._local.last_good_matches
+
+    @_last_good_matches.setter
+    def _last_good_matches(self, results: List[Dict]):
+        self._local.last_good_matches = results
+
+    @timed("rerank")
+    def search_relevant_context(self, query: str, max_results: int = 8,
+                                fetch_multiplier: Optional[int] = None) -> List[Dict]:
         """Search for relevant definitions in the vector database with improved matching."""
         try:
-            # Increase search results to get better matches
-            results = self.chunker.search_definitions(query, n_results=max_results * 3)
-
             # Enhanced query preprocessing
             query_lower = query.lower()
-            query_clean = query_lower.replace('what is ', '').replace('what are ', '').replace('define ', '').replace('the ', '').replace('tell me about ', '').replace('?', '').strip()
+            query_clean = clean_query(query)
+
+            # Keyword rules matched once for the whole request
+            match = match_question(query_lower)
 
             # Special handling for critical university information
-            university_info_keywords = {
-                'prmsu stands for': 'President Ramon Magsaysay State University',
-                'what does prmsu stand for': 'President Ramon Magsaysay State University',
-                'prmsu meaning': 'President Ramon Magsaysay State University',
-                'when was prmsu established': 'April 20, 2018',
-                'prmsu establishment': 'April 20, 2018',
-                'how many campuses': 'seven campuses',
-                'number of campuses': 'seven campuses',
-                'campus count': 'seven campuses'
-            }
-
-            # Check for exact or near-exact term matches
-            exact_matches = []
-            partial_matches = []
-            keyword_priority_matches = []
-            other_results = []
-
-            for result in results:
-                term_lower = result.get('term', '').lower()
-                definition_lower = result.get('definition', '').lower()
-
-                # Special priority for university basic info
-                if any(keyword in query_lower for keyword in university_info_keywords.keys()):
-                    if any(info in definition_lower for info in university_info_keywords.values()):
-                        keyword_priority_matches.append(result)
-                        continue
-
-                # Exact match - prioritize these regardless of similarity score
-                if term_lower == query_clean:
-                    exact_matches.append(result)
-                # Partial match - term contains the query or query contains the term
-                elif query_clean in term_lower or term_lower in query_clean:
-                    partial_matches.append(result)
-                else:
-                    other_results.append(result)
-
-            # Reorder results: keyword priority first, then exact matches, then partial matches, then others
-            prioritized_results = keyword_priority_matches + exact_matches + partial_matches + other_results
-
-
-
-            # Enhanced keyword-based prioritization with specific fixes
-
-            # Fix graduation honors vs athlete confusion
-            if any(word in query_lower for word in ['summa cum laude', 'magna cum laude', 'cum laude', 'graduation honors', 'honors gwa', 'gwa for honors']):
-                # Prioritize graduation policies over athlete requirements
-                graduation_results = [r for r in prioritized_results if 'graduation' in r.get('term', '').lower() or 'policies for graduation' in r.get('term', '').lower()]
-                athlete_results = [r for r in prioritized_results if 'athlete' in r.get('term', '').lower()]
-                other_results = [r for r in prioritized_results if r not in graduation_results and r not in athlete_results]
-                prioritized_results = graduation_results + other_results + athlete_results  # Put athlete results last
-
-            # Fix grading system queries
-            elif any(word in query_lower for word in ['grade range', 'grading system', '1.0 grade', '1.75 grade', 'grade equals']):
-                # Prioritize grading system results
-                grading_results = [r for r in prioritized_results if 'grading system' in r.get('term', '').lower()]
-                other_results = [r for r in prioritized_results if 'grading system' not in r.get('term', '').lower()]
-                prioritized_results = grading_results + other_results
-
-            # Fix attendance/absence percentage queries
-            elif any(word in query_lower for word in ['absence', 'absences', 'attendance', 'failing grade', '20%', 'percentage']):
-                # Prioritize class attendance results
-                attendance_results = [r for r in prioritized_results if 'attendance' in r.get('term', '').lower() or 'class attendance' in r.get('term', '').lower()]
-                other_results = [r for r in prioritized_results if 'attendance' not in r.get('term', '').lower()]
-                prioritized_results = attendance_results + other_results
-
-            # Original admission requirements logic
-            elif any(word in query_lower for word in ['admission requirements', 'requirements', 'requirements for', 'what are the requirements']):
-                # Filter and prioritize admission requirements results
-                req_results = [r for r in prioritized_results if 'requirements' in r.get('term', '').lower()]
-                other_results = [r for r in prioritized_results if 'requirements' not in r.get('term', '').lower()]
-                prioritized_results = req_results + other_results
-            elif any(word in query_lower for word in ['admission', 'admission policy', 'admission rules']) and 'requirements' not in query_lower:
-                # Filter and prioritize general admission results (not requirements)
-                adm_results = [r for r in prioritized_results if 'admission' in r.get('term', '').lower() and 'requirements' not in r.get('term', '').lower()]
-                req_results = [r for r in prioritized_results if 'requirements' in r.get('term', '').lower()]
-                other_results = [r for r in prioritized_results if 'admission' not in r.get('term', '').lower() and 'requirements' not in r.get('term', '').lower()]
-                prioritized_results = adm_results + req_results + other_results
-
-            # If user specifically mentions a section, prioritize that section
-            if 'section 1' in query_lower or 'section1' in query_lower:
-                # Filter and prioritize Section 1 results
-                section1_results = [r for r in prioritized_results if 'SECTION 1' in r.get('term', '').upper()]
-                other_results = [r for r in prioritized_results if 'SECTION 1' not in r.get('term', '').upper()]
-                prioritized_results = section1_results + other_results
-            elif 'section 2' in query_lower or 'section2' in query_lower:
-                # Filter and prioritize Section 2 results
-                section2_results = [r for r in prioritized_results if 'SECTION 2' in r.get('term', '').upper()]
-                other_results = [r for r in prioritized_results if 'SECTION 2' not in r.get('term', '').upper()]
-                prioritized_results = section2_results + other_results
-
-            # Now filter by similarity score with improved logic
-            final_results = []
-            for result in prioritized_results:
-                distance = result.get('distance', 1)
-                similarity = 1 - distance if distance is not None else 0
-                term_lower = result.get('term', '').lower()
-                definition_lower = result.get('definition', '').lower()
-
-                # Always include exact matches, regardless of similarity score
-                if term_lower == query_clean:
-                    final_results.append(result)
-                # Include keyword priority matches (university info)
-                elif result in keyword_priority_matches:
-                    final_results.append(result)
-                # Include results with key terms in definition
-                elif any(keyword in definition_lower for keyword in query_clean.split()):
-                    final_results.append(result)
-                # For other matches, use improved similarity threshold
-                elif similarity > -0.3:  # Slightly more restrictive but still lenient
-                    final_results.append(result)
-
-            # If we still don't have enough results, include the best available
-            if len(final_results) < 3 and prioritized_results:
-                for result in prioritized_results:
-                    if result not in final_results:
-                        final_results.append(result)
-                        if len(final_results) >= max_results:
-                            break
+            university_info = match.first(SEARCH_UNIVERSITY_INFO)
+
+            # Questions naming a term outright are answered from the term index, no vector search needed
+            if not university_info:
+                exact_results = self.chunker.lookup_term(query_clean, n_results=max_results)
+                if exact_results:
+                    self._last_search_results = exact_results
+                    return exact_results
+
+            # Increase search results to get better matches
+            multiplier = fetch_multiplier or self.fetch_multiplier
+            results = self.chunker.search_definitions(query, n_results=max_results * multiplier)
+
+            final_results = rerank_results(query, results, max_results, match)
 
             # Store the prioritized results for potential fallback use
-            self._last_search_results = final_results[:max_results]
-            return final_results[:max_results]
+            self._last_search_results = final_results
+            return final_results
         except Exception as e:
             print(f"Error searching database: {e}")
             return []
@@ -387,47 +344,29 @@ class VectorDatabaseChatbot:
         lines = definition.split('\n')
         query_lower = query.lower()
 
-        # Enhanced keyword mappings for more specific extraction
-        keyword_mappings = {
-            'vision statement': ['university vision', 'vision'],
-            'vision': ['university vision', 'vision'],
-            'mission statement': ['university mission', 'mission'],
-            'mission': ['university mission', 'mission'],
-            'quality policy': ['quality policy'],
-            'president': ['president', 'university president'],
-            'acronym': ['acronym', 'stands for'],
-            'establishment': ['established', 'establishment'],
-            'campus count': ['campuses', 'campus'],
-            'penalty': ['penalty', 'offense', 'suspension', 'expulsion'],
-            'requirements': ['requirements', 'must submit', 'include'],
-            'timeframe': ['weeks', 'days', 'within'],
-            'percentage': ['percent', '%'],
-            'gpa': ['gwa', 'gpa', 'cum laude', 'magna', 'summa']
-        }
-
         # First, try to find exact matches for specific queries
-        for query_keyword, line_keywords in keyword_mappings.items():
-            if query_keyword in query_lower:
-                for line in lines:
-                    line_lower = line.lower()
-                    for line_keyword in line_keywords:
-                        if line_keyword in line_lower:
-                            # For vision/mission statements, extract just the statement part
-                            if query_keyword in ['vision', 'vision statement'] and 'university vision' in line_lower:
-                                if '-' in line:
-                                    return line.split('-', 1)[-1].strip()
-                                return line.strip()
-                            elif query_keyword in ['mission', 'mission statement'] and 'university mission' in line_lower:
-                                if '-' in line:
-                                    return line.split('-', 1)[-1].strip()
-                                return line.strip()
-                            elif query_keyword == 'quality policy' and 'quality policy' in line_lower:
-                                if '-' in line:
-                                    return line.split('-', 1)[-1].strip()
-                                return line.strip()
-                            # For other specific queries, return the relevant line
-                            elif any(keyword in line_lower for keyword in line_keywords):
-                                return line.strip()
+        for rule in match_question(query_lower).in_group(EXTRACT_ITEM):
+            line_keywords = rule.payload
+            for line in lines:
+                line_lower = line.lower()
+                for line_keyword in line_keywords:
+                    if line_keyword in line_lower:
+                        # For vision/mission statements, extract just the statement part
+                        if rule.rule_id in ('extract.vision', 'extract.vision_statement') and 'university vision' in line_lower:
+                            if '-' in line:
+                                return line.split('-', 1)[-1].strip()
+                            return line.strip()
+                        elif rule.rule_id in ('extract.mission', 'extract.mission_statement') and 'university mission' in line_lower:
+                            if '-' in line:
+                                return line.split('-', 1)[-1].strip()
+                            return line.strip()
+                        elif rule.rule_id == 'extract.quality_policy' and 'quality policy' in line_lower:
+                            if '-' in line:
+                                return line.split('-', 1)[-1].strip()
+                            return line.strip()
+                        # For other specific queries, return the relevant line
+                        elif any(keyword in line_lower for keyword in line_keywords):
+                            return line.strip()
 
         # If no specific match found, return the full definition
         return definition
@@ -435,55 +374,53 @@ class VectorDatabaseChatbot:
     def apply_special_handling(self, query_lower: str, search_results: List[Dict], current_best_match) -> Dict:
         """Apply special handling logic for specific query types."""
         best_match = current_best_match
+        match = match_question(query_lower)
 
         # Special handling for cross-enrollment queries
-        if any(word in query_lower for word in ['inbound', 'outbound', 'in campus', 'out campus']):
+        if match.has('special.cross_enrolment'):
+            asked = [keyword for keyword in ('inbound', 'outbound', 'in campus', 'out campus') if keyword in match.keywords]
             for result in search_results:
-                term_lower = result.get('term', '').lower()
-                if 'inbound' in query_lower and 'inbound' in term_lower:
-                    return result
-                elif 'outbound' in query_lower and 'outbound' in term_lower:
-                    return result
-                elif 'in campus' in query_lower and 'in campus' in term_lower:
-                    return result
-                elif 'out campus' in query_lower and 'out campus' in term_lower:
-                    return result
+                term_lower = _lowered(result, 'term')
+                for keyword in asked:
+                    if keyword in term_lower:
+                        return result
 
         # Special handling for sports vs culture incentive queries
-        if any(word in query_lower for word in ['sports', 'athlete', 'winning athletes']):
+        if match.has('special.sports'):
             for result in search_results:
-                term_lower = result.get('term', '').lower()
+                term_lower = _lowered(result, 'term')
                 if 'sports' in term_lower:
                     return result
-        elif any(word in query_lower for word in ['culture', 'arts', 'cado']):
+        elif match.has('special.culture_arts'):
             for result in search_results:
-                term_lower = result.get('term', '').lower()
+                term_lower = _lowered(result, 'term')
                 if 'culture' in term_lower and 'arts' in term_lower:
                     return result
 
         # Special handling for complex multi-conditional queries
-        if any(word in query_lower for word in ['conditions', 'requirements', 'four conditions', 'five requirements', 'beyond gpa']):
+        if match.has('special.conditions'):
             # For graduation honors conditions beyond GPA
-            if 'honors' in query_lower and 'beyond' in query_lower:
+            if match.has('special.honors_beyond_gpa'):
                 for result in search_results:
-                    term_lower = result.get('term', '').lower()
+                    term_lower = _lowered(result, 'term')
                     if 'graduation honors additional conditions' in term_lower:
                         return result
             # For PWD facilities
-            elif 'facilities' in query_lower and ('disability' in query_lower or 'pwd' in query_lower):
+            elif match.has('special.pwd_facilities'):
                 for result in search_results:
-                    term_lower = result.get('term', '').lower()
+                    term_lower = _lowered(result, 'term')
                     if 'pwd campus facilities' in term_lower:
                         return result
             # For mid-year LOA rationale
-            elif 'mid-year' in query_lower and ('unnecessary' in query_lower or 'why' in query_lower):
+            elif match.has('special.midyear_rationale'):
                 for result in search_results:
-                    term_lower = result.get('term', '').lower()
+                    term_lower = _lowered(result, 'term')
                     if 'mid-year' in term_lower and 'policy' in term_lower:
                         return result
 
         return best_match
 
+    @timed("fallback")
     def create_fallback_response(self, query: str, search_results: List[Dict]) -> str:
         """Create a fallback response when AI fails or provides incomplete answers."""
         if not search_results:
@@ -492,7 +429,7 @@ class VectorDatabaseChatbot:
         # Get the best matches, prioritizing exact term matches
         response_parts = []
         query_lower = query.lower()
-        query_clean = query_lower.replace('what is ', '').replace('what are ', '').replace('define ', '').replace('the ', '').replace('tell me about ', '').replace('?', '').strip()
+        query_clean = clean_query(query)
 
         # Find the best match based on similarity and relevance
         best_match = None
@@ -501,19 +438,19 @@ class VectorDatabaseChatbot:
         # Apply special handling first
         best_match = self.apply_special_handling(query_lower, search_results, best_match)
 
-        # If no special handling match, look for exact term matches
+        # If no special handling match, look for exact term matches (same keys as the term index)
         if not best_match:
+            query_key = normalize_term(query_clean)
             for result in search_results:
-                term_lower = result.get('term', '').lower()
-                if term_lower == query_clean:
+                if query_key in term_aliases(result.get('term', '')):
                     best_match = result
                     break
 
         # If no exact match, look for keyword matches in term names with priority for exact keyword matches
         if not best_match:
             for result in search_results:
-                term_lower = result.get('term', '').lower()
-                definition_lower = result.get('definition', '').lower()
+                term_lower = _lowered(result, 'term')
+                definition_lower = _lowered(result, 'definition')
 
                 # Check for exact keyword matches first (like "inbound" in "inbound cross enrolment")
                 query_keywords = query_clean.split()
@@ -546,7 +483,7 @@ class VectorDatabaseChatbot:
         best_match = self.apply_special_handling(query_lower, search_results, best_match)
 
         # Check if this is a specific question that needs all relevant results
-        if any(word in query_lower for word in ['requirements', 'what are', 'list', 'all', 'organizations', 'groups']):
+        if match_question(query_lower).has('type.list'):
             # Include multiple relevant results, but prioritize best match
             if best_match:
                 term = best_match.get('term', 'Unknown')
@@ -562,7 +499,7 @@ class VectorDatabaseChatbot:
                     similarity = 1 - distance if distance is not None else 0
 
                     # Include if it's reasonably relevant or contains key terms
-                    if similarity > -0.2 or any(keyword in term.lower() for keyword in query_clean.split()):
+                    if similarity > -0.2 or any(keyword in _lowered(result, 'term') for keyword in query_clean.split()):
                         response_parts.append(f"**{term}**: {definition}")
         else:
             # Single best match with targeted extraction
@@ -579,27 +516,24 @@ class VectorDatabaseChatbot:
         else:
             return "I'm sorry, but I don't have any information in my database that relates to your question."
 
-    def analyze_question_with_ai(self, query: str, search_results: List[Dict]) -> str:
-        """Use AI to understand the question and find the most relevant answer from search results."""
-        if not search_results:
-            return "I'm sorry, but I don't have any information in my database that relates to your question."
-
-        # Filter out results with very low similarity scores (negative or very low positive)
-        filtered_results = []
+    def _filter_good_matches(self, search_results: List[Dict]) -> List[Dict]:
+        """Keep results with similarity > 0.05, or the single best result if none qualify."""
+        good_matches = []
         for result in search_results:
             distance = result.get('distance', 1)
             similarity = 1 - distance if distance is not None else 0
             # Only include results with similarity > 0.05 (distance < 0.95)
             if similarity > 0.05:
-                filtered_results.append(result)
+                good_matches.append(result)
 
         # If no good matches, use the best available
-        if not filtered_results and search_results:
-            filtered_results = search_results[:1]
+        if not good_matches and search_results:
+            good_matches = search_results[:1]
 
-        if not filtered_results:
-            return "I'm sorry, but I don't have any information in my database that relates to your question."
+        return good_matches
 
+    def build_prompt(self, query: str, filtered_results: List[Dict]) -> str:
+        """Build the Cohere prompt from the top filtered search results."""
         # Prepare context from filtered search results
         context_parts = []
         for i, result in enumerate(filtered_results[:3], 1):  # Use top 3 filtered results
@@ -609,8 +543,7 @@ class VectorDatabaseChatbot:
 
         context = "\n\n".join(context_parts)
 
-        try:
-            prompt = f"""You are a helpful assistant that answers questions based ONLY on the provided database information about PRMSU (President Ramon Magsaysay State University).
+        prompt = f"""You are a helpful assistant that answers questions based ONLY on the provided database information about PRMSU (President Ramon Magsaysay State University).
 
 CRITICAL RULES:
 1. Answer ONLY using information from the database entries below
@@ -648,66 +581,97 @@ USER QUESTION: {query}
 
 Based on the database entries above, provide the COMPLETE and FULL answer to the user's question. Make sure to include ALL relevant information and do not truncate your response:"""
 
-            response = self.cohere_client.chat(
-                model='command-r-08-2024',  # Latest stable model
-                message=prompt,
-                max_tokens=4000,  # Increased token limit for complete responses
-                temperature=0.1,  # Slightly increased for more natural responses while maintaining consistency
-            )
-
-            ai_response = response.text.strip()
-
-            # Improved response validation - less strict to avoid false negatives
-            is_complete = (
-                ai_response and
-                len(ai_response.strip()) > 20 and  # Minimum meaningful length
-                "don't have that specific information" not in ai_response.lower() and
-                "i don't have" not in ai_response.lower() and
-                not ai_response.strip().endswith(('and', 'or', 'the', 'of', 'in', 'to', 'for', 'with', 'by', 'from', 'as', 'at', 'on', 'are', 'is', 'was', 'were', 'have', 'has', 'had', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'must', 'shall', 'also', 'that', 'which', 'who', 'what', 'where', 'when', 'why', 'how', 'but', 'if', 'so', 'then', 'than', 'this', 'these', 'those', 'they', 'them', 'their'))
-            )
-
-            # Additional checks for obviously incomplete responses
-            if ai_response:
-                # Check if response ends abruptly with common incomplete patterns
-                incomplete_endings = [
-                    'the student must',
-                    'requirements include',
-                    'the policy states',
-                    'according to',
-                    'students are required',
-                    'the university',
-                    'prmsu requires',
-                    'applicants must'
-                ]
-
-                response_lower = ai_response.lower().strip()
-                if any(response_lower.endswith(ending) for ending in incomplete_endings):
-                    is_complete = False
-
-            # Additional validation for specific question types
-            query_lower = query.lower()
-            if any(word in query_lower for word in ['stands for', 'what does', 'acronym']):
-                # For acronym questions, ensure we have the full name
-                if 'president ramon magsaysay state university' in ai_response.lower():
-                    is_complete = True
-            elif any(word in query_lower for word in ['when', 'established', 'date']):
-                # For date questions, ensure we have a year
-                if any(year in ai_response for year in ['2018', '2017', '2019', '2020']):
-                    is_complete = True
-            elif any(word in query_lower for word in ['how many', 'number of', 'count']):
-                # For counting questions, ensure we have numbers
-                if any(num in ai_response.lower() for num in ['seven', '7', 'two', '2', 'fifteen', '15']):
-                    is_complete = True
-
-            # Validate that the AI response contains information from our database and is complete
-            if is_complete:
-                return ai_response
-            else:
-                # Use fallback method for incomplete or poor responses
-                print("⚠️ AI response was incomplete or poor quality, using fallback method")
-                # Use the prioritized results from the search function
-                prioritized_results = getattr(self, '_last_search_results', filtered_results)
-                return self.create_fallback_response(query, prioritized_results)
+        return prompt
+
+    def _cohere_chat_params(self, prompt: str) -> Dict:
+        """Model settings shared by the blocking and streaming Cohere calls."""
+        return {
+            'model': 'command-r-08-2024',  # Latest stable model
+            'message': prompt,
+            'max_tokens': 4000,  # Increased token limit for complete responses
+            'temperature': 0.1,  # Slightly increased for more natural responses while maintaining consistency
+        }
+
+    def is_complete_ai_response(self, query: str, ai_response: str) -> bool:
+        """Check whether an AI answer is complete enough to return without the fallback."""
+        # Improved response validation - less strict to avoid false negatives
+        is_complete = (
+            ai_response and
+            len(ai_response.strip()) > 20 and  # Minimum meaningful length
+            "don't have that specific information" not in ai_response.lower() and
+            "i don't have" not in ai_response.lower() and
+            not ai_response.strip().endswith(('and', 'or', 'the', 'of', 'in', 'to', 'for', 'with', 'by', 'from', 'as', 'at', 'on', 'are', 'is', 'was', 'were', 'have', 'has', 'had', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'must', 'shall', 'also', 'that', 'which', 'who', 'what', 'where', 'when', 'why', 'how', 'but', 'if', 'so', 'then', 'than', 'this', 'these', 'those', 'they', 'them', 'their'))
+        )
+
+        # Additional checks for obviously incomplete responses
+        if ai_response:
+            # Check if response ends abruptly with common incomplete patterns
+            incomplete_endings = [
+                'the student must',
+                'requirements include',
+                'the policy states',
+                'according to',
+                'students are required',
+                'the university',
+                'prmsu requires',
+                'applicants must'
+            ]
+
+            response_lower = ai_response.lower().strip()
+            if any(response_lower.endswith(ending) for ending in incomplete_endings):
+                is_complete = False
+
+        # Additional validation for specific question types
+        match = match_question(query)
+        if match.has('type.acronym'):
+            # For acronym questions, ensure we have the full name
+            if 'president ramon magsaysay state university' in ai_response.lower():
+                is_complete = True
+        elif match.has('type.date'):
+            # For date questions, ensure we have a year
+            if any(year in ai_response for year in ['2018', '2017', '2019', '2020']):
+                is_complete = True
+        elif match.has('type.count'):
+            # For counting questions, ensure we have numbers
+            if any(num in ai_response.lower() for num in ['seven', '7', 'two', '2', 'fifteen', '15']):
+                is_complete = True
+
+        return bool(is_complete)
+
+    def finalize_ai_response(self, query: str, ai_response: str, filtered_results: List[Dict]) -> str:
+        """Return the AI answer if it is complete, otherwise a fallback built from the search results."""
+        # Validate that the AI response contains information from our database and is complete
+        if self.is_complete_ai_response(query, ai_response):
+            return ai_response
+
+        # Use fallback method for incomplete or poor responses
+        print("⚠️ AI response was incomplete or poor quality, using fallback method")
+        # Use the prioritized results from the search function
+        prioritized_results = getattr(self, '_last_search_results', filtered_results)
+        return self.create_fallback_response(query, prioritized_results)
+
+    def analyze_question_with_ai(self, query: str, search_results: List[Dict]) -> str:
+        """Use AI to understand the question and find the most relevant answer from search results."""
+        if not search_results:
+            return "I'm sorry, but I don't have any information in my database that relates to your question."
+
+        # Filter out results with very low similarity scores (negative or very low positive)
+        filtered_results = self._filter_good_matches(search_results)
+
+        if not filtered_results:
+            return "I'm sorry, but I don't have any information in my database that relates to your question."
+
+        try:
+            prompt = self.build_prompt(query, filtered_results)
+            self.cohere_breaker.before_call()
+            try:
+                with span("cohere"):
+                    response = self.cohere_client.chat(**self._cohere_chat_params(prompt))
+            except Exception as e:
+                self.cohere_breaker.record_failure(e)
+                raise
+            self.cohere_breaker.record_success()
+            return self.finalize_ai_response(query, response.text.strip(), filtered_results)
 
         except Exception as e:
             print(f"❌ AI analysis failed: {e}")
@@ -721,16 +685,7 @@ Based on the database entries above, provide the COMPLETE and FULL answer to the
             return "I'm sorry, but I don't have any information in my database that relates to your question. Please ask about topics that are stored in the vector database."
 
         # Filter out very poor matches before processing
-        good_matches = []
-        for result in search_results:
-            distance = result.get('distance', 1)
-            similarity = 1 - distance if distance is not None else 0
-            if similarity > 0.05:  # Only include reasonably good matches
-                good_matches.append(result)
-
-        # If no good matches, use the best available
-        if not good_matches and search_results:
-            good_matches = search_results[:1]
+        good_matches = self._filter_good_matches(search_results)
 
         if not good_matches:
             return "I'm sorry, but I don't have any information in my database that relates to your question."
@@ -748,17 +703,17 @@ Based on the database entries above, provide the COMPLETE and FULL answer to the
         # Use prioritized results if available
         prioritized_results = getattr(self, '_last_search_results', good_matches)
         best_match = prioritized_results[0] if prioritized_results else good_matches[0]
-        similarity = 1 - best_match.get('distance', 1) if best_match.get('distance') else 0
+        similarity = 1 - best_match.get('distance', 1) if best_match.get('distance') is not None else 0
 
         # Enhanced confidence scoring and warnings
-        query_clean = query.lower().replace('what is ', '').replace('what are ', '').replace('define ', '').replace('the ', '').replace('tell me about ', '').replace('?', '').strip()
-        term_lower = best_match.get('term', '').lower()
-        definition_lower = best_match.get('definition', '').lower()
+        query_clean = clean_query(query)
+        term_lower = _lowered(best_match, 'term')
+        definition_lower = _lowered(best_match, 'definition')
 
         # Check for different types of matches
         is_exact_match = term_lower == query_clean
         is_keyword_match = any(keyword in definition_lower for keyword in query_clean.split())
-        is_university_info = any(keyword in query.lower() for keyword in ['prmsu', 'establishment', 'campus', 'stands for'])
+        is_university_info = match_question(query).has('type.university_info')
 
         # Determine confidence level
         confidence_level = "high"
@@ -777,6 +732,55 @@ Based on the database entries above, provide the COMPLETE and FULL answer to the
 
         return response
     
+    def stream_response(self, query: str, search_results: List[Dict]) -> Iterator[Dict[str, str]]:
+        """
+        Generate a response like generate_response, yielding {'type': 'token'} events as
+        Cohere streams text and finishing with one {'type': 'answer'} post-processed event.
+        """
+        canned = find_canned_answer(query)
+        if canned:
+            yield {'type': 'answer', 'text': canned}
+            return
+
+        if not search_results:
+            yield {'type': 'answer', 'text': "I'm sorry, but I don't have any information in my database that relates to your question. Please ask about topics that are stored in the vector database."}
+            return
+
+        good_matches = self._filter_good_matches(search_results)
+
+        ai_response = None
+        try:
+            prompt = self.build_prompt(query, good_matches)
+            self.cohere_breaker.before_call()
+            parts = []
+            try:
+                # Includes the time the consumer takes between tokens
+                with span("cohere"):
+                    for event in self.cohere_client.chat_stream(**self._cohere_chat_params(prompt)):
+                        if getattr(event, 'event_type', None) == 'text-generation':
+                            parts.append(event.text)
+                            yield {'type': 'token', 'text': event.text}
+            except Exception as e:
+                self.cohere_breaker.record_failure(e)
+                raise
+            self.cohere_breaker.record_success()
+            ai_response = ''.join(parts).strip()
+        except Exception as e:
+            print(f"❌ AI streaming failed: {e}")
+
+        # A generator may resume on a different worker thread than the search ran on
+        self._last_search_results = search_results
+        self._last_good_matches = good_matches
+
+        if ai_response is None:
+            response = self.create_fallback_response(query, search_results)
+        else:
+            response = self.finalize_ai_response(query, ai_response, good_matches)
+
+        # Apply enhanced specificity to prevent truncation and improve targeting
+        response = enhance_response_specificity(query, response, good_matches)
+        yield {'type': 'answer', 'text': response}
+
     def chat_loop(self):
         """Main chat loop for the terminal interface."""
         print("💬 Chat started! Type 'quit', 'exit', or 'bye' to end the conversation.")
@@ -815,7 +819,7 @@ Based on the database entries above, provide the COMPLETE and FULL answer to the
                     print(f"\n📚 Sources from database:")
                     for i, result in enumerate(search_results[:3], 1):  # Show top 3 sources
                         term = result.get('term', 'Unknown')
-                        similarity = 1 - result.get('distance', 1) if result.get('distance') else 0
+                        similarity = 1 - result.get('distance', 1) if result.get('distance') is not None else 0
                         print(f"   {i}. {term} (similarity: {similarity:.2f})")
                 
                 print("\n" + "-" * 60)
@@ -848,7 +852,7 @@ Based on the database entries above, provide the COMPLETE and FULL answer to the
             print(f"\n📚 Sources from database:")
             for i, result in enumerate(search_results[:3], 1):
                 term = result.get('term', 'Unknown')
-                similarity = 1 - result.get('distance', 1) if result.get('distance') else 0
+                similarity = 1 - result.get('distance', 1) if result.get('distance') is not None else 0
                 print(f"   {i}. {term} (similarity: {similarity:.2f})")
 
 
@@ -859,6 +863,10 @@ def main():
     parser.add_argument("--db-path", default="./vector_db", help="Path to vector database")
     parser.add_argument("--collection", default="definitions", help="Collection name")
     parser.add_argument("--question", help="Ask a single question and exit")
+    parser.add_argument("--search-engine", choices=SEARCH_ENGINES, default="chroma",
+                        help="Search with Chroma or the in-memory NumPy index")
+    parser.add_argument("--hybrid", action="store_true",
+                        help="Fuse vector search with BM25 keyword search")
     
     args = parser.parse_args()
     
@@ -867,7 +875,9 @@ def main():
         chatbot = VectorDatabaseChatbot(
             api_key=args.api_key,
             db_path=args.db_path,
-            collection_name=args.collection
+            collection_name=args.collection,
+            search_engine=args.search_engine,
+            hybrid=args.hybrid
         )
         
         # Check if database has any data
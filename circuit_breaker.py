@@ -0,0 +1,93 @@
+"""
+Circuit breaker for the Cohere API
+
+Tracks the outcome of real API calls instead of probing the service:
+- closed: calls go through; consecutive failures are counted
+- open: after too many failures calls are skipped (callers use their fallback)
+- half_open: once the reset timeout passes, one trial call decides whether to close again
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Thread-safe consecutive-failure circuit breaker."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """Open after `failure_threshold` consecutive failures; retry after `reset_timeout` seconds."""
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_started = 0.0
+        self._last_success: Optional[float] = None
+        self._last_failure: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Whether a call may be made now. Counts calls rejected while the circuit is open."""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            # Let one trial call through per reset period (also covers trials that never reported back)
+            trial_due = self._trial_started if self._state == HALF_OPEN else self._opened_at
+            if now - trial_due >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._trial_started = now
+                return True
+            self._rejected += 1
+            return False
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call should be skipped."""
+        if not self.allow_request():
+            raise CircuitOpenError(f"{self.name} circuit is open after repeated failures")
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._last_success = time.time()
+
+    def record_failure(self, error: Optional[BaseException] = None):
+        with self._lock:
+            self._consecutive_failures += 1
+            self._last_failure = time.time()
+            self._last_error = str(error)[:200] if error is not None else None
+            if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    print(f"⚠️  {self.name} circuit opened after {self._consecutive_failures} failures")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        """Current state and recent outcomes for the health endpoints."""
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "rejected": self._rejected,
+                "last_success": self._last_success,
+                "last_failure": self._last_failure,
+                "last_error": self._last_error
+            }
@@ -7,20 +7,286 @@ Usage: python definition_chunker.py
 """
 
 import argparse
+import hashlib
 import re
 import sys
-from typing import List, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 import chromadb
 from chromadb.config import Settings
-import uuid
+from chromadb.utils import embedding_functions
 import os
+import time
+
+from bm25_index import BM25Index, tokenize
+from embedding_cache import EmbeddingCache
+from term_index import NORMALIZED_VERSION, TermIndex, term_aliases
+from timings import span
+from vector_index import NumpyVectorIndex, collection_space, embedding_distances
+
+# Search engines for search_definitions: Chroma's own query path or the in-memory NumPy index
+SEARCH_ENGINES = ("chroma", "numpy")
+
+# Hybrid search: candidates taken from each ranking before fusion, and the reciprocal-rank fusion constant
+HYBRID_DEPTH = 20
+RRF_K = 60
+
+# chunk_by_sections heuristics, built once instead of for every line
+# Lines starting with these are items of a section, never headings
+NOT_HEADING_PREFIXES = ('Color', 'Gears', 'Atom', 'Books', 'Fish', 'Tree', 'Tractor', 'Column', 'Shield',
+                        'Circle', 'President', '7 Rays', 'University', 'Section', 'Applicants')
+# Lines starting with these begin a new item inside a section ("1." to "19." included)
+ITEM_START_PREFIXES = ('University Vision', 'University Mission', 'Quality Policy', 'Color', 'Gears', 'Atom',
+                       'Books', 'Fish', 'Tree', 'Tractor', 'Column', 'Shield', 'Circle', 'President',
+                       '7 Rays') + tuple(str(i) + '.' for i in range(1, 20))
+# Numbered items such as 2.5 or 2.7.9
+NUMBERED_ITEM_RE = re.compile(r'^\d+\.\d+')
+
+def chunk_content_hash(term: str, definition: str) -> str:
+    """Stable hash of a chunk's content, ignoring case and whitespace differences."""
+    normalized = f"{' '.join(term.split()).lower()}\n{' '.join(definition.split()).lower()}"
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def normalized_fields(term: str, definition: str) -> Dict[str, Any]:
+    """
+    Lowercased and tokenized forms of a chunk, stored in its metadata so searches and
+    index builds use them directly instead of re-deriving them for every request.
+    """
+    return {
+        'term_lower': term.lower(),  # Also lets delete_by_term filter case-insensitively in Chroma
+        'definition_lower': definition.lower(),
+        'term_keys': '|'.join(sorted(term_aliases(term))),  # TermIndex lookup keys
+        'keywords': ' '.join(tokenize(definition)),  # BM25 tokens of the definition
+        'normalized_version': NORMALIZED_VERSION
+    }
+
+
+def chunk_id(source: str, content_hash: str) -> str:
+    """Deterministic chunk ID, so storing the same content from the same source again overwrites it."""
+    return hashlib.sha256(f"{source}\n{content_hash}".encode('utf-8')).hexdigest()[:32]
+
+
+# Fields returned when listing definitions
+DEFINITION_FIELDS = ("id", "term", "definition", "source", "type", "full_text")
+
+
+def _parse_end_marker_section(section: str) -> Optional[Dict[str, str]]:
+    """Turn one 'end'-delimited section into a chunk, or None if it has no term and definition."""
+    section = section.strip()
+    if not section:
+        return None
+
+    # Remove any trailing 'end' text that might have been left
+    section = re.sub(r'\s*end\s*$', '', section, flags=re.IGNORECASE).strip()
+    if not section:
+        return None
+
+    # Split into lines
+    lines = section.split('\n')
+    if not lines:
+        return None
+
+    # First line should contain the term
+    first_line = lines[0].strip()
+    if not first_line:
+        return None
+
+    # Extract term from first line - look for patterns like "TERM -" or just "TERM"
+    term_match = re.match(r'^([^-]+?)(?:\s*-\s*(.*))?$', first_line)
+    if not term_match:
+        return None
+
+    term = term_match.group(1).strip()
+    first_line_def = term_match.group(2) if term_match.group(2) else ""
+
+    # Collect definition from first line (if any) and remaining lines
+    definition_parts = []
+    if first_line_def:
+        definition_parts.append(first_line_def.strip())
+
+    # Add remaining lines as definition, but skip any line that's just "end"
+    for line in lines[1:]:
+        line = line.strip()
+        if line and line.lower() != 'end':
+            definition_parts.append(line)
+
+    definition = ' '.join(definition_parts)
+
+    if term and definition:
+        return {
+            'term': term,
+            'definition': definition,
+            'full_text': section
+        }
+    return None
+
+
+def _parse_definition_block(block: str) -> Optional[Dict[str, str]]:
+    """Turn one blank-line separated block into a chunk, or None if no definition pattern matches."""
+    block = block.strip()
+    if not block:
+        return None
+
+    # Look for dash-separated definitions (TERM - Definition)
+    # Handle cases where definition might be on the same line or next line
+    if ' - ' in block:
+        # Split on the first dash that has spaces around it
+        parts = block.split(' - ', 1)
+        if len(parts) == 2:
+            term = parts[0].strip()
+            definition = parts[1].strip()
+
+            # Clean up multi-line definitions
+            definition = ' '.join(definition.split())
+
+            if term and definition:
+                return {
+                    'term': term,
+                    'definition': definition,
+                    'full_text': f"{term} - {definition}"
+                }
+
+    # Look for definitions where term ends with dash and definition is on next lines
+    # Pattern: "TERM -\nDefinition content..."
+    dash_end_match = re.match(r'^([^-\n]+)\s*-\s*\n(.+)', block, re.DOTALL)
+    if dash_end_match:
+        term = dash_end_match.group(1).strip()
+        definition = dash_end_match.group(2).strip()
+
+        # Clean up multi-line definitions
+        definition = ' '.join(definition.split())
+
+        if term and definition:
+            return {
+                'term': term,
+                'definition': definition,
+                'full_text': f"{term} - {definition}"
+            }
+
+    # Look for colon-separated definitions (TERM: Definition)
+    if ':' in block:
+        # Split on the first colon
+        parts = block.split(':', 1)
+        if len(parts) == 2:
+            term = parts[0].strip()
+            definition = parts[1].strip()
+
+            # Clean up multi-line definitions
+            definition = ' '.join(definition.split())
+
+            if term and definition:
+                return {
+                    'term': term,
+                    'definition': definition,
+                    'full_text': f"{term}: {definition}"
+                }
+
+    # Look for bold markdown definitions (**TERM**: Definition)
+    bold_match = re.match(r'^\*\*([^*]+)\*\*:\s*(.+)', block, re.DOTALL)
+    if bold_match:
+        term = bold_match.group(1).strip()
+        definition = bold_match.group(2).strip()
+
+        # Clean up multi-line definitions
+        definition = ' '.join(definition.split())
+
+        if term and definition:
+            return {
+                'term': term,
+                'definition': definition,
+                'full_text': f"**{term}**: {definition}"
+            }
+
+    # Look for numbered definitions (1. TERM: Definition)
+    numbered_match = re.match(r'^(\d+\.\s*)([^:]+):\s*(.+)', block, re.DOTALL)
+    if numbered_match:
+        term = numbered_match.group(2).strip()
+        definition = numbered_match.group(3).strip()
+
+        # Clean up multi-line definitions
+        definition = ' '.join(definition.split())
+
+        if term and definition:
+            return {
+                'term': term,
+                'definition': definition,
+                'full_text': f"{term}: {definition}"
+            }
+
+    return None
+
+
+class _EndMarkerSplitter:
+    """
+    Line-by-line equivalent of splitting on the 'end' marker regex in chunk_by_end_markers.
+    feed() returns a section once a separator is confirmed, finish() returns the last one.
+    """
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self.has_content = False
+        self.pending_end: Optional[str] = None
+
+    def feed(self, line: str) -> Optional[str]:
+        stripped = line.strip()
+        section = None
+        if self.pending_end is not None:
+            if not stripped:
+                return None
+            # More content follows, so the held 'end' line really was a separator
+            section = '\n'.join(self.lines)
+            self.lines, self.has_content, self.pending_end = [], False, None
+
+        # An 'end' line opening a section is content, and one ending the input is not a separator
+        if stripped.lower() == 'end' and self.has_content:
+            self.pending_end = line
+        else:
+            self.lines.append(line)
+            self.has_content = self.has_content or bool(stripped)
+        return section
+
+    def finish(self) -> str:
+        if self.pending_end is not None:
+            self.lines.append(self.pending_end)
+        return '\n'.join(self.lines)
+
+
+def load_embedding_function(warm_up: bool = False):
+    """
+    The embedding model Chroma uses by default. Its ONNX model is loaded (and downloaded, the
+    first time) on first use; `warm_up` does that now with a throwaway embedding.
+    """
+    embedding_function = embedding_functions.DefaultEmbeddingFunction()
+    if warm_up:
+        embedding_function(["warm up"])
+    return embedding_function
 
 
 class DefinitionChunker:
-    def __init__(self, db_path: str = "./vector_db", collection_name: str = "definitions"):
-        """Initialize the definition chunker with vector database."""
+    def __init__(self, db_path: str = "./vector_db", collection_name: str = "definitions",
+                 search_engine: str = "chroma", embedding_cache_size: int = 10000, hybrid: bool = False,
+                 embedding_function=None, defer_indexes: bool = False):
+        """
+        Initialize the definition chunker with vector database.
+        With `hybrid`, searches fuse vector results with a BM25 keyword index.
+        `embedding_function` reuses an already loaded model (see load_embedding_function).
+        With `defer_indexes`, the in-memory indexes are only built by a later build_indexes() call.
+        """
+        if search_engine not in SEARCH_ENGINES:
+            raise ValueError(f"Unknown search engine '{search_engine}', expected one of {SEARCH_ENGINES}")
         self.db_path = db_path
         self.collection_name = collection_name
+        self.search_engine = search_engine
+        self.hybrid = hybrid
+        self.vector_index = None
+        self.keyword_index = None
+        self.term_index = None
+        self.query_embedding_cache = None
+        # Callbacks notified as listener(event, ids) whenever the collection changes
+        self._change_listeners: List[Callable[[str, List[str]], None]] = []
+        # (row count, time.monotonic() when counted), reset whenever this chunker changes the collection
+        self._count_cache: Optional[Tuple[int, float]] = None
 
         try:
             # Ensure database path exists
@@ -29,19 +295,135 @@ class DefinitionChunker:
             # Initialize ChromaDB
             self.client = chromadb.PersistentClient(path=db_path)
 
+            # Same model Chroma uses by default, kept here so queries can be embedded directly
+            self.embedding_function = embedding_function or load_embedding_function()
+
             # Get or create collection
             try:
-                self.collection = self.client.get_collection(name=collection_name)
+                self.collection = self.client.get_collection(
+                    name=collection_name,
+                    embedding_function=self.embedding_function
+                )
                 print(f"✅ Using existing collection: {collection_name}")
             except Exception as e:
                 print(f"📝 Creating new collection: {collection_name}")
-                self.collection = self.client.create_collection(name=collection_name)
+                self.collection = self.client.create_collection(
+                    name=collection_name,
+                    embedding_function=self.embedding_function
+                )
                 print(f"✅ Created new collection: {collection_name}")
+
+            # Query embeddings are cached in memory and in a sqlite file inside the database folder
+            if embedding_cache_size > 0:
+                self.query_embedding_cache = EmbeddingCache(
+                    self.embed_texts,
+                    path=os.path.join(db_path, "query_embeddings.sqlite3"),
+                    max_entries=embedding_cache_size,
+                    model_name=type(self.embedding_function).__name__
+                )
+
+            if not defer_indexes:
+                self.build_indexes()
         except Exception as e:
             print(f"❌ Error initializing ChromaDB: {e}")
             raise
+
+    def build_indexes(self) -> Dict[str, float]:
+        """
+        Build the in-memory indexes: the term index, plus the NumPy index and the BM25 index when
+        enabled. They are built in parallel threads, since each mostly waits on reading the
+        collection. Returns the seconds each one took.
+        """
+        # Exact term lookups skip embedding and vector search entirely
+        builders: Dict[str, Callable[[], Any]] = {"term": lambda: TermIndex(self.collection)}
+        if self.search_engine == "numpy":
+            builders["numpy"] = lambda: NumpyVectorIndex(self.collection, index_dir=self.db_path)
+        if self.hybrid:
+            builders["bm25"] = lambda: BM25Index(self.collection)
+
+        def timed_build(build: Callable[[], Any]) -> Tuple[Any, float]:
+            started = time.perf_counter()
+            return build(), time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=len(builders), thread_name_prefix="index-build") as executor:
+            futures = {name: executor.submit(timed_build, build) for name, build in builders.items()}
+            built = {name: future.result() for name, future in futures.items()}
+
+        self.term_index = built["term"][0]
+        self.vector_index = built["numpy"][0] if "numpy" in built else None
+        self.keyword_index = built["bm25"][0] if "bm25" in built else None
+        for index in (self.term_index, self.vector_index, self.keyword_index):
+            if index is not None:
+                self.add_change_listener(index.on_change)
+        return {name: seconds for name, (_, seconds) in built.items()}
     
-    def chunk_by_end_markers(self, text: str) -> List[Dict[str, str]]:
+    def add_change_listener(self, listener: Callable[[str, List[str]], None]):
+        """
+        Register a callback run after chunks are stored ('add') or removed ('delete', 'clear'),
+        or after refresh() found changes made by another process ('reload', no IDs).
+        """
+        self._change_listeners.append(listener)
+
+    def refresh(self) -> bool:
+        """
+        Pick up chunks another process wrote to the shared NumPy index sidecar (multi-worker
+        servers, a concurrent ingest). One stat() when nothing changed; True after a reload.
+        """
+        if self.vector_index is None or not self.vector_index.refresh():
+            return False
+        self._notify_change('reload', [])
+        return True
+
+    def reopen(self):
+        """
+        Drop this process's cached Chroma state and open the database again, so writes start
+        from what other processes stored. Chroma only reads its on-disk index when a client opens.
+        """
+        self.client.clear_system_cache()
+        self.client = chromadb.PersistentClient(path=self.db_path)
+        self.collection = self.client.get_collection(name=self.collection_name,
+                                                     embedding_function=self.embedding_function)
+        for index in (self.vector_index, self.keyword_index, self.term_index):
+            if index is not None:
+                index.collection = self.collection
+        self._count_cache = None
+
+    def _notify_change(self, event: str, ids: List[str]):
+        """Tell registered listeners (caches, indexes) that the collection changed."""
+        self._count_cache = None
+        for listener in self._change_listeners:
+            try:
+                listener(event, ids)
+            except Exception as e:
+                print(f"⚠️  Change listener failed: {e}")
+
+    def cached_count(self, max_age: float = 5.0) -> Optional[int]:
+        """Row count from the last count() if it is fresher than `max_age` seconds, without touching the database."""
+        cached = self._count_cache
+        if cached is not None and time.monotonic() - cached[1] < max_age:
+            return cached[0]
+        return None
+
+    def count(self, max_age: float = 5.0) -> int:
+        """Number of stored chunks, cached for `max_age` seconds (writes from other processes show up after that)."""
+        count = self.cached_count(max_age)
+        if count is None:
+            count = self.collection.count()
+            self._count_cache = (count, time.monotonic())
+        return count
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the collection's embedding model."""
+        return [[float(value) for value in embedding] for embedding in self.embedding_function(list(texts))]
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed search queries, reusing cached embeddings of previously seen (normalized) queries."""
+        if self.query_embedding_cache is not None:
+            return self.query_embedding_cache.embed(queries)
+        return self.embed_texts(queries)
+
+    @staticmethod
+    def chunk_by_end_markers(text: str) -> List[Dict[str, str]]:
         """
         Chunk text by 'end' markers. Each chunk is separated by a line containing only 'end'.
         Extracts the term from the first line and treats the rest as definition.
@@ -52,54 +434,32 @@ class DefinitionChunker:
         sections = re.split(r'\n\s*end\s*\n', text.strip(), flags=re.IGNORECASE)
 
         for section in sections:
-            section = section.strip()
-            if not section:
-                continue
-
-            # Remove any trailing 'end' text that might have been left
-            section = re.sub(r'\s*end\s*$', '', section, flags=re.IGNORECASE).strip()
-            if not section:
-                continue
-
-            # Split into lines
-            lines = section.split('\n')
-            if not lines:
-                continue
-
-            # First line should contain the term
-            first_line = lines[0].strip()
-            if not first_line:
-                continue
-
-            # Extract term from first line - look for patterns like "TERM -" or just "TERM"
-            term_match = re.match(r'^([^-]+?)(?:\s*-\s*(.*))?$', first_line)
-            if term_match:
-                term = term_match.group(1).strip()
-                first_line_def = term_match.group(2) if term_match.group(2) else ""
-
-                # Collect definition from first line (if any) and remaining lines
-                definition_parts = []
-                if first_line_def:
-                    definition_parts.append(first_line_def.strip())
-
-                # Add remaining lines as definition, but skip any line that's just "end"
-                for line in lines[1:]:
-                    line = line.strip()
-                    if line and line.lower() != 'end':
-                        definition_parts.append(line)
-
-                definition = ' '.join(definition_parts)
-
-                if term and definition:
-                    chunks.append({
-                        'term': term,
-                        'definition': definition,
-                        'full_text': section
-                    })
+            chunk = _parse_end_marker_section(section)
+            if chunk:
+                chunks.append(chunk)
 
         return chunks
 
-    def chunk_by_definitions(self, text: str) -> List[Dict[str, str]]:
+    @staticmethod
+    def iter_chunks_by_end_markers(lines: Iterable[str]) -> Iterator[Dict[str, str]]:
+        """
+        Streaming chunk_by_end_markers: reads lines (e.g. a file object) and yields each chunk
+        as soon as its closing 'end' line is read. Only the current section is held in memory.
+        """
+        splitter = _EndMarkerSplitter()
+        for line in lines:
+            section = splitter.feed(line.rstrip('\n'))
+            if section is not None:
+                chunk = _parse_end_marker_section(section)
+                if chunk:
+                    yield chunk
+
+        chunk = _parse_end_marker_section(splitter.finish())
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def chunk_by_definitions(text: str) -> List[Dict[str, str]]:
         """
         Chunk text by definitions. Looks for patterns like:
         - Term: Definition
@@ -112,7 +472,7 @@ class DefinitionChunker:
 
         # First try the new 'end' marker format
         if 'end' in text.lower():
-            end_chunks = self.chunk_by_end_markers(text)
+            end_chunks = DefinitionChunker.chunk_by_end_markers(text)
             if end_chunks:
                 return end_chunks
 
@@ -123,116 +483,82 @@ class DefinitionChunker:
         blocks = text.split('\n\n')
 
         for block in blocks:
-            block = block.strip()
-            if not block:
-                continue
+            chunk = _parse_definition_block(block)
+            if chunk:
+                chunks.append(chunk)
 
-            # Look for dash-separated definitions (TERM - Definition)
-            # Handle cases where definition might be on the same line or next line
-            if ' - ' in block:
-                # Split on the first dash that has spaces around it
-                parts = block.split(' - ', 1)
-                if len(parts) == 2:
-                    term = parts[0].strip()
-                    definition = parts[1].strip()
-
-                    # Clean up multi-line definitions
-                    definition = ' '.join(definition.split())
+        return chunks
 
-                    if term and definition:
-                        chunks.append({
-                            'term': term,
-                            'definition': definition,
-                            'full_text': f"{term} - {definition}"
-                        })
-                        continue
-
-            # Look for definitions where term ends with dash and definition is on next lines
-            # Pattern: "TERM -\nDefinition content..."
-            dash_end_match = re.match(r'^([^-\n]+)\s*-\s*\n(.+)', block, re.DOTALL)
-            if dash_end_match:
-                term = dash_end_match.group(1).strip()
-                definition = dash_end_match.group(2).strip()
-
-                # Clean up multi-line definitions
-                definition = ' '.join(definition.split())
-
-                if term and definition:
-                    chunks.append({
-                        'term': term,
-                        'definition': definition,
-                        'full_text': f"{term} - {definition}"
-                    })
-                    continue
-
-            # Look for colon-separated definitions (TERM: Definition)
-            if ':' in block:
-                # Split on the first colon
-                parts = block.split(':', 1)
-                if len(parts) == 2:
-                    term = parts[0].strip()
-                    definition = parts[1].strip()
+    @staticmethod
+    def iter_chunks_by_definitions(lines: Iterable[str]) -> Iterator[Dict[str, str]]:
+        """
+        Streaming chunk_by_definitions with identical output. Both formats are parsed in one pass:
+        'end' marker chunks are yielded as they complete, and blank-line separated blocks are only
+        buffered until the first 'end' marker chunk shows that format applies.
+        Without any 'end' line the end-marker format treats the whole input as one section,
+        so memory then grows with the input, exactly as chunk_by_definitions behaves.
+        """
+        saw_end = False
+        end_format = False
+        splitter = _EndMarkerSplitter()
+        block_lines, block_chunks = [], []
 
-                    # Clean up multi-line definitions
-                    definition = ' '.join(definition.split())
+        def finish_block():
+            chunk = _parse_definition_block('\n'.join(block_lines))
+            if chunk:
+                block_chunks.append(chunk)
+            block_lines.clear()
 
-                    if term and definition:
-                        chunks.append({
-                            'term': term,
-                            'definition': definition,
-                            'full_text': f"{term}: {definition}"
-                        })
-                        continue
-
-            # Look for bold markdown definitions (**TERM**: Definition)
-            bold_match = re.match(r'^\*\*([^*]+)\*\*:\s*(.+)', block, re.DOTALL)
-            if bold_match:
-                term = bold_match.group(1).strip()
-                definition = bold_match.group(2).strip()
-
-                # Clean up multi-line definitions
-                definition = ' '.join(definition.split())
-
-                if term and definition:
-                    chunks.append({
-                        'term': term,
-                        'definition': definition,
-                        'full_text': f"**{term}**: {definition}"
-                    })
-                    continue
-
-            # Look for numbered definitions (1. TERM: Definition)
-            numbered_match = re.match(r'^(\d+\.\s*)([^:]+):\s*(.+)', block, re.DOTALL)
-            if numbered_match:
-                term = numbered_match.group(2).strip()
-                definition = numbered_match.group(3).strip()
-
-                # Clean up multi-line definitions
-                definition = ' '.join(definition.split())
-
-                if term and definition:
-                    chunks.append({
-                        'term': term,
-                        'definition': definition,
-                        'full_text': f"{term}: {definition}"
-                    })
-                    continue
+        for line in lines:
+            line = line.rstrip('\n')
+            saw_end = saw_end or 'end' in line.lower()
+
+            section = splitter.feed(line)
+            if section is not None:
+                chunk = _parse_end_marker_section(section)
+                if chunk:
+                    # Same choice chunk_by_definitions makes: end-marker chunks win
+                    end_format = True
+                    block_chunks.clear()
+                    yield chunk
+
+            if not end_format:
+                if line.strip():
+                    block_lines.append(line)
+                elif block_lines:
+                    finish_block()
+
+        if saw_end:
+            chunk = _parse_end_marker_section(splitter.finish())
+            if chunk:
+                end_format = True
+                yield chunk
+        if end_format:
+            return
 
-        return chunks
+        if block_lines:
+            finish_block()
+        yield from block_chunks
 
-    def chunk_by_sections(self, text: str) -> List[Dict[str, str]]:
+    @staticmethod
+    def chunk_by_sections(text: str) -> List[Dict[str, str]]:
         """
         Chunk text by sections, preserving hierarchical structure.
         Looks for main headings and groups related content under them.
         """
-        chunks = []
-        lines = text.strip().split('\n')
+        return list(DefinitionChunker.iter_chunks_by_sections(text.strip().split('\n')))
+
+    @staticmethod
+    def iter_chunks_by_sections(lines: Iterable[str]) -> Iterator[Dict[str, str]]:
+        """
+        Streaming chunk_by_sections: reads lines (e.g. a file object) and yields each section
+        once the next heading starts it. Only the current section is held in memory.
+        """
         current_section = None
         current_items = []
         current_item = ""
 
         for line in lines:
-            original_line = line
             line = line.strip()
 
             # Skip empty lines but use them to separate items
@@ -246,7 +572,7 @@ class DefinitionChunker:
             is_heading = False
 
             # Skip numbered items (like 2.5.1, 2.7.9, etc.) - these are NOT headings
-            if re.match(r'^\d+\.\d+(\.\d+)?', line):
+            if NUMBERED_ITEM_RE.match(line):
                 is_heading = False
 
             # Skip single words that might be part of content (like "BID")
@@ -260,16 +586,16 @@ class DefinitionChunker:
             # Pattern 2: Title case line that ends with colon and doesn't start with common item words
             elif (line.endswith(':') and
                   line[0].isupper() and
-                  not line.startswith(('Color', 'Gears', 'Atom', 'Books', 'Fish', 'Tree', 'Tractor', 'Column', 'Shield', 'Circle', 'President', '7 Rays', 'University', 'Section', 'Applicants')) and
-                  not re.match(r'^\d+\.\d+', line)):
+                  not line.startswith(NOT_HEADING_PREFIXES) and
+                  not NUMBERED_ITEM_RE.match(line)):
                 is_heading = True
 
             # Pattern 3: Long title-like lines (more than 8 words, all caps with colon)
             elif (len(line.split()) > 8 and
                   line.isupper() and
                   line.endswith(':') and
-                  not any(line.startswith(word) for word in ['Color', 'Gears', 'Atom', 'Books', 'Fish', 'Tree', 'Tractor', 'Column', 'Shield', 'Circle', 'President', '7 Rays', 'University', 'Section', 'Applicants']) and
-                  not re.match(r'^\d+\.\d+', line)):
+                  not line.startswith(NOT_HEADING_PREFIXES) and
+                  not NUMBERED_ITEM_RE.match(line)):
                 is_heading = True
 
             if is_heading:
@@ -283,13 +609,13 @@ class DefinitionChunker:
                     full_content = f"{current_section}\n" + "\n".join(current_items)
                     # Create a more specific section identifier to avoid confusion
                     section_id = current_section.rstrip(':').lower().replace(' ', '_')
-                    chunks.append({
+                    yield {
                         'term': current_section.rstrip(':'),  # Remove trailing colon for clean term
                         'definition': "\n".join(current_items),
                         'full_text': full_content,
                         'type': 'section',
                         'section_id': section_id  # Add unique section identifier
-                    })
+                    }
 
                 # Start new section
                 current_section = line
@@ -297,8 +623,7 @@ class DefinitionChunker:
 
             elif current_section:
                 # Check if this starts a new item (has dash or starts with key terms)
-                if (line.startswith(('University Vision', 'University Mission', 'Quality Policy', 'Color', 'Gears', 'Atom', 'Books', 'Fish', 'Tree', 'Tractor', 'Column', 'Shield', 'Circle', 'President', '7 Rays')) or
-                    line.startswith(tuple(str(i) + '.' for i in range(1, 20)))):
+                if line.startswith(ITEM_START_PREFIXES):
 
                     # Save previous item if exists
                     if current_item:
@@ -320,12 +645,12 @@ class DefinitionChunker:
                     term = parts[0].strip()
                     definition = parts[1].strip()
                     if definition:  # Only if there's actual content after colon
-                        chunks.append({
+                        yield {
                             'term': term,
                             'definition': definition,
                             'full_text': line,
                             'type': 'definition'
-                        })
+                        }
 
         # Don't forget the last item and section
         if current_item:
@@ -333,17 +658,18 @@ class DefinitionChunker:
 
         if current_section and current_items:
             full_content = f"{current_section}\n" + "\n".join(current_items)
-            chunks.append({
+            yield {
                 'term': current_section.rstrip(':'),  # Remove trailing colon for clean term
                 'definition': "\n".join(current_items),
                 'full_text': full_content,
                 'type': 'section'
-            })
-
-        return chunks
+            }
     
     def store_chunks(self, chunks: List[Dict[str, str]], source: str = "manual_input") -> int:
-        """Store chunks in the vector database."""
+        """
+        Store chunks in the vector database. IDs are derived from the source and content, so
+        storing a chunk that is already there replaces it instead of adding a duplicate.
+        """
         if not chunks:
             print("No chunks to store.")
             return 0
@@ -351,97 +677,263 @@ class DefinitionChunker:
         documents = []
         metadatas = []
         ids = []
+        seen_ids = set()
 
         for i, chunk in enumerate(chunks):
-            doc_id = str(uuid.uuid4())
+            content_hash = chunk_content_hash(chunk['term'], chunk['definition'])
+            doc_id = chunk_id(source, content_hash)
+            if doc_id in seen_ids:
+                # Same content twice in one batch
+                continue
+            seen_ids.add(doc_id)
 
             documents.append(chunk['full_text'])
             metadatas.append({
                 'term': chunk['term'],
                 'definition': chunk['definition'],
                 'source': source,
-                'chunk_index': i,
+                'chunk_index': chunk.get('chunk_index', i),
                 'type': chunk.get('type', 'definition'),
-                'section_id': chunk.get('section_id', '')  # Include section_id in metadata
+                'section_id': chunk.get('section_id', ''),  # Include section_id in metadata
+                # Hashes let re-ingestion skip unchanged files and chunks
+                'content_hash': content_hash,
+                'file_hash': chunk.get('file_hash', ''),
+                **normalized_fields(chunk['term'], chunk['definition'])
             })
             ids.append(doc_id)
 
-        # Add to collection
-        self.collection.add(
+        # Add to collection, replacing chunks with the same ID
+        self.collection.upsert(
             documents=documents,
             metadatas=metadatas,
             ids=ids
         )
+        self._notify_change('add', ids)
 
-        print(f"Stored {len(chunks)} chunks in vector database.")
-        return len(chunks)
+        print(f"Stored {len(ids)} chunks in vector database.")
+        return len(ids)
     
+    def lookup_term(self, term: str, n_results: int = 5) -> List[Dict]:
+        """
+        Chunks whose term, or its heading before a dash, is exactly `term` (case and
+        punctuation ignored), without embedding the query. Results have distance 0.
+        """
+        self.refresh()
+        with span("term_lookup"):
+            ids = self.term_index.lookup(term)[:n_results] if self.term_index is not None else []
+            if not ids:
+                return []
+            found = self.collection.get(ids=ids, include=['documents', 'metadatas'])
+            rows = {doc_id: self._format_result(doc, metadata, 0.0)
+                    for doc_id, doc, metadata in zip(found['ids'], found['documents'], found['metadatas'])}
+            return [rows[doc_id] for doc_id in ids if doc_id in rows]
+
     def search_definitions(self, query: str, n_results: int = 5) -> List[Dict]:
         """Search for definitions in the vector database."""
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results
-        )
+        self.refresh()
+        with span("embed"):
+            query_embedding = self.embed_queries([query])[0]
+        if self.keyword_index is not None:
+            return self._hybrid_search([query], [query_embedding], n_results)[0]
+        with span("vector_query"):
+            results = self._vector_query([query_embedding], n_results)
         
+        return self._format_query_results(results, 0)
+
+    def search_definitions_batch(self, queries: List[str], n_results: int = 5) -> List[List[Dict]]:
+        """
+        Search for several queries at once: one embedding call and one nearest-neighbour lookup.
+        Returns one result list per query, in input order.
+        """
+        if not queries:
+            return []
+
+        self.refresh()
+        with span("embed"):
+            embeddings = self.embed_queries(queries)
+        if self.keyword_index is not None:
+            return self._hybrid_search(queries, embeddings, n_results)
+        with span("vector_query"):
+            results = self._vector_query(embeddings, n_results)
+
+        return [self._format_query_results(results, i) for i in range(len(queries))]
+
+    def _vector_query(self, embeddings: List[List[float]], n_results: int) -> Dict:
+        """Nearest neighbours of each embedding, from the NumPy index or Chroma."""
+        if self.vector_index is not None:
+            return self.vector_index.query_batch(embeddings, n_results=n_results)
+        return self.collection.query(query_embeddings=embeddings, n_results=n_results)
+
+    def _hybrid_search(self, queries: List[str], embeddings: List[List[float]], n_results: int) -> List[List[Dict]]:
+        """
+        Fuse vector and BM25 rankings with reciprocal-rank fusion: each chunk scores
+        1 / (RRF_K + rank) in every ranking it appears in. Returns one result list per query.
+        """
+        depth = max(n_results, HYBRID_DEPTH)
+        with span("vector_query"):
+            vector_results = self._vector_query(embeddings, depth)
+
+        all_results = []
+        for i, query in enumerate(queries):
+            with span("keyword_query"):
+                keyword_hits = self.keyword_index.query(query, n_results=depth)
+
+            rows = {}
+            fused: Dict[str, float] = {}
+            vector_ids = vector_results['ids'][i] if vector_results['ids'] else []
+            for rank, (doc_id, result) in enumerate(zip(vector_ids, self._format_query_results(vector_results, i)), 1):
+                fused[doc_id] = fused.get(doc_id, 0.0) + 1 / (RRF_K + rank)
+                rows.setdefault(doc_id, result)
+            for rank, (doc_id, _) in enumerate(keyword_hits, 1):
+                fused[doc_id] = fused.get(doc_id, 0.0) + 1 / (RRF_K + rank)
+
+            # Stable sort: equal scores keep vector order
+            top = [doc_id for doc_id, _ in sorted(fused.items(), key=lambda item: -item[1])[:n_results]]
+
+            # Keyword-only hits still get a real distance for the similarity checks downstream
+            missing = [doc_id for doc_id in top if doc_id not in rows]
+            if missing:
+                extra = self.collection.get(ids=missing, include=['documents', 'metadatas', 'embeddings'])
+                distances = embedding_distances(embeddings[i], extra['embeddings'], collection_space(self.collection))
+                for doc_id, doc, metadata, distance in zip(extra['ids'], extra['documents'], extra['metadatas'], distances):
+                    rows[doc_id] = self._format_result(doc, metadata, distance)
+
+            all_results.append([rows[doc_id] for doc_id in top if doc_id in rows])
+        return all_results
+
+    def _format_query_results(self, results: Dict, query_index: int) -> List[Dict]:
+        """Turn one query's slice of a collection.query() result into search result dicts."""
         search_results = []
-        if results['documents'] and results['documents'][0]:
-            for i, doc in enumerate(results['documents'][0]):
-                metadata = results['metadatas'][0][i] if results['metadatas'] else {}
-                distance = results['distances'][0][i] if results['distances'] else None
-                
-                search_results.append({
-                    'document': doc,
-                    'term': metadata.get('term', ''),
-                    'definition': metadata.get('definition', ''),
-                    'source': metadata.get('source', ''),
-                    'distance': distance
-                })
+        if results['documents'] and results['documents'][query_index]:
+            for i, doc in enumerate(results['documents'][query_index]):
+                metadata = results['metadatas'][query_index][i] if results['metadatas'] else {}
+                distance = results['distances'][query_index][i] if results['distances'] else None
+                search_results.append(self._format_result(doc, metadata, distance))
         
         return search_results
+
+    @staticmethod
+    def _format_result(document: str, metadata: Optional[Dict], distance: Optional[float]) -> Dict:
+        metadata = metadata or {}
+        term = metadata.get('term', '')
+        definition = metadata.get('definition', '')
+        return {
+            'document': document,
+            'term': term,
+            'definition': definition,
+            # Stored by store_chunks; chunks from before --backfill-metadata are lowercased here
+            'term_lower': metadata.get('term_lower') if 'term_lower' in metadata else term.lower(),
+            'definition_lower': (metadata.get('definition_lower') if 'definition_lower' in metadata
+                                 else definition.lower()),
+            'source': metadata.get('source', ''),
+            'distance': distance
+        }
     
     def list_all_definitions(self) -> List[Dict]:
         """List all stored definitions."""
         try:
-            results = self.collection.get()
-            definitions = []
-
-            if results['documents']:
-                for i, doc in enumerate(results['documents']):
-                    metadata = results['metadatas'][i] if results['metadatas'] else {}
-                    doc_id = results['ids'][i] if results['ids'] else ''
-                    definitions.append({
-                        'id': doc_id,
-                        'term': metadata.get('term', ''),
-                        'definition': metadata.get('definition', ''),
-                        'source': metadata.get('source', ''),
-                        'type': metadata.get('type', 'definition'),
-                        'full_text': doc
-                    })
-
-            return definitions
+            return list(self.iter_definitions())
         except Exception as e:
             print(f"Error listing definitions: {e}")
             return []
 
+    def list_definitions_page(self, limit: int = 100, offset: int = 0,
+                              fields: Optional[List[str]] = None) -> List[Dict]:
+        """
+        List up to `limit` definitions starting at `offset`, in storage order.
+        `fields` picks which of DEFINITION_FIELDS to return (all by default); documents
+        are only read from Chroma when 'full_text' is requested.
+        """
+        fields = list(fields or DEFINITION_FIELDS)
+        unknown = set(fields) - set(DEFINITION_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+        include = []
+        if 'full_text' in fields:
+            include.append('documents')
+        if set(fields) & {'term', 'definition', 'source', 'type'}:
+            include.append('metadatas')
+
+        results = self.collection.get(limit=limit, offset=offset, include=include)
+        definitions = []
+        for i, doc_id in enumerate(results['ids']):
+            metadata = (results['metadatas'][i] if results.get('metadatas') else None) or {}
+            row = {
+                'id': doc_id,
+                'term': metadata.get('term', ''),
+                'definition': metadata.get('definition', ''),
+                'source': metadata.get('source', ''),
+                'type': metadata.get('type', 'definition'),
+                'full_text': results['documents'][i] if results.get('documents') else ''
+            }
+            definitions.append({field: row[field] for field in fields})
+
+        return definitions
+
+    def iter_definitions(self, fields: Optional[List[str]] = None, batch_size: int = 500,
+                         offset: int = 0) -> Iterator[Dict]:
+        """Yield definitions page by page so only one page is held in memory at a time."""
+        while True:
+            page = self.list_definitions_page(limit=batch_size, offset=offset, fields=fields)
+            yield from page
+            if len(page) < batch_size:
+                return
+            offset += len(page)
+
+    def _batch_size(self) -> int:
+        """Largest number of IDs Chroma accepts in one call."""
+        try:
+            return min(self.client.get_max_batch_size(), 5000)
+        except Exception:
+            return 5000
+
+    def delete_where(self, where: Dict) -> int:
+        """
+        Delete every chunk whose metadata matches a Chroma `where` filter, e.g. {"source": "handbook"}.
+        Only matching IDs are read, never documents or other rows.
+        """
+        return self.delete_ids(self.collection.get(where=where, include=[])['ids'])
+
+    def delete_ids(self, ids: List[str]) -> int:
+        """Delete chunks by ID in batches Chroma accepts. Returns how many IDs were deleted."""
+        if not ids:
+            return 0
+
+        batch_size = self._batch_size()
+        for start in range(0, len(ids), batch_size):
+            self.collection.delete(ids=ids[start:start + batch_size])
+        self._notify_change('delete', ids)
+        return len(ids)
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]) -> int:
+        """Replace the metadata of existing chunks without re-embedding them."""
+        if not ids:
+            return 0
+
+        batch_size = self._batch_size()
+        for start in range(0, len(ids), batch_size):
+            self.collection.update(ids=ids[start:start + batch_size],
+                                   metadatas=metadatas[start:start + batch_size])
+        self._notify_change('add', ids)
+        return len(ids)
+
     def delete_by_term(self, term: str) -> int:
         """Delete definitions by term name."""
         try:
-            # Get all documents
-            results = self.collection.get()
-            ids_to_delete = []
-
-            if results['metadatas']:
-                for i, metadata in enumerate(results['metadatas']):
-                    if metadata.get('term', '').lower() == term.lower():
-                        ids_to_delete.append(results['ids'][i])
-
-            if ids_to_delete:
-                self.collection.delete(ids=ids_to_delete)
-                print(f"Deleted {len(ids_to_delete)} definitions for term: {term}")
-                return len(ids_to_delete)
+            # term_lower covers chunks stored by this version; older chunks are matched on common casings
+            # (run --backfill-metadata once to make the match fully case-insensitive for them)
+            casings = list(dict.fromkeys([term, term.lower(), term.upper(), term.title()]))
+            deleted = self.delete_where({"$or": [
+                {"term_lower": term.lower()},
+                {"term": {"$in": casings}}
+            ]})
+
+            if deleted:
+                print(f"Deleted {deleted} definitions for term: {term}")
             else:
                 print(f"No definitions found for term: {term}")
-                return 0
+            return deleted
 
         except Exception as e:
             print(f"Error deleting by term: {e}")
@@ -451,6 +943,7 @@ class DefinitionChunker:
         """Delete a specific definition by its ID."""
         try:
             self.collection.delete(ids=[doc_id])
+            self._notify_change('delete', [doc_id])
             print(f"Deleted definition with ID: {doc_id}")
             return True
         except Exception as e:
@@ -460,22 +953,13 @@ class DefinitionChunker:
     def delete_by_source(self, source: str) -> int:
         """Delete all definitions from a specific source."""
         try:
-            # Get all documents
-            results = self.collection.get()
-            ids_to_delete = []
-
-            if results['metadatas']:
-                for i, metadata in enumerate(results['metadatas']):
-                    if metadata.get('source', '') == source:
-                        ids_to_delete.append(results['ids'][i])
-
-            if ids_to_delete:
-                self.collection.delete(ids=ids_to_delete)
-                print(f"Deleted {len(ids_to_delete)} definitions from source: {source}")
-                return len(ids_to_delete)
+            deleted = self.delete_where({"source": source})
+
+            if deleted:
+                print(f"Deleted {deleted} definitions from source: {source}")
             else:
                 print(f"No definitions found from source: {source}")
-                return 0
+            return deleted
 
         except Exception as e:
             print(f"Error deleting by source: {e}")
@@ -484,22 +968,13 @@ class DefinitionChunker:
     def delete_by_section_id(self, section_id: str) -> int:
         """Delete definitions by section_id."""
         try:
-            # Get all documents
-            results = self.collection.get()
-            ids_to_delete = []
-
-            if results['metadatas']:
-                for i, metadata in enumerate(results['metadatas']):
-                    if metadata.get('section_id', '') == section_id:
-                        ids_to_delete.append(results['ids'][i])
-
-            if ids_to_delete:
-                self.collection.delete(ids=ids_to_delete)
-                print(f"Deleted {len(ids_to_delete)} definitions for section_id: {section_id}")
-                return len(ids_to_delete)
+            deleted = self.delete_where({"section_id": section_id})
+
+            if deleted:
+                print(f"Deleted {deleted} definitions for section_id: {section_id}")
             else:
                 print(f"No definitions found for section_id: {section_id}")
-                return 0
+            return deleted
 
         except Exception as e:
             print(f"Error deleting by section_id: {e}")
@@ -508,19 +983,122 @@ class DefinitionChunker:
     def clear_all(self) -> bool:
         """Delete all definitions from the collection."""
         try:
-            # Get all IDs
-            results = self.collection.get()
-            if results['ids']:
-                self.collection.delete(ids=results['ids'])
-                print(f"Deleted all {len(results['ids'])} definitions from the database.")
-                return True
+            # Page through IDs only so memory stays bounded however large the collection is
+            batch_size = self._batch_size()
+            deleted_ids = []
+            while True:
+                ids = self.collection.get(limit=batch_size, include=[])['ids']
+                if not ids:
+                    break
+                self.collection.delete(ids=ids)
+                deleted_ids.extend(ids)
+
+            if deleted_ids:
+                self._notify_change('clear', deleted_ids)
+                print(f"Deleted all {len(deleted_ids)} definitions from the database.")
             else:
                 print("Database is already empty.")
-                return True
+            return True
         except Exception as e:
             print(f"Error clearing database: {e}")
             return False
 
+    def dedupe(self, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Collapse chunks with the same source and content into one, stored under its deterministic ID.
+        Kept chunks are moved with their existing embeddings, so nothing is re-embedded.
+        """
+        batch_size = self._batch_size()
+
+        # Group IDs by (source, content) reading IDs and metadata only
+        groups: Dict[Tuple[str, str], List[str]] = {}
+        metadata_by_id: Dict[str, Dict] = {}
+        offset = 0
+        while True:
+            page = self.collection.get(limit=batch_size, offset=offset, include=['metadatas'])
+            if not page['ids']:
+                break
+            offset += len(page['ids'])
+            for doc_id, metadata in zip(page['ids'], page['metadatas']):
+                metadata = dict(metadata or {})
+                source = str(metadata.get('source', ''))
+                content_hash = metadata.get('content_hash') or chunk_content_hash(
+                    str(metadata.get('term', '')), str(metadata.get('definition', '')))
+                groups.setdefault((source, content_hash), []).append(doc_id)
+                metadata_by_id[doc_id] = metadata
+
+        duplicate_ids, moves = [], []
+        for (source, content_hash), ids in groups.items():
+            canonical = chunk_id(source, content_hash)
+            keep = canonical if canonical in ids else ids[0]
+            duplicate_ids.extend(doc_id for doc_id in ids if doc_id != keep)
+            if keep != canonical:
+                metadata = metadata_by_id[keep]
+                metadata['content_hash'] = content_hash
+                metadata.setdefault('term_lower', str(metadata.get('term', '')).lower())
+                moves.append((keep, canonical, metadata))
+
+        summary = {
+            "chunks_before": len(metadata_by_id),
+            "duplicates_removed": len(duplicate_ids),
+            "rekeyed": len(moves),
+            "chunks_after": len(groups)
+        }
+        if dry_run:
+            print(f"Would remove {len(duplicate_ids)} duplicates and re-key {len(moves)} chunks "
+                  f"({len(metadata_by_id)} -> {len(groups)} chunks).")
+            return summary
+
+        # Copy kept chunks to their deterministic IDs, then drop the old IDs and the duplicates
+        for start in range(0, len(moves), batch_size):
+            batch = moves[start:start + batch_size]
+            old_ids = [old_id for old_id, _, _ in batch]
+            rows = self.collection.get(ids=old_ids, include=['embeddings', 'documents'])
+            row_index = {doc_id: i for i, doc_id in enumerate(rows['ids'])}
+            order = [row_index[old_id] for old_id in old_ids]
+            new_ids = [new_id for _, new_id, _ in batch]
+            self.collection.upsert(
+                ids=new_ids,
+                embeddings=[rows['embeddings'][i] for i in order],
+                documents=[rows['documents'][i] for i in order],
+                metadatas=[metadata for _, _, metadata in batch]
+            )
+            self._notify_change('add', new_ids)
+            self.delete_ids(old_ids)
+        self.delete_ids(duplicate_ids)
+
+        print(f"Removed {len(duplicate_ids)} duplicates and re-keyed {len(moves)} chunks "
+              f"({len(metadata_by_id)} -> {len(groups)} chunks).")
+        return summary
+
+    def backfill_metadata(self) -> int:
+        """Add or refresh normalized_fields() on chunks stored by older versions. Returns chunks updated."""
+        batch_size = self._batch_size()
+        updated_ids = []
+        offset = 0
+        while True:
+            page = self.collection.get(limit=batch_size, offset=offset, include=['metadatas'])
+            if not page['ids']:
+                break
+            offset += len(page['ids'])
+
+            ids, metadatas = [], []
+            for doc_id, metadata in zip(page['ids'], page['metadatas']):
+                metadata = dict(metadata or {})
+                if metadata.get('normalized_version') != NORMALIZED_VERSION:
+                    metadata.update(normalized_fields(str(metadata.get('term', '')),
+                                                      str(metadata.get('definition', ''))))
+                    ids.append(doc_id)
+                    metadatas.append(metadata)
+            if ids:
+                self.collection.update(ids=ids, metadatas=metadatas)
+                updated_ids.extend(ids)
+
+        if updated_ids:
+            # Same effect on caches and indexes as re-adding the chunks
+            self._notify_change('add', updated_ids)
+        print(f"Added normalized fields to {len(updated_ids)} definitions.")
+        return len(updated_ids)
 
 def main():
     parser = argparse.ArgumentParser(description="Chunk text by definitions and store in vector database")
@@ -534,12 +1112,27 @@ def main():
     parser.add_argument("--delete-source", help="Delete all definitions from a specific source")
     parser.add_argument("--delete-section-id", help="Delete definitions by section_id")
     parser.add_argument("--clear-all", action="store_true", help="Delete ALL definitions (use with caution)")
+    parser.add_argument("--ingest", nargs="+", metavar="PATH",
+                        help="Incrementally ingest files, directories or glob patterns (unchanged files are skipped)")
+    parser.add_argument("--workers", type=int, help="Processes used to chunk files with --ingest (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks embedded and written per batch with --ingest and --file")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Collapse duplicate chunks (same source and content) and switch them to content-based IDs")
+    parser.add_argument("--dry-run", action="store_true", help="With --dedupe, only report what would change")
+    parser.add_argument("--backfill-metadata", action="store_true",
+                        help="Add fields newer versions store (lowercased and tokenized term and definition) "
+                             "to existing definitions")
     parser.add_argument("--sections", action="store_true", help="Chunk by sections instead of individual definitions")
+    parser.add_argument("--search-engine", choices=SEARCH_ENGINES, default="chroma",
+                        help="Search with Chroma or the in-memory NumPy index")
+    parser.add_argument("--hybrid", action="store_true",
+                        help="Fuse vector search with BM25 keyword search")
 
     args = parser.parse_args()
     
     # Initialize chunker
-    chunker = DefinitionChunker(db_path=args.db_path, collection_name=args.collection)
+    chunker = DefinitionChunker(db_path=args.db_path, collection_name=args.collection,
+                                search_engine=args.search_engine, hybrid=args.hybrid)
 
     # Handle delete operations
     if args.clear_all:
@@ -550,6 +1143,20 @@ def main():
             print("Operation cancelled.")
         return
 
+    if args.ingest:
+        from ingest import IngestPipeline
+        IngestPipeline(chunker, sections=args.sections, workers=args.workers,
+                       batch_size=args.batch_size).run(args.ingest)
+        return
+
+    if args.dedupe:
+        chunker.dedupe(dry_run=args.dry_run)
+        return
+
+    if args.backfill_metadata:
+        chunker.backfill_metadata()
+        return
+
     if args.delete_term:
         chunker.delete_by_term(args.delete_term)
         return
@@ -601,8 +1208,7 @@ def main():
     # Input mode
     if args.file:
         try:
-            with open(args.file, 'r', encoding='utf-8') as f:
-                text = f.read()
+            input_file = open(args.file, 'r', encoding='utf-8')
             source = f"file:{args.file}"
         except Exception as e:
             print(f"Error reading file: {e}")
@@ -615,49 +1221,50 @@ def main():
         print("- Term - Definition")
         print("- 1. Term: Definition")
         print()
-        
-        try:
-            text = sys.stdin.read()
-            source = "manual_input"
-        except KeyboardInterrupt:
-            print("\nOperation cancelled.")
-            return
-    
-    if not text.strip():
-        print("No text provided.")
-        return
-    
-    # Process text
+        input_file = sys.stdin
+        source = "manual_input"
+
+    # Process text line by line, storing chunks in batches so a large file is never read whole
     print("Processing text...")
     if args.sections:
         print("Using section-based chunking...")
-        chunks = chunker.chunk_by_sections(text)
+        chunks = chunker.iter_chunks_by_sections(input_file)
     else:
         print("Using definition-based chunking...")
-        chunks = chunker.chunk_by_definitions(text)
-
-    if chunks:
-        if args.sections:
-            print(f"Found {len(chunks)} sections:")
-            for i, chunk in enumerate(chunks, 1):
-                chunk_type = chunk.get('type', 'definition')
-                if chunk_type == 'section':
-                    print(f"{i}. Section: {chunk['term']}")
-                    print(f"   Contains: {len(chunk['definition'].split(chr(10)))} items")
-                else:
-                    print(f"{i}. Definition: {chunk['term']}: {chunk['definition'][:100]}...")
-        else:
-            print(f"Found {len(chunks)} definitions:")
-            for i, chunk in enumerate(chunks, 1):
-                print(f"{i}. {chunk['term']}: {chunk['definition'][:100]}...")
+        chunks = chunker.iter_chunks_by_definitions(input_file)
+
+    found_count = stored_count = 0
+    batch = []
+    try:
+        for chunk in chunks:
+            # Numbered across batches, as a whole-file store would number them
+            chunk['chunk_index'] = found_count
+            found_count += 1
+            chunk_type = chunk.get('type', 'definition')
+            if chunk_type == 'section':
+                print(f"{found_count}. Section: {chunk['term']}")
+                print(f"   Contains: {len(chunk['definition'].split(chr(10)))} items")
+            else:
+                print(f"{found_count}. Definition: {chunk['term']}: {chunk['definition'][:100]}...")
+            batch.append(chunk)
+            if len(batch) >= args.batch_size:
+                stored_count += chunker.store_chunks(batch, source)
+                batch = []
+    except KeyboardInterrupt:
+        print("\nOperation cancelled.")
+        return
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
 
+    if found_count:
         # Store in database
-        stored_count = chunker.store_chunks(chunks, source)
-        print(f"\nSuccessfully stored {stored_count} chunks in vector database.")
+        stored_count += chunker.store_chunks(batch, source) if batch else 0
+        print(f"\nFound {found_count} {'sections' if args.sections else 'definitions'}; "
+              f"successfully stored {stored_count} chunks in vector database.")
     else:
         print("No definitions or sections found in the provided text.")
         print("Make sure your text follows one of the supported formats.")
 
-
 if __name__ == "__main__":
     main()
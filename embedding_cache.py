@@ -0,0 +1,184 @@
+"""
+Query embedding cache
+
+Remembers query embeddings keyed on the normalized query text so repeated
+student questions skip the embedding model:
+- memory: LRU dictionary of recent queries
+- disk: sqlite file that survives restarts, capped with oldest-first eviction.
+  It holds raw student questions, so it is not synced to S3 with the database.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from response_cache import normalize_question
+
+
+class EmbeddingCache:
+    """Thread-safe two-tier (memory LRU + sqlite) cache in front of an embedding function."""
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]],
+                 path: Optional[str] = None, max_entries: int = 10000, model_name: str = "default",
+                 max_disk_entries: Optional[int] = None):
+        """
+        Cache embeddings produced by `embed_fn` for up to `max_entries` queries in memory.
+        When `path` is given, embeddings are also kept in a sqlite file there, up to
+        `max_disk_entries` (default 10x `max_entries`), dropping the oldest beyond that.
+        """
+        self.embed_fn = embed_fn
+        self.path = path
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries if max_disk_entries is not None else max_entries * 10
+        # Approximate row count of the sqlite file; pruning recounts exactly
+        self._disk_rows = 0
+        self.model_name = model_name
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._hits_memory = 0
+        self._hits_disk = 0
+        self._misses = 0
+        self._embed_seconds = 0.0
+
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                    "model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, "
+                    "PRIMARY KEY (model, text))"
+                )
+                self._db.commit()
+                self._disk_rows = self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+                self._prune()
+            except sqlite3.Error as e:
+                print(f"⚠️  Query embedding cache file unavailable, using memory only: {e}")
+                self._db = None
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings for `texts` in input order, running the model only for unseen queries."""
+        keys = [normalize_question(text) for text in texts]
+        # The model sees the caller's text (the first one seen per key), not the normalized key
+        raw_texts: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            raw_texts.setdefault(key, text)
+        found: Dict[str, List[float]] = {}
+
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                    self._hits_memory += 1
+
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            if missing and self._db is not None:
+                for key, vector in self._load(missing).items():
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self._hits_disk += 1
+
+        # Run the model outside the lock, once for all remaining queries
+        to_embed = [key for key in dict.fromkeys(keys) if key not in found]
+        if to_embed:
+            start = time.perf_counter()
+            vectors = [[float(value) for value in vector] for vector in self.embed_fn([raw_texts[key] for key in to_embed])]
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self._misses += len(to_embed)
+                self._embed_seconds += elapsed
+                for key, vector in zip(to_embed, vectors):
+                    found[key] = vector
+                    self._remember(key, vector)
+                self._store(dict(zip(to_embed, vectors)))
+
+        return [found[key] for key in keys]
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Read cached vectors from sqlite (caller holds the lock)."""
+        loaded = {}
+        try:
+            # Stay well below sqlite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT text, vector FROM query_embeddings WHERE model = ? "
+                    f"AND text IN ({','.join('?' * len(batch))})",
+                    [self.model_name, *batch]
+                ).fetchall()
+                for text, blob in rows:
+                    loaded[text] = np.frombuffer(blob, dtype=np.float32).tolist()
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not read query embedding cache: {e}")
+        return loaded
+
+    def _store(self, vectors: Dict[str, List[float]]):
+        """Write new vectors to sqlite (caller holds the lock)."""
+        if self._db is None or not vectors:
+            return
+        try:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO query_embeddings (model, text, vector) VALUES (?, ?, ?)",
+                [(self.model_name, key, np.asarray(vector, dtype=np.float32).tobytes())
+                 for key, vector in vectors.items()]
+            )
+            self._db.commit()
+            self._disk_rows += len(vectors)
+            self._prune()
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not write query embedding cache: {e}")
+
+    def _prune(self):
+        """Drop the oldest rows once the file holds more than max_disk_entries (caller holds the lock)."""
+        if self._disk_rows <= self.max_disk_entries:
+            return
+        # Down to 90% so pruning runs once per many inserts, not on every one
+        target = int(self.max_disk_entries * 0.9)
+        # INSERT OR REPLACE gives a row a new rowid, so rowid order is write order
+        self._db.execute(
+            "DELETE FROM query_embeddings WHERE rowid IN (SELECT rowid FROM query_embeddings "
+            "ORDER BY rowid LIMIT max(0, (SELECT COUNT(*) FROM query_embeddings) - ?))",
+            (target,)
+        )
+        self._db.commit()
+        self._disk_rows = self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and estimated model time saved, for the health endpoint."""
+        with self._lock:
+            hits = self._hits_memory + self._hits_disk
+            lookups = hits + self._misses
+            seconds_per_embedding = self._embed_seconds / self._misses if self._misses else 0.0
+            return {
+                "size": len(self._memory),
+                "max_entries": self.max_entries,
+                "persistent": self._db is not None,
+                "disk_size": self._disk_rows if self._db is not None else 0,
+                "hits_memory": self._hits_memory,
+                "hits_disk": self._hits_disk,
+                "misses": self._misses,
+                "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+                "avg_embed_ms": round(seconds_per_embedding * 1000, 3),
+                "time_saved_ms": round(hits * seconds_per_embedding * 1000, 1)
+            }
+
+    def close(self):
+        """Close the sqlite file."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
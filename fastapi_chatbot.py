@@ -6,16 +6,29 @@ This FastAPI server provides REST endpoints for the chatbot functionality,
 making it accessible for Android app integration.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
 import uvicorn
+import asyncio
+import functools
 import os
+import json
+import threading
+import time
 from dotenv import load_dotenv
-from chatbot import VectorDatabaseChatbot
-from definition_chunker import DefinitionChunker
+from chatbot import VectorDatabaseChatbot, complete_truncated_answer, find_canned_answer, remove_sentence_fragments
+from circuit_breaker import OPEN as CIRCUIT_OPEN
+from definition_chunker import DEFINITION_FIELDS, DefinitionChunker, load_embedding_function
+from mock_cohere import MockCohereClient
 from s3_utils import get_s3_manager
+from write_queue import WriteQueue
+from response_cache import ResponseCache
+from rules import CANNED_ANSWER, match_question
+from thread_pool import BoundedThreadPool, PoolSaturatedError
+from timings import metric_lines, render_metrics, request_timings, span, timed
 
 # Load environment variables from .env file
 load_dotenv()
@@ -39,117 +52,109 @@ app.add_middleware(
 
 # Global chatbot instance
 chatbot = None
+# Set when several worker processes share the database (gunicorn_conf.py): writes go through the elected writer
+write_queue: Optional[WriteQueue] = None
+MULTI_WORKER = os.getenv("MULTI_WORKER", "").lower() in ("1", "true", "yes")
 
-def enhance_response_specificity(question: str, answer: str, search_results: List[Dict]) -> str:
-    """
-    Post-process the answer to make it more specific and prevent truncation.
-    """
-    question_lower = question.lower()
-
-    # Fix truncation issues first - if answer ends abruptly, try to complete it
-    if answer and not answer.strip().endswith(('.', '!', '?', ':', '%')):
-        # Try to find a complete answer from search results
-        for result in search_results:
-            definition = result.get('definition', '')
-            if definition and len(definition) > len(answer):
-                # Use the complete definition if it contains the partial answer
-                if answer.strip() in definition:
-                    answer = definition
-                    break
-
-    # Specific question handlers with complete answers
-    if 'what law' in question_lower and 'established' in question_lower:
-        return "President Ramon Magsaysay State University (PRMSU) was officially established by Republic Act No. 11015 on April 20, 2018."
+# Answer cache, created once the chatbot (and its embedding model) is ready
+response_cache: Optional[ResponseCache] = None
 
-    if 'four types' in question_lower and 'cross' in question_lower:
-        return "The four types of cross-enrolment at PRMSU are: 1) Inbound Cross Enrolment (students from other institutions enrolling at PRMSU), 2) Outbound Cross Enrolment (PRMSU students enrolling in external institutions), 3) In-Campus Cross Enrolment (PRMSU students enrolling in different colleges within the same campus), and 4) Out-Campus Cross Enrolment (PRMSU students enrolling in another PRMSU campus)."
+# Background warm-up progress: "warming" until the chatbot is loaded, then "ready" or "failed".
+# `phases` holds the seconds spent in each startup phase.
+startup_state: Dict[str, Any] = {"status": "warming", "phases": {}, "error": None}
+warmup_task: Optional[asyncio.Task] = None
 
-    if 'how many units' in question_lower and 'midyear' in question_lower:
-        return "Students may take a maximum of 9 units during midyear classes. Graduating students may overload up to 12 units only with approval from the Registrar upon recommendation of the Dean. Students with academic deficiencies are not allowed to overload."
+# How chat answers were produced: direct_answer, cache_exact, cache_semantic or pipeline
+served_by_counts: Dict[str, int] = {}
 
-    if 'consequence' in question_lower and '20%' in question_lower and 'absence' in question_lower:
-        return "Students who accumulate 20% unexcused absences in any subject automatically receive a grade of 5.0 (failing grade) for that subject."
-
-    if 'prescribed uniform' in question_lower or ('uniform' in question_lower and ('male' in question_lower or 'female' in question_lower)):
-        return "Male students must wear white polo shirt, black pants, and black formal shoes. Female students must wear blue skirt or blue slacks, white blouse, necktie, and black shoes. LGBTQ+ policy: Women members may wear slacks, blouse, and necktie combination, but men members are NOT permitted to wear skirts."
-
-    if 'what grade' in question_lower and 'transferee' in question_lower:
-        return "Transferee students must have earned a minimum grade of 3.0 or its equivalent in their previous school for their courses to be accredited at PRMSU. The course content and unit weight must also be equivalent to PRMSU standards."
-
-    if 'grounds for termination' in question_lower and 'scholarship' in question_lower:
-        return "Grounds for termination of scholarship or financial assistance include: 1) Failure to maintain the required GWA, 2) Dropping out without proper notice, 3) Carrying fewer units than prescribed, 4) Failure to comply with reapplication requirements, and 5) Violation of university rules and regulations."
-
-    if 'maximum number of hours' in question_lower and 'student assistant' in question_lower:
-        return "Student assistants receive ₱25.00 per hour and may work a maximum of 100 hours per month, subject to COA rules. Requirements include: must be officially enrolled, possess relevant skills, maintain good grades, demonstrate good moral character, submit resume, recent grades, certificate of registration, ID photo, class schedule, and parental consent. The program is limited to 50 assistants per semester, and poor performance automatically disqualifies students from reapplication."
-
-    if 'penalty' in question_lower and 'liquor' in question_lower:
-        if 'first offense' in question_lower:
-            return "First offense for being under the influence of liquor on campus results in 15 days suspension, 12 hours of transformative experience, and mandatory guidance intervention."
-        elif 'second offense' in question_lower:
-            return "Second offense for liquor-related violations at PRMSU results in 30 days suspension, 24 hours of transformative experience, and continued guidance intervention."
-        elif 'third offense' in question_lower:
-            return "Third offense for liquor-related violations at PRMSU results in one-year suspension from the university."
-        else:
-            # If no specific offense number mentioned, provide all penalties
-            return "PRMSU liquor-related offenses carry progressive penalties: First offense: 15 days suspension, 12 hours transformative experience, mandatory guidance intervention. Second offense: 30 days suspension, 24 hours transformative experience, continued guidance intervention. Third offense: One-year suspension."
-
-    if 'honors' in question_lower and 'graduating' in question_lower and 'gwa' in question_lower:
-        return "Three honors are awarded to graduating students: 1) Summa Cum Laude requires 1.0-1.25 GWA with no grade below 1.5, 2) Magna Cum Laude requires 1.26-1.5 GWA with no grade below 1.75, and 3) Cum Laude requires 1.51-1.75 GWA with no grade below 2.0."
-
-    # Advanced question handlers
-    if 'maximum number of hours' in question_lower and 'semester' in question_lower and 'student assistant' in question_lower:
-        return "Student assistants work a maximum of 100 hours per month. In a typical 4-month semester, this equals approximately 400 hours per semester (100 hours/month × 4 months = 400 hours/semester)."
+# Blocking work (Chroma queries, Cohere calls) runs here so the event loop stays free
+blocking_pool = BoundedThreadPool(
+    max_workers=int(os.getenv("CHAT_MAX_CONCURRENCY", "32")),
+    max_queue=int(os.getenv("CHAT_MAX_QUEUE", "256"))
+)
 
-    if 'deficiencies' in question_lower and 'cleared' in question_lower and 'council' in question_lower:
-        return "All deficiencies must be cleared three (3) working days before the University-wide Academic Council meeting."
+# Largest page served by /definitions and /definitions/stream
+MAX_DEFINITIONS_PAGE = 1000
 
-    if 'transferee' in question_lower and 'honors' in question_lower and ('residency' in question_lower or 'additional' in question_lower):
-        return "For transferees to graduate with honors at PRMSU, they must meet additional requirements beyond GWA: 1) Complete all academic units at PRMSU (residency requirement), 2) Carry the regular academic load throughout their studies, 3) Finish within the prescribed time frame for their program, and 4) Have no failing grades, incomplete grades, or disciplinary violations on record. Those meeting GWA requirements but not residency or load requirements receive a Certificate of Graduation with Academic Distinction instead."
+# Fields /definitions returns unless a projection is requested
+DEFAULT_DEFINITION_FIELDS = ("id", "term", "definition", "source", "type")
 
-    if 'outbound cross' in question_lower and 'approve' in question_lower:
-        return "Outbound cross-enrolment requests must be approved by the Dean and Registrar. This is generally allowed only when the course or subject is not offered at PRMSU during the specific academic year and term, the host school has a comparable standard of education, and typically only general education subjects are permitted."
+# Upper bound on queries accepted by /search/batch in one request
+MAX_BATCH_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "64"))
 
-    if 'liquor' in question_lower and 'related' in question_lower and 'violation' in question_lower:
-        return "PRMSU's liquor-related offense policy covers multiple violations: entering the university intoxicated, possessing alcohol on campus, using alcohol on campus, selling alcohol on campus, and consuming alcohol on campus. All these violations carry progressive penalties."
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the bounded pool, answering 503 when the queue is full."""
+    try:
+        return await blocking_pool.run(func, *args, **kwargs)
+    except PoolSaturatedError:
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly")
 
-    if 'private scholarship' in question_lower and ('gwa' in question_lower or 'average' in question_lower):
-        return "Private scholarship applicants at PRMSU must maintain a minimum General Weighted Average (GWA) of 1.75. Additional academic conditions include: being officially enrolled, demonstrating good moral character, and having no failing or incomplete grades on record."
+async def iterate_blocking(iterator):
+    """
+    Yield the items of a blocking iterator (e.g. a Cohere stream). The whole iteration is one
+    pool job that hands items to the event loop as they arrive, so a busy pool can only refuse
+    a stream before it starts, and items don't each wait for a worker.
+    """
+    loop = asyncio.get_running_loop()
+    items: asyncio.Queue = asyncio.Queue()
+    finished = object()
+    stopped = threading.Event()
 
-    if any(word in question_lower for word in ['where', 'located']) and 'prmsu' in question_lower:
-        return "📍 **University Location:**\nPresident Ramon Magsaysay State University (PRMSU) is located in Iba, Zambales, Philippines. The university has seven campuses throughout Zambales province."
+    def produce():
+        try:
+            for item in iterator:
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(items.put_nowait, item)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    job = asyncio.ensure_future(run_blocking(produce))
+    # Queued after every item the job delivered, and also when the pool refused the job
+    job.add_done_callback(lambda _: items.put_nowait(finished))
+    try:
+        while True:
+            item = await items.get()
+            if item is finished:
+                break
+            yield item
+        # Re-raise what stopped the iteration (a Cohere error, a full pool)
+        await job
+    finally:
+        # The client went away: stop pulling from the iterator
+        stopped.set()
+
+@timed("enhance")
+def enhance_response_specificity(question: str, answer: str, search_results: List[Dict]) -> str:
+    """
+    Post-process the answer to make it more specific and prevent truncation.
+    """
+    # Fix truncation issues first - if answer ends abruptly, try to complete it
+    answer = complete_truncated_answer(answer, search_results)
 
-    if any(word in question_lower for word in ['stands for', 'acronym', 'what does']) and 'prmsu' in question_lower:
-        return "🏫 **PRMSU** stands for:\n**President Ramon Magsaysay State University**\n\n📍 The main campus is located in **Iba, Zambales**."
+    # Specific question handlers with complete answers
+    canned = match_question(question).first(CANNED_ANSWER)
+    if canned:
+        return canned.payload
 
     # Clean up any remaining truncation issues
-    if answer and len(answer) > 10:
-        # Remove incomplete sentences at the end
-        sentences = answer.split('.')
-        complete_sentences = []
-
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if sentence and len(sentence) > 5:  # Avoid very short fragments
-                complete_sentences.append(sentence)
-
-        if complete_sentences:
-            result = '. '.join(complete_sentences)
-            if not result.endswith('.'):
-                result += '.'
-            return result
-
-    return answer
+    return remove_sentence_fragments(answer)
 
 # Pydantic models for request/response
 class ChatRequest(BaseModel):
     question: str
     max_results: Optional[int] = 8
+    include_timings: Optional[bool] = False
 
 class ChatResponse(BaseModel):
     answer: str
     sources: List[Dict[str, Any]]
     success: bool
     message: Optional[str] = None
+    served_by: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None
 
 class SearchRequest(BaseModel):
     query: str
@@ -160,10 +165,24 @@ class SearchResponse(BaseModel):
     success: bool
     message: Optional[str] = None
 
+class SearchBatchRequest(BaseModel):
+    queries: List[str]
+    max_results: Optional[int] = 5
+
+class SearchBatchResponse(BaseModel):
+    results: List[List[Dict[str, Any]]]
+    success: bool
+    message: Optional[str] = None
+
 class HealthResponse(BaseModel):
     status: str
     database_count: int
     api_connected: bool
+    executor: Optional[Dict[str, int]] = None
+    response_cache: Optional[Dict[str, Any]] = None
+    embedding_cache: Optional[Dict[str, Any]] = None
+    served_by: Optional[Dict[str, int]] = None
+    cohere: Optional[Dict[str, Any]] = None
 
 class AddDefinitionRequest(BaseModel):
     term: str
@@ -174,67 +193,136 @@ class AddDefinitionResponse(BaseModel):
     success: bool
     message: str
 
-# Initialize chatbot on startup
-@app.on_event("startup")
-async def startup_event():
-    global chatbot
+def _timed_phase(name: str, func, *args, **kwargs):
+    """Run one startup phase, logging and recording how long it took."""
+    started = time.perf_counter()
     try:
-        # Get configuration from environment variables
-        api_key = os.getenv("COHERE_API_KEY")
-        if not api_key:
-            raise ValueError("COHERE_API_KEY environment variable is not set")
+        return func(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - started
+        startup_state["phases"][name] = round(seconds, 3)
+        print(f"⏱️  Startup phase {name}: {seconds:.2f}s")
+
+def _restore_database(db_path: str):
+    # Download database from S3 if available (once, in the gunicorn master, in multi-worker mode)
+    s3_manager = get_s3_manager()
+    if s3_manager.enabled and not MULTI_WORKER:
+        print("📥 Attempting to download database from S3...")
+        s3_manager.download_database(db_path)
+
+    # Create database directory if it doesn't exist
+    if not os.path.exists(db_path):
+        print(f"📁 Creating database directory...")
+        os.makedirs(db_path, exist_ok=True)
+
+async def warm_up(config: Dict[str, Any]):
+    """
+    Load everything the chatbot needs without holding up the server. The S3 restore and the
+    embedding model load run at the same time, then Chroma is opened and the in-memory indexes
+    are built. Requests get 503 and /health/ready reports "warming" until this finishes.
+    """
+    global chatbot, response_cache, write_queue
+    loop = asyncio.get_running_loop()
 
-        db_path = os.getenv("DB_PATH", "./vector_db")
-        collection_name = os.getenv("COLLECTION_NAME", "definitions")
+    def in_thread(name: str, func, *args, **kwargs):
+        return loop.run_in_executor(None, functools.partial(_timed_phase, name, func, *args, **kwargs))
 
-        print(f"📁 Using database path: {db_path}")
-        print(f"📚 Using collection: {collection_name}")
+    started = time.perf_counter()
+    try:
+        db_path = config["db_path"]
+        _, embedding_function = await asyncio.gather(
+            in_thread("s3_restore", _restore_database, db_path),
+            in_thread("embedding_model", load_embedding_function, warm_up=True)
+        )
 
-        # Download database from S3 if available
-        s3_manager = get_s3_manager()
-        if s3_manager.enabled:
-            print("📥 Attempting to download database from S3...")
-            s3_manager.download_database(db_path)
-
-        # Create database directory if it doesn't exist
-        if not os.path.exists(db_path):
-            print(f"📁 Creating database directory...")
-            os.makedirs(db_path, exist_ok=True)
-
-        chatbot = VectorDatabaseChatbot(
-            api_key=api_key,
-            db_path=db_path,
-            collection_name=collection_name
+        bot = await in_thread("chroma_open", VectorDatabaseChatbot, embedding_function=embedding_function,
+                              defer_indexes=True, **config)
+        index_seconds = await in_thread("index_warmup", bot.chunker.build_indexes)
+        for name, seconds in index_seconds.items():
+            startup_state["phases"][f"index_warmup.{name}"] = round(seconds, 3)
+
+        # Cache answers and drop them whenever the collection changes
+        response_cache = ResponseCache(
+            max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1000")),
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+            similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.97")),
+            embed_fn=lambda text: bot.chunker.embed_queries([text])[0]
         )
-        print("✅ Chatbot initialized successfully")
+        bot.chunker.add_change_listener(response_cache.invalidate)
 
-        # Check database content
-        try:
-            definitions = chatbot.chunker.list_all_definitions()
-            print(f"📊 Database contains {len(definitions)} definitions")
-        except Exception as db_error:
-            print(f"⚠️  Warning: Could not list definitions: {db_error}")
-            print(f"📊 Database may be empty or corrupted")
+        print(f"📊 Database contains {bot.chunker.count()} definitions")
+        chatbot = bot
+
+        if MULTI_WORKER:
+            # Started last: queued writes are applied through the global chatbot
+            write_queue = WriteQueue(db_path)
+            write_queue.start({"store_chunks": apply_store_chunks}, on_elected=bot.chunker.reopen)
+        startup_state["status"] = "ready"
+        print(f"✅ Chatbot ready after {time.perf_counter() - started:.2f}s of warm-up")
 
     except Exception as e:
+        startup_state["status"] = "failed"
+        startup_state["error"] = str(e)
         print(f"❌ Error initializing chatbot: {e}")
         import traceback
         traceback.print_exc()
-        raise
+
+# Check configuration on startup and load the chatbot in the background
+@app.on_event("startup")
+async def startup_event():
+    global warmup_task
+    # Get configuration from environment variables
+    api_key = os.getenv("COHERE_API_KEY")
+    # Local stand-in for load tests: no API key or quota needed
+    cohere_client = None
+    if os.getenv("COHERE_MOCK", "").lower() in ("1", "true", "yes"):
+        cohere_client = MockCohereClient.from_env()
+        print("🧪 Using mock Cohere client (COHERE_MOCK)")
+    elif not api_key:
+        raise ValueError("COHERE_API_KEY environment variable is not set")
+
+    db_path = os.getenv("DB_PATH", "./vector_db")
+    collection_name = os.getenv("COLLECTION_NAME", "definitions")
+    search_engine = os.getenv("SEARCH_ENGINE", "chroma")
+    if MULTI_WORKER and search_engine != "numpy":
+        # Chroma's in-memory index goes stale when another worker writes; the NumPy sidecar is shared
+        print(f"🔀 Multi-worker mode: using the shared NumPy index instead of '{search_engine}'")
+        search_engine = "numpy"
+    hybrid = os.getenv("SEARCH_HYBRID", "").lower() in ("1", "true", "yes")
+
+    print(f"📁 Using database path: {db_path}")
+    print(f"📚 Using collection: {collection_name}")
+    print(f"🔎 Using search engine: {search_engine}{' + BM25 keyword fusion' if hybrid else ''}")
+
+    warmup_task = asyncio.create_task(warm_up({
+        "api_key": api_key,
+        "db_path": db_path,
+        "collection_name": collection_name,
+        "search_engine": search_engine,
+        "embedding_cache_size": int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+        "cohere_client": cohere_client,
+        "fetch_multiplier": int(os.getenv("SEARCH_FETCH_MULTIPLIER") or 0) or None,
+        "hybrid": hybrid
+    }))
 
 # Upload database to S3 on shutdown
 @app.on_event("shutdown")
 async def shutdown_event():
     """Upload database to S3 before shutdown."""
     try:
+        if write_queue is not None:
+            write_queue.stop()
         db_path = os.getenv("DB_PATH", "./vector_db")
         s3_manager = get_s3_manager()
-        if s3_manager.enabled:
+        # A database still being restored, or one that failed to load, is not worth backing up
+        if s3_manager.enabled and not MULTI_WORKER and startup_state["status"] == "ready":
             print("📤 Uploading database to S3 before shutdown...")
             s3_manager.upload_database(db_path)
             print("✅ Database uploaded to S3")
     except Exception as e:
         print(f"⚠️  Warning: Could not upload database to S3: {e}")
+    finally:
+        blocking_pool.shutdown()
 
 @app.get("/", response_model=dict)
 async def root():
@@ -244,53 +332,106 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "chat": "/chat - POST - Ask a question to the chatbot",
+            "chat_stream": "/chat/stream - POST - Ask a question, answer streamed as server-sent events",
             "search": "/search - POST - Search the vector database",
+            "search_batch": "/search/batch - POST - Search the vector database for several queries at once",
             "health": "/health - GET - Check API health and database status",
-            "definitions": "/definitions - GET - List all definitions",
+            "health_live": "/health/live - GET - Liveness probe (process is up)",
+            "health_ready": "/health/ready - GET - Readiness probe (chatbot loaded, database count, Cohere circuit)",
+            "metrics": "/metrics - GET - Request and pipeline stage latency histograms (Prometheus text format)",
+            "definitions": "/definitions - GET - List definitions (optional limit/offset/fields paging)",
+            "definitions_stream": "/definitions/stream - GET - Stream all definitions as NDJSON",
             "add_definition": "/add_definition - POST - Add a new definition"
         }
     }
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint."""
+    """Health check endpoint. Never calls Cohere or reads the whole database."""
     global chatbot
     
     if not chatbot:
         raise HTTPException(status_code=503, detail="Chatbot not initialized")
     
     try:
-        # Check database connection and count
-        definitions = chatbot.chunker.list_all_definitions()
-        database_count = len(definitions)
-        
-        # Test API connection with a simple query
-        api_connected = True
-        try:
-            # Simple test to verify Cohere API is working
-            test_results = chatbot.search_relevant_context("test", max_results=1)
-            if test_results:
-                # Try a minimal AI call to test API
-                chatbot.cohere_client.chat(
-                    model='command-r-08-2024',
-                    message="Hello",
-                    max_tokens=10,
-                    temperature=0.0
-                )
-        except Exception:
-            api_connected = False
+        database_count = await database_count_cached()
+        cohere_status = chatbot.cohere_breaker.stats()
+        api_connected = cohere_status["state"] != CIRCUIT_OPEN
         
         return HealthResponse(
             status="healthy" if api_connected else "degraded",
             database_count=database_count,
-            api_connected=api_connected
+            api_connected=api_connected,
+            executor=blocking_pool.stats(),
+            response_cache=response_cache.stats() if response_cache else None,
+            embedding_cache=(chatbot.chunker.query_embedding_cache.stats()
+                             if chatbot.chunker.query_embedding_cache else None),
+            served_by=dict(served_by_counts),
+            cohere=cohere_status
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests, and its warm-up has not failed."""
+    if startup_state["status"] == "failed":
+        # Restarting the process is the only way to retry the warm-up
+        return JSONResponse(status_code=503, content={"status": "failed", "error": startup_state["error"]})
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """
+    Readiness probe: chatbot loaded and database reachable. Cohere state comes from real calls.
+    Reports "warming" (or "failed") with the startup phases finished so far until the chatbot is loaded.
+    """
+    if not chatbot:
+        content = {"status": startup_state["status"], "ready": False, "phases": startup_state["phases"]}
+        if startup_state["error"]:
+            content["error"] = startup_state["error"]
+        return JSONResponse(status_code=503, content=content)
+
+    try:
+        database_count = await database_count_cached()
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "not_ready", "ready": False, "error": str(e)})
+
+    cohere_state = chatbot.cohere_breaker.state
+    return {
+        # Still ready while Cohere is down: answers fall back to the database text
+        "status": "ready" if cohere_state != CIRCUIT_OPEN else "degraded",
+        "ready": True,
+        "database_count": database_count,
+        "cohere": cohere_state,
+        "startup_phases": startup_state["phases"]
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text format: chat latency histograms per stage, answer paths and thread pool load."""
+    lines = render_metrics()
+    lines += metric_lines("chat_served_total", "counter", "Chat answers by the path that produced them",
+                          [("", {"served_by": name}, count) for name, count in sorted(served_by_counts.items())])
+    pool = blocking_pool.stats()
+    lines += metric_lines("chat_pool_queue_depth", "gauge", "Blocking jobs waiting for a worker",
+                          [("", {}, pool["queue_depth"])])
+    lines += metric_lines("chat_pool_rejected_total", "counter", "Blocking jobs rejected because the queue was full",
+                          [("", {}, pool["rejected"])])
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4; charset=utf-8")
+
+async def database_count_cached() -> int:
+    """Collection size, answered from the chunker's cache when fresh, else counted on the pool."""
+    count = chatbot.chunker.cached_count()
+    if count is None:
+        count = await run_blocking(chatbot.chunker.count)
+    return count
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, response: Response):
     """Main chat endpoint for asking questions."""
     global chatbot
 
@@ -300,39 +441,178 @@ async def chat(request: ChatRequest):
     if not request.question.strip():
         raise HTTPException(status_code=400, detail="Question cannot be empty")
 
-    try:
-        # Validate if question is PRMSU-related (validation is now handled in enhance_response_specificity)
-        # Search for relevant context
-        search_results = chatbot.search_relevant_context(
-            request.question,
-            max_results=request.max_results
-        )
+    with request_timings() as timings:
+        try:
+            # Canned answers need neither a vector search nor an AI call
+            answer = direct_answer(request.question)
+            if answer is not None:
+                search_results, served_by = [], "direct_answer"
+            else:
+                answer, search_results, served_by = await run_blocking(
+                    _run_chat_pipeline, request.question, request.max_results
+                )
+            record_served_by(served_by)
+            timings.finish("/chat", served_by)
+            response.headers["Server-Timing"] = timings.server_timing()
+
+            return ChatResponse(
+                answer=answer,
+                sources=format_sources(search_results),
+                success=True,
+                served_by=served_by,
+                timings=timings.as_ms() if request.include_timings else None
+            )
+
+        except HTTPException as e:
+            timings.finish("/chat", f"error_{e.status_code}")
+            raise
+        except Exception as e:
+            timings.finish("/chat", "error_500")
+            raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
+
+def format_sources(search_results: List[Dict]) -> List[Dict[str, Any]]:
+    """Format the top 3 search results as answer sources."""
+    sources = []
+    for result in search_results[:3]:  # Return top 3 sources
+        similarity = 1 - result.get('distance', 1) if result.get('distance') is not None else 0
+        sources.append({
+            "term": result.get('term', 'Unknown'),
+            "definition": result.get('definition', 'No definition available'),
+            "similarity": round(similarity, 3),
+            "source": result.get('source', 'Unknown')
+        })
+    return sources
+
+def direct_answer(question: str) -> Optional[str]:
+    """Final answer for questions the rule table answers outright (canned or off-topic), else None."""
+    answer = find_canned_answer(question)
+    if answer is None:
+        return None
+    # Same post-processing the full pipeline would apply
+    return enhance_response_specificity(question, answer, [])
+
+def record_served_by(served_by: str):
+    """Count which path produced an answer."""
+    served_by_counts[served_by] = served_by_counts.get(served_by, 0) + 1
+
+def _cached_answer(question: str, variant: str):
+    """
+    Cached (answer, search_results), its tier and the cache generation to pass to put() on a
+    miss (blocking); refreshes the chunker first.
+    """
+    # Another worker's write only invalidates this worker's cache once refresh() notices it
+    chatbot.chunker.refresh()
+    with span("cache"):
+        # Read first: an invalidation from here on means the answer about to be computed may be stale
+        generation = response_cache.generation
+        cached, tier = response_cache.get(question, variant=variant)
+    return cached, tier, generation
+
+def _run_chat_pipeline(question: str, max_results: int):
+    """
+    Search, generate and post-process an answer (blocking), reusing cached answers.
+    Returns (answer, search_results, served_by).
+    """
+    if response_cache:
+        cached, tier, generation = _cached_answer(question, str(max_results))
+        if cached is not None:
+            answer, search_results = cached
+            return answer, search_results, f"cache_{tier}"
 
-        # Generate response with enhanced specificity and validation
-        answer = chatbot.generate_response(request.question, search_results)
+    # Validate if question is PRMSU-related (validation is now handled in enhance_response_specificity)
+    # Search for relevant context
+    search_results = chatbot.search_relevant_context(question, max_results=max_results)
 
-        # Post-process answer for specificity, validation, and formatting
-        answer = enhance_response_specificity(request.question, answer, search_results)
-        
-        # Format sources for response
-        sources = []
-        for result in search_results[:3]:  # Return top 3 sources
-            similarity = 1 - result.get('distance', 1) if result.get('distance') else 0
-            sources.append({
-                "term": result.get('term', 'Unknown'),
-                "definition": result.get('definition', 'No definition available'),
-                "similarity": round(similarity, 3),
-                "source": result.get('source', 'Unknown')
-            })
-        
-        return ChatResponse(
-            answer=answer,
-            sources=sources,
-            success=True
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
+    # Generate response with enhanced specificity and validation
+    answer = chatbot.generate_response(question, search_results)
+
+    # Post-process answer for specificity, validation, and formatting
+    answer = enhance_response_specificity(question, answer, search_results)
+
+    # Only the top 3 results are ever returned as sources
+    if response_cache:
+        with span("cache"):
+            response_cache.put(question, (answer, search_results[:3]), variant=str(max_results),
+                               generation=generation)
+
+    return answer, search_results, "pipeline"
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming chat endpoint (server-sent events).
+    Sends a `sources` event first, then `token` events as the answer is generated,
+    and a final `done` event carrying the complete post-processed answer.
+    """
+    global chatbot
+
+    if not chatbot:
+        raise HTTPException(status_code=503, detail="Chatbot not initialized")
+
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+
+    question = request.question
+    variant = str(request.max_results)
+
+    async def event_stream():
+        with request_timings() as timings:
+            def done(answer: str, served_by: str) -> str:
+                record_served_by(served_by)
+                timings.finish("/chat/stream", served_by)
+                data = {"answer": answer, "success": True, "served_by": served_by}
+                if request.include_timings:
+                    data["timings"] = timings.as_ms()
+                return _sse("done", data)
+
+            try:
+                # Canned answers need neither a vector search nor an AI call
+                answer = direct_answer(question)
+                if answer is not None:
+                    yield _sse("sources", {"sources": []})
+                    yield done(answer, "direct_answer")
+                    return
+
+                if response_cache:
+                    cached, tier, generation = await run_blocking(_cached_answer, question, variant)
+                    if cached is not None:
+                        answer, search_results = cached
+                        yield _sse("sources", {"sources": format_sources(search_results)})
+                        yield _sse("token", {"text": answer})
+                        yield done(answer, f"cache_{tier}")
+                        return
+
+                search_results = await run_blocking(
+                    chatbot.search_relevant_context, question, max_results=request.max_results
+                )
+                yield _sse("sources", {"sources": format_sources(search_results)})
+
+                async for event in iterate_blocking(chatbot.stream_response(question, search_results)):
+                    if event['type'] == 'token':
+                        yield _sse("token", {"text": event['text']})
+                        continue
+
+                    # Final answer gets the same post-processing as /chat
+                    answer = enhance_response_specificity(question, event['text'], search_results)
+                    if response_cache:
+                        await run_blocking(timed("cache")(response_cache.put), question,
+                                           (answer, search_results[:3]), variant, generation)
+                    yield done(answer, "pipeline")
+
+            except Exception as e:
+                timings.finish("/chat/stream", f"error_{e.status_code}" if isinstance(e, HTTPException) else "error_500")
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                yield _sse("error", {"message": f"Chat processing failed: {detail}", "success": False})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.post("/search", response_model=SearchResponse)
 async def search_database(request: SearchRequest):
@@ -347,22 +627,14 @@ async def search_database(request: SearchRequest):
     
     try:
         # Search the database
-        search_results = chatbot.search_relevant_context(
-            request.query, 
+        search_results = await run_blocking(
+            chatbot.search_relevant_context,
+            request.query,
             max_results=request.max_results
         )
         
         # Format results
-        results = []
-        for result in search_results:
-            similarity = 1 - result.get('distance', 1) if result.get('distance') else 0
-            results.append({
-                "term": result.get('term', 'Unknown'),
-                "definition": result.get('definition', 'No definition available'),
-                "similarity": round(similarity, 3),
-                "source": result.get('source', 'Unknown'),
-                "full_text": result.get('document', '')
-            })
+        results = format_search_results(search_results)
         
         return SearchResponse(
             results=results,
@@ -370,40 +642,152 @@ async def search_database(request: SearchRequest):
             message=f"Found {len(results)} results"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+@app.post("/search/batch", response_model=SearchBatchResponse)
+async def search_database_batch(request: SearchBatchRequest):
+    """Search the vector database for several queries with one embedding call and one lookup."""
+    global chatbot
+
+    if not chatbot:
+        raise HTTPException(status_code=503, detail="Chatbot not initialized")
+
+    if not request.queries or any(not query.strip() for query in request.queries):
+        raise HTTPException(status_code=400, detail="Search queries cannot be empty")
+
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+
+    try:
+        batch_results = await run_blocking(
+            chatbot.chunker.search_definitions_batch,
+            request.queries,
+            n_results=request.max_results
+        )
+
+        # One result list per query, in request order
+        results = [format_search_results(search_results) for search_results in batch_results]
+
+        return SearchBatchResponse(
+            results=results,
+            success=True,
+            message=f"Searched {len(results)} queries"
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch search failed: {str(e)}")
+
+def format_search_results(search_results: List[Dict]) -> List[Dict[str, Any]]:
+    """Format search results for the search endpoints."""
+    results = []
+    for result in search_results:
+        similarity = 1 - result.get('distance', 1) if result.get('distance') is not None else 0
+        results.append({
+            "term": result.get('term', 'Unknown'),
+            "definition": result.get('definition', 'No definition available'),
+            "similarity": round(similarity, 3),
+            "source": result.get('source', 'Unknown'),
+            "full_text": result.get('document', '')
+        })
+    return results
+
 @app.get("/definitions", response_model=dict)
-async def list_definitions():
-    """List all definitions in the database."""
+async def list_definitions(limit: Optional[int] = Query(None, ge=1, le=MAX_DEFINITIONS_PAGE),
+                           offset: int = Query(0, ge=0),
+                           fields: Optional[str] = None):
+    """
+    List definitions in the database.
+    Without `limit` every definition is returned; with it, one page starting at `offset`.
+    `fields` is a comma-separated projection, e.g. "id,term".
+    """
     global chatbot
     
     if not chatbot:
         raise HTTPException(status_code=503, detail="Chatbot not initialized")
     
     try:
-        definitions = chatbot.chunker.list_all_definitions()
-        
-        # Format definitions for response
-        formatted_definitions = []
-        for defn in definitions:
-            formatted_definitions.append({
-                "id": defn.get('id', ''),
-                "term": defn.get('term', ''),
-                "definition": defn.get('definition', ''),
-                "source": defn.get('source', ''),
-                "type": defn.get('type', 'definition')
-            })
+        selected = parse_definition_fields(fields)
+
+        if limit is None:
+            formatted_definitions = await run_blocking(
+                lambda: list(chatbot.chunker.iter_definitions(fields=selected, offset=offset))
+            )
+            return {
+                "definitions": formatted_definitions,
+                "count": len(formatted_definitions),
+                "success": True
+            }
+
+        formatted_definitions, total = await run_blocking(_definitions_page, limit, offset, selected)
+        next_offset = offset + len(formatted_definitions)
         
         return {
             "definitions": formatted_definitions,
             "count": len(formatted_definitions),
+            "total": total,
+            "offset": offset,
+            "next_offset": next_offset if next_offset < total else None,
             "success": True
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list definitions: {str(e)}")
 
+def parse_definition_fields(fields: Optional[str]) -> List[str]:
+    """Validate a comma-separated field projection for the definitions endpoints."""
+    if not fields:
+        return list(DEFAULT_DEFINITION_FIELDS)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in DEFINITION_FIELDS]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown) or fields}. Choose from {', '.join(DEFINITION_FIELDS)}"
+        )
+    return selected
+
+def _definitions_page(limit: int, offset: int, fields: List[str]):
+    """One page of definitions plus the collection size (blocking)."""
+    return chatbot.chunker.list_definitions_page(limit=limit, offset=offset, fields=fields), chatbot.chunker.count()
+
+@app.get("/definitions/stream")
+async def stream_definitions(fields: Optional[str] = None, offset: int = Query(0, ge=0),
+                             batch_size: int = Query(500, ge=1, le=MAX_DEFINITIONS_PAGE)):
+    """Stream definitions as newline-delimited JSON, one object per line, read from the database page by page."""
+    global chatbot
+
+    if not chatbot:
+        raise HTTPException(status_code=503, detail="Chatbot not initialized")
+
+    selected = parse_definition_fields(fields)
+
+    async def rows():
+        page_offset = offset
+        while True:
+            page = await run_blocking(
+                chatbot.chunker.list_definitions_page, limit=batch_size, offset=page_offset, fields=selected
+            )
+            for definition in page:
+                yield json.dumps(definition, ensure_ascii=False) + "\n"
+            if len(page) < batch_size:
+                return
+            page_offset += len(page)
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+def apply_store_chunks(payload: Dict[str, Any]) -> int:
+    """Write queue handler, run in the writer process."""
+    # Start from what other workers' requests already stored
+    chatbot.chunker.refresh()
+    return chatbot.chunker.store_chunks(payload["chunks"], payload["source"])
+
 @app.post("/add_definition", response_model=AddDefinitionResponse)
 async def add_definition(request: AddDefinitionRequest):
     """Add a new definition to the database."""
@@ -425,13 +809,20 @@ async def add_definition(request: AddDefinitionRequest):
         }]
         
         # Store in database
-        stored_count = chatbot.chunker.store_chunks(chunks, request.source)
+        if write_queue is not None:
+            stored_count = await run_blocking(write_queue.submit, "store_chunks",
+                                              {"chunks": chunks, "source": request.source})
+            await run_blocking(chatbot.chunker.refresh)
+        else:
+            stored_count = await run_blocking(chatbot.chunker.store_chunks, chunks, request.source)
         
         return AddDefinitionResponse(
             success=True,
             message=f"Successfully added definition for '{request.term}'"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add definition: {str(e)}")
 
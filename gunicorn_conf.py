@@ -0,0 +1,42 @@
+"""
+Gunicorn settings for running the API with several worker processes
+
+    gunicorn -c gunicorn_conf.py fastapi_chatbot:app
+
+Workers share the database directory: searches read the memory-mapped NumPy
+index, and writes go through the single elected writer (see write_queue.py).
+The S3 download and upload run once here in the master process instead of in
+every worker.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Model loading and index builds at worker startup can take a while on small instances
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+
+
+def on_starting(server):
+    """Runs in the master before any worker starts."""
+    os.environ["MULTI_WORKER"] = "1"
+    from s3_utils import get_s3_manager
+    s3_manager = get_s3_manager()
+    if s3_manager.enabled:
+        print("📥 Attempting to download database from S3...")
+        s3_manager.download_database(os.getenv("DB_PATH", "./vector_db"))
+
+
+def on_exit(server):
+    """Runs in the master after all workers have exited."""
+    from s3_utils import get_s3_manager
+    s3_manager = get_s3_manager()
+    if s3_manager.enabled:
+        print("📤 Uploading database to S3 before shutdown...")
+        s3_manager.upload_database(os.getenv("DB_PATH", "./vector_db"))
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Ingestion Pipeline
+
+Loads many handbook files into the vector database:
+- changed files are chunked in parallel in a process pool; very large files are
+  streamed line by line instead, so they never have to fit in memory as one string
+- chunks are embedded and written in fixed-size batches by one writer thread fed
+  through a bounded queue, so memory stays flat however many files are queued
+- files and chunks that haven't changed since the last run are skipped using the
+  file_hash / content_hash fields stored in each chunk's metadata (files without any
+  chunks are remembered in a small state file next to the database)
+- chunks of files that were deleted from an ingested directory or pattern are removed
+Usage: python definition_chunker.py --ingest handbook/ extra/*.txt [--sections] [--workers 4]
+"""
+
+import fnmatch
+import glob
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from definition_chunker import DefinitionChunker, chunk_content_hash, normalized_fields
+from term_index import NORMALIZED_VERSION
+
+# File types picked up when a directory is ingested
+INGEST_EXTENSIONS = (".txt", ".md")
+
+# Hashes of ingested files that produced no chunks, by source, kept in the database folder
+INGEST_STATE_FILE = "ingest_state.json"
+
+# Files above this size are streamed in the main process rather than chunked whole in a worker
+STREAM_FILE_BYTES = 32 * 1024 * 1024
+
+
+def expand_paths(patterns: List[str]) -> List[str]:
+    """Resolve files, directories (searched recursively) and glob patterns into a sorted file list."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, files in os.walk(pattern):
+                paths.extend(os.path.join(root, name) for name in files
+                             if name.lower().endswith(INGEST_EXTENSIONS))
+        elif glob.has_magic(pattern):
+            paths.extend(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+        elif os.path.isfile(pattern):
+            paths.append(pattern)
+        else:
+            print(f"⚠️  No such file or directory: {pattern}")
+    return sorted(dict.fromkeys(paths))
+
+
+def in_scope(path: str, patterns: List[str]) -> bool:
+    """
+    Whether `path` is one `expand_paths(patterns)` would return if it existed. Directories
+    that no longer exist still cover the files that were under them.
+    """
+    path = os.path.normpath(path)
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            if fnmatch.fnmatch(path, os.path.normpath(pattern)):
+                return True
+        elif path == os.path.normpath(pattern):
+            return True
+        elif path.lower().endswith(INGEST_EXTENSIONS):
+            relative = os.path.relpath(path, pattern)
+            if relative != os.pardir and not relative.startswith(os.pardir + os.sep):
+                return True
+    return False
+
+
+def file_sha256(path: str) -> str:
+    """Hash of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_file_chunks(path: str, file_hash: str, sections: bool = False) -> Iterator[Dict]:
+    """Stream the chunks of one file, reading it line by line."""
+    with open(path, "r", encoding="utf-8") as f:
+        chunks = DefinitionChunker.iter_chunks_by_sections(f) if sections else DefinitionChunker.iter_chunks_by_definitions(f)
+        for i, chunk in enumerate(chunks):
+            chunk["chunk_index"] = i
+            chunk["file_hash"] = file_hash
+            yield chunk
+
+
+def chunk_file(path: str, file_hash: str, sections: bool = False) -> Tuple[str, List[Dict]]:
+    """Chunk one file (runs in a worker process). Returns (path, chunks)."""
+    return path, list(iter_file_chunks(path, file_hash, sections))
+
+
+class IngestPipeline:
+    """Incremental, parallel ingestion of files into a DefinitionChunker's collection."""
+
+    def __init__(self, chunker: DefinitionChunker, sections: bool = False, workers: Optional[int] = None,
+                 batch_size: int = 64, queue_size: int = 8):
+        """
+        `workers` chunking processes (default: CPU count), `batch_size` chunks per embedding/write call,
+        at most `queue_size` batches waiting for the writer.
+        """
+        self.chunker = chunker
+        self.sections = sections
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.state_path = os.path.join(chunker.db_path, INGEST_STATE_FILE)
+
+    def run(self, patterns: List[str]) -> Dict[str, float]:
+        """Ingest every file matched by `patterns`. Returns counts of what was added, kept and removed."""
+        start = time.perf_counter()
+        stats = {
+            "files": 0, "files_unchanged": 0, "files_removed": 0, "chunks_added": 0,
+            "chunks_unchanged": 0, "chunks_removed": 0, "seconds": 0.0
+        }
+        empty_files = self._load_empty_files()
+
+        # Hashing is cheap next to chunking and embedding, so unchanged files are dropped up front
+        pending = {}
+        for path in expand_paths(patterns):
+            stats["files"] += 1
+            file_hash = file_sha256(path)
+            existing = self._stored_chunks(self._source(path))
+            if existing and all(metadata.get("file_hash") == file_hash for metadata in existing.values()):
+                stats["files_unchanged"] += 1
+                stats["chunks_unchanged"] += len(existing)
+                continue
+            if not existing and empty_files.get(self._source(path)) == file_hash:
+                # Chunked before without finding anything, and unchanged since
+                stats["files_unchanged"] += 1
+                continue
+            pending[path] = (file_hash, existing)
+
+        print(f"📂 {stats['files']} files, {len(pending)} new or changed")
+
+        writes: "queue.Queue[Optional[Tuple]]" = queue.Queue(maxsize=self.queue_size)
+        errors: List[BaseException] = []
+        writer = threading.Thread(target=self._write, args=(writes, stats, errors), daemon=True)
+        writer.start()
+        try:
+            for path, chunks in self._chunk_files([(path, file_hash) for path, (file_hash, _) in pending.items()]):
+                if errors:
+                    break
+                file_hash, existing = pending[path]
+                if self._sync_file(path, file_hash, chunks, existing, writes, stats):
+                    empty_files.pop(self._source(path), None)
+                else:
+                    empty_files[self._source(path)] = file_hash
+        finally:
+            writes.put(None)
+            writer.join()
+
+        if errors:
+            raise errors[0]
+
+        self._remove_missing_files(patterns, empty_files, stats)
+        self._save_empty_files(empty_files)
+
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        print(f"✅ Ingested {stats['files']} files in {stats['seconds']}s: "
+              f"{stats['chunks_added']} chunks added, {stats['chunks_unchanged']} unchanged, "
+              f"{stats['chunks_removed']} removed ({stats['files_unchanged']} files skipped, "
+              f"{stats['files_removed']} deleted files cleaned up)")
+        return stats
+
+    def _load_empty_files(self) -> Dict[str, str]:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("empty_files", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save_empty_files(self, empty_files: Dict[str, str]):
+        with open(f"{self.state_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"empty_files": empty_files}, f)
+        os.replace(f"{self.state_path}.tmp", self.state_path)
+
+    def _remove_missing_files(self, patterns: List[str], empty_files: Dict[str, str], stats: Dict[str, float]):
+        """
+        Delete the chunks of files that `patterns` covered but that no longer exist. Every stored
+        source is checked, reading only the source field of each chunk, page by page.
+        """
+        prefix = self._source("")
+        missing = {}
+        for row in self.chunker.iter_definitions(fields=["source"]):
+            source = row["source"]
+            if source.startswith(prefix) and source not in missing:
+                path = source[len(prefix):]
+                missing[source] = in_scope(path, patterns) and not os.path.isfile(path)
+        for source in list(empty_files):
+            path = source[len(prefix):]
+            if in_scope(path, patterns) and not os.path.isfile(path):
+                del empty_files[source]
+
+        for source in [source for source, is_missing in missing.items() if is_missing]:
+            removed = self.chunker.delete_where({"source": source})
+            print(f"🗑️  {source[len(prefix):]} no longer exists: removed its {removed} chunks")
+            stats["files_removed"] += 1
+            stats["chunks_removed"] += removed
+
+    @staticmethod
+    def _source(path: str) -> str:
+        # Same source naming as `definition_chunker.py --file`
+        return f"file:{path}"
+
+    def _stored_chunks(self, source: str) -> Dict[str, Dict]:
+        """Metadata of the chunks already stored for a source, by ID."""
+        results = self.chunker.collection.get(where={"source": source}, include=["metadatas"])
+        return dict(zip(results["ids"], results["metadatas"] or []))
+
+    def _chunk_files(self, files: List[Tuple[str, str]]) -> Iterator[Tuple[str, Iterable[Dict]]]:
+        """Chunk files in a process pool, keeping only a few results in flight at a time."""
+        if self.workers <= 1 or len(files) <= 1:
+            for path, file_hash in files:
+                yield path, iter_file_chunks(path, file_hash, self.sections)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = []
+            for path, file_hash in files:
+                if os.path.getsize(path) > STREAM_FILE_BYTES:
+                    # Keep file order: finish what's in flight, then stream this one here
+                    for future in in_flight:
+                        yield future.result()
+                    in_flight = []
+                    yield path, iter_file_chunks(path, file_hash, self.sections)
+                    continue
+                in_flight.append(pool.submit(chunk_file, path, file_hash, self.sections))
+                if len(in_flight) >= self.workers * 2:
+                    yield in_flight.pop(0).result()
+            for future in in_flight:
+                yield future.result()
+
+    def _sync_file(self, path: str, file_hash: str, chunks: Iterable[Dict], existing: Dict[str, Dict],
+                   writes: "queue.Queue", stats: Dict[str, float]) -> int:
+        """
+        Queue the adds, metadata updates and deletes that bring one source in line with its file.
+        Returns how many chunks the file has.
+        """
+        source = self._source(path)
+
+        # Stored chunks by content; chunks stored before hashes existed are hashed from their metadata
+        stored_by_hash: Dict[str, List[str]] = {}
+        for doc_id, metadata in existing.items():
+            content_hash = metadata.get("content_hash") or chunk_content_hash(
+                metadata.get("term", ""), metadata.get("definition", ""))
+            stored_by_hash.setdefault(content_hash, []).append(doc_id)
+
+        # Batches are queued as they fill, so a streamed file is never held in memory whole
+        new_chunks, update_ids, update_metadatas = [], [], []
+        chunk_count = 0
+        for chunk in chunks:
+            chunk_count += 1
+            content_hash = chunk_content_hash(chunk["term"], chunk["definition"])
+            matches = stored_by_hash.get(content_hash)
+            if not matches:
+                new_chunks.append(chunk)
+                if len(new_chunks) >= self.batch_size:
+                    writes.put(("add", source, new_chunks))
+                    new_chunks = []
+                continue
+            doc_id = matches.pop(0)
+            metadata = dict(existing[doc_id])
+            stats["chunks_unchanged"] += 1
+            refreshed = {"content_hash": content_hash, "file_hash": file_hash, "chunk_index": chunk["chunk_index"]}
+            if metadata.get("normalized_version") != NORMALIZED_VERSION:
+                # Stored before the current normalized fields; bring them up to date with the other refreshes
+                refreshed.update(normalized_fields(chunk["term"], chunk["definition"]))
+            if any(metadata.get(key) != value for key, value in refreshed.items()):
+                metadata.update(refreshed)
+                update_ids.append(doc_id)
+                update_metadatas.append(metadata)
+                if len(update_ids) >= self.batch_size:
+                    writes.put(("update", update_ids, update_metadatas))
+                    update_ids, update_metadatas = [], []
+
+        if new_chunks:
+            writes.put(("add", source, new_chunks))
+        if update_ids:
+            writes.put(("update", update_ids, update_metadatas))
+        # Whatever is left no longer appears in the file (edited or removed, or extra duplicates)
+        stale_ids = [doc_id for ids in stored_by_hash.values() for doc_id in ids]
+        if stale_ids:
+            writes.put(("delete", stale_ids))
+        return chunk_count
+
+    def _write(self, writes: "queue.Queue", stats: Dict[str, float], errors: List[BaseException]):
+        """Single writer: embeds and stores batches in order. Keeps draining after an error so producers never block."""
+        while True:
+            operation = writes.get()
+            if operation is None:
+                return
+            if errors:
+                continue
+            try:
+                if operation[0] == "add":
+                    stats["chunks_added"] += self.chunker.store_chunks(operation[2], operation[1])
+                elif operation[0] == "update":
+                    self.chunker.update_metadata(operation[1], operation[2])
+                elif operation[0] == "delete":
+                    stats["chunks_removed"] += self.chunker.delete_ids(operation[1])
+            except Exception as e:
+                print(f"❌ Ingestion write failed: {e}")
+                errors.append(e)
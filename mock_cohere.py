@@ -0,0 +1,110 @@
+"""
+Local Cohere stand-in for load tests
+
+Implements the two client calls the chatbot makes (chat and chat_stream)
+without network access or API quota. Answers are built from the first
+database entry in the prompt, and are delayed to look like the real API:
+- time to first token: log-normal around a median latency
+- generation: tokens at a per-response rate drawn around a mean
+- optional random failures, to exercise the circuit breaker and fallback
+Enable it for the API server with COHERE_MOCK=1 (see from_env for settings).
+"""
+
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import Iterator, Optional
+
+# Prompt lines that carry database entries, as written by VectorDatabaseChatbot.build_prompt
+ENTRY_PATTERN = re.compile(r'^\[\d+\] [^:\n]*: (.+)$', re.MULTILINE)
+
+
+class MockResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class MockStreamEvent:
+    def __init__(self, text: str):
+        self.event_type = "text-generation"
+        self.text = text
+
+
+class MockCohereError(Exception):
+    """Simulated API failure."""
+
+
+class MockCohereClient:
+    """Drop-in for cohere.Client's chat/chat_stream with configurable latency and token rate."""
+
+    def __init__(self, latency_ms: float = 400.0, latency_sigma: float = 0.4,
+                 tokens_per_second: float = 60.0, token_rate_sigma: float = 0.2,
+                 error_rate: float = 0.0, max_tokens: int = 80, seed: Optional[int] = None):
+        """
+        Time to first token is log-normal with median `latency_ms` and shape `latency_sigma`;
+        each response streams at a log-normal rate with median `tokens_per_second`.
+        `error_rate` is the fraction of calls that fail; answers are cut to `max_tokens` words.
+        """
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.token_rate_sigma = token_rate_sigma
+        self.error_rate = error_rate
+        self.max_tokens = max_tokens
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    @classmethod
+    def from_env(cls) -> "MockCohereClient":
+        """Settings from COHERE_MOCK_* environment variables."""
+        seed = os.getenv("COHERE_MOCK_SEED")
+        return cls(
+            latency_ms=float(os.getenv("COHERE_MOCK_LATENCY_MS", "400")),
+            latency_sigma=float(os.getenv("COHERE_MOCK_LATENCY_SIGMA", "0.4")),
+            tokens_per_second=float(os.getenv("COHERE_MOCK_TOKENS_PER_SEC", "60")),
+            token_rate_sigma=float(os.getenv("COHERE_MOCK_TOKEN_RATE_SIGMA", "0.2")),
+            error_rate=float(os.getenv("COHERE_MOCK_ERROR_RATE", "0")),
+            max_tokens=int(os.getenv("COHERE_MOCK_MAX_TOKENS", "80")),
+            seed=int(seed) if seed else None
+        )
+
+    def _draw(self):
+        """(first-token delay in seconds, seconds per token, fail?) for one call."""
+        with self._lock:
+            self.calls += 1
+            delay = self.latency_ms / 1000 * math.exp(self._random.gauss(0, self.latency_sigma))
+            rate = self.tokens_per_second * math.exp(self._random.gauss(0, self.token_rate_sigma))
+            fail = self._random.random() < self.error_rate
+        return delay, 1 / rate if rate > 0 else 0.0, fail
+
+    def _answer_tokens(self, message: str) -> list:
+        """Words of an answer taken from the first database entry in the prompt."""
+        match = ENTRY_PATTERN.search(message or "")
+        text = match.group(1) if match else "I don't have that specific information in my database."
+        words = text.split()[:self.max_tokens]
+        if words and not words[-1].endswith(('.', '!', '?')):
+            words[-1] += "."
+        return [word + " " for word in words]
+
+    def chat(self, message: str = "", **kwargs) -> MockResponse:
+        delay, per_token, fail = self._draw()
+        tokens = self._answer_tokens(message)
+        time.sleep(delay)
+        if fail:
+            raise MockCohereError("simulated Cohere failure")
+        time.sleep(per_token * len(tokens))
+        return MockResponse("".join(tokens))
+
+    def chat_stream(self, message: str = "", **kwargs) -> Iterator[MockStreamEvent]:
+        delay, per_token, fail = self._draw()
+        tokens = self._answer_tokens(message)
+        time.sleep(delay)
+        if fail:
+            raise MockCohereError("simulated Cohere failure")
+        for token in tokens:
+            yield MockStreamEvent(token)
+            time.sleep(per_token)
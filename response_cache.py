@@ -0,0 +1,166 @@
+"""
+Answer cache for the chat pipeline
+
+Two tiers sit in front of answer generation:
+- exact: TTL + LRU dictionary keyed on the normalized question
+- semantic: reuses a cached answer when a new question's embedding is within
+  a cosine-similarity threshold of a cached question
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    question = re.sub(r'\s+', ' ', question.lower()).strip()
+    return question.rstrip('?!. ')
+
+
+class ResponseCache:
+    """Thread-safe TTL/LRU answer cache with an optional embedding-similarity tier."""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600,
+                 similarity_threshold: float = 0.97,
+                 embed_fn: Optional[Callable[[str], List[float]]] = None):
+        """
+        Create a cache holding up to `max_entries` answers for `ttl_seconds`.
+        The semantic tier is used when `embed_fn` is given and `similarity_threshold` > 0.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits_exact = 0
+        self._hits_semantic = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        # Bumped by invalidate(); put() skips answers computed against an older generation
+        self._generation = 0
+        self._stale_puts = 0
+
+    @property
+    def generation(self) -> int:
+        """Read before computing an answer after a miss, and pass to put()."""
+        return self._generation
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.embed_fn is not None and self.similarity_threshold > 0
+
+    def _key(self, question: str, variant: str) -> str:
+        return f"{variant}|{normalize_question(question)}"
+
+    def _embed(self, question: str) -> Optional[np.ndarray]:
+        """Embed and L2-normalize a question, or None if the semantic tier is off or fails."""
+        if not self.semantic_enabled:
+            return None
+        try:
+            vector = np.asarray(self.embed_fn(normalize_question(question)), dtype=np.float32)
+        except Exception as e:
+            print(f"⚠️  Could not embed question for cache: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry['created'] > self.ttl_seconds
+
+    def get(self, question: str, variant: str = "") -> Tuple[Optional[Any], Optional[str]]:
+        """
+        Look up a cached value for the question.
+        Returns (value, tier) where tier is 'exact' or 'semantic', or (None, None) on a miss.
+        """
+        key = self._key(question, variant)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry, now):
+                    self._entries.move_to_end(key)
+                    self._hits_exact += 1
+                    return entry['value'], 'exact'
+                del self._entries[key]
+
+            if not self.semantic_enabled or not self._entries:
+                self._misses += 1
+                return None, None
+
+        # Embed outside the lock, the model call is the slow part
+        query_vector = self._embed(question)
+
+        with self._lock:
+            candidates = [
+                (candidate_key, entry) for candidate_key, entry in self._entries.items()
+                if entry['variant'] == variant and entry['embedding'] is not None
+                and not self._expired(entry, now)
+            ]
+            if query_vector is not None and candidates:
+                matrix = np.stack([entry['embedding'] for _, entry in candidates])
+                scores = matrix @ query_vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    best_key, best_entry = candidates[best]
+                    self._entries.move_to_end(best_key)
+                    self._hits_semantic += 1
+                    return best_entry['value'], 'semantic'
+
+            self._misses += 1
+            return None, None
+
+    def put(self, question: str, value: Any, variant: str = "", generation: Optional[int] = None):
+        """
+        Store a value for the question, evicting the least recently used entries if full.
+        With `generation` (read before the value was computed), nothing is stored if the cache
+        was invalidated since, as the value may be based on data that has changed.
+        """
+        key = self._key(question, variant)
+        embedding = self._embed(question)
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                self._stale_puts += 1
+                return
+            self._entries[key] = {
+                'value': value,
+                'variant': variant,
+                'embedding': embedding,
+                'created': time.monotonic()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, *_):
+        """Drop every cached answer. Signature fits DefinitionChunker change listeners."""
+        with self._lock:
+            self._entries.clear()
+            self._invalidations += 1
+            self._generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size for the health endpoint."""
+        with self._lock:
+            hits = self._hits_exact + self._hits_semantic
+            lookups = hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits_exact": self._hits_exact,
+                "hits_semantic": self._hits_semantic,
+                "misses": self._misses,
+                "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "stale_puts": self._stale_puts
+            }
@@ -0,0 +1,274 @@
+"""
+Question Rule Engine
+
+All keyword rules applied to student questions live in one declarative table
+(RULES). At import time every keyword is compiled into a single regular
+expression, so a question is scanned once no matter how many rules exist.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Build a regex alternation shaped like a prefix trie, so matching at a position
+    costs as much as the longest keyword rather than the number of keywords.
+    Optional continuations are greedy, so the longest keyword at a position wins.
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            # A keyword ends here; longer keywords continue optionally
+            return '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+
+class Rule:
+    """
+    A keyword rule. It matches when every group in `all_of` has at least one
+    keyword in the question and no keyword from `none_of` is present.
+    Keywords are plain lowercase substrings, like the `in question_lower` checks they replace.
+    """
+
+    def __init__(self, rule_id: str, group: str, all_of: Sequence[Sequence[str]],
+                 none_of: Sequence[str] = (), payload=None):
+        if not all_of:
+            raise ValueError(f"Rule {rule_id} needs at least one keyword group")
+        self.rule_id = rule_id
+        self.group = group
+        self.all_of: Tuple[Tuple[str, ...], ...] = tuple(tuple(keywords) for keywords in all_of)
+        self.none_of: Tuple[str, ...] = tuple(none_of)
+        self.payload = payload
+
+    @property
+    def keywords(self) -> FrozenSet[str]:
+        """Every keyword this rule refers to."""
+        return frozenset(keyword for keywords in self.all_of for keyword in keywords) | frozenset(self.none_of)
+
+    def matches_keywords(self, found: FrozenSet[str]) -> bool:
+        """Evaluate the rule against the set of keywords found in a question."""
+        return (all(any(keyword in found for keyword in keywords) for keywords in self.all_of) and
+                not any(keyword in found for keyword in self.none_of))
+
+    def matches_text(self, text: str) -> bool:
+        """Evaluate the rule with direct substring scans (reference implementation)."""
+        return (all(any(keyword in text for keyword in keywords) for keywords in self.all_of) and
+                not any(keyword in text for keyword in self.none_of))
+
+    def __repr__(self):
+        return f"Rule({self.rule_id!r})"
+
+
+class RuleMatch:
+    """Result of matching one question: the keywords found and the rules that fired."""
+
+    def __init__(self, keywords: FrozenSet[str], rules: Tuple[Rule, ...]):
+        self.keywords = keywords
+        self.rules = rules
+        self.ids = frozenset(rule.rule_id for rule in rules)
+
+    def has(self, rule_id: str) -> bool:
+        return rule_id in self.ids
+
+    def first(self, group: str) -> Optional[Rule]:
+        """First matching rule of a group, in table order."""
+        for rule in self.rules:
+            if rule.group == group:
+                return rule
+        return None
+
+    def in_group(self, group: str) -> List[Rule]:
+        """All matching rules of a group, in table order."""
+        return [rule for rule in self.rules if rule.group == group]
+
+
+class RuleEngine:
+    """Compiles a rule table into one matcher that finds every rule hit in a single pass."""
+
+    def __init__(self, rules: Iterable[Rule]):
+        self.rules: Tuple[Rule, ...] = tuple(rules)
+
+        seen = set()
+        for rule in self.rules:
+            if rule.rule_id in seen:
+                raise ValueError(f"Duplicate rule id: {rule.rule_id}")
+            seen.add(rule.rule_id)
+
+        keywords = set()
+        self._rules_by_keyword: Dict[str, List[int]] = {}
+        for index, rule in enumerate(self.rules):
+            keywords |= rule.keywords
+            # Only positive keywords can make a rule fire
+            for keyword in {keyword for keywords_ in rule.all_of for keyword in keywords_}:
+                self._rules_by_keyword.setdefault(keyword, []).append(index)
+
+        # Each position reports its longest hit; shorter keywords starting
+        # at the same position are always prefixes of it
+        self._pattern = re.compile('(?=(' + _trie_pattern(keywords) + '))')
+        self._implied: Dict[str, FrozenSet[str]] = {
+            keyword: frozenset(other for other in keywords if keyword.startswith(other))
+            for keyword in keywords
+        }
+
+    def find_keywords(self, text: str) -> FrozenSet[str]:
+        """All rule keywords occurring anywhere in the text, overlapping hits included."""
+        found = set()
+        for hit in self._pattern.finditer(text):
+            found |= self._implied[hit.group(1)]
+        return frozenset(found)
+
+    def match(self, text: str) -> RuleMatch:
+        """Match lowercase text against every rule."""
+        found = self.find_keywords(text)
+        candidates = sorted({index for keyword in found for index in self._rules_by_keyword.get(keyword, ())})
+        fired = tuple(self.rules[index] for index in candidates if self.rules[index].matches_keywords(found))
+        return RuleMatch(found, fired)
+
+
+# Rule groups
+CANNED_ANSWER = 'canned_answer'
+ANSWER_CATEGORY = 'answer_category'
+SEARCH_TOPIC = 'search_topic'
+SEARCH_SECTION = 'search_section'
+SEARCH_UNIVERSITY_INFO = 'search_university_info'
+SPECIAL_HANDLING = 'special_handling'
+EXTRACT_ITEM = 'extract_item'
+QUESTION_TYPE = 'question_type'
+
+UNIFORM_ANSWER = "Male students must wear white polo shirt, black pants, and black formal shoes. Female students must wear blue skirt or blue slacks, white blouse, necktie, and black shoes. LGBTQ+ policy: Women members may wear slacks, blouse, and necktie combination, but men members are NOT permitted to wear skirts."
+
+PRMSU_ACRONYM_ANSWER = "🏫 **PRMSU** stands for:\n**President Ramon Magsaysay State University**\n\n📍 The main campus is located in **Iba, Zambales**."
+
+RULES = [
+    # Specific question handlers with complete answers (first match wins)
+    Rule('canned.establishment_law', CANNED_ANSWER, [['what law'], ['established']],
+         payload="President Ramon Magsaysay State University (PRMSU) was officially established by Republic Act No. 11015 on April 20, 2018."),
+    Rule('canned.cross_enrolment_types', CANNED_ANSWER, [['four types'], ['cross']],
+         payload="The four types of cross-enrolment at PRMSU are: 1) Inbound Cross Enrolment (students from other institutions enrolling at PRMSU), 2) Outbound Cross Enrolment (PRMSU students enrolling in external institutions), 3) In-Campus Cross Enrolment (PRMSU students enrolling in different colleges within the same campus), and 4) Out-Campus Cross Enrolment (PRMSU students enrolling in another PRMSU campus)."),
+    Rule('canned.midyear_units', CANNED_ANSWER, [['how many units'], ['midyear']],
+         payload="Students may take a maximum of 9 units during midyear classes. Graduating students may overload up to 12 units only with approval from the Registrar upon recommendation of the Dean. Students with academic deficiencies are not allowed to overload."),
+    Rule('canned.absence_consequence', CANNED_ANSWER, [['consequence'], ['20%'], ['absence']],
+         payload="Students who accumulate 20% unexcused absences in any subject automatically receive a grade of 5.0 (failing grade) for that subject."),
+    Rule('canned.prescribed_uniform', CANNED_ANSWER, [['prescribed uniform']], payload=UNIFORM_ANSWER),
+    Rule('canned.uniform_by_gender', CANNED_ANSWER, [['uniform'], ['male', 'female']], payload=UNIFORM_ANSWER),
+    Rule('canned.transferee_grade', CANNED_ANSWER, [['what grade'], ['transferee']],
+         payload="Transferee students must have earned a minimum grade of 3.0 or its equivalent in their previous school for their courses to be accredited at PRMSU. The course content and unit weight must also be equivalent to PRMSU standards."),
+    Rule('canned.scholarship_termination', CANNED_ANSWER, [['grounds for termination'], ['scholarship']],
+         payload="Grounds for termination of scholarship or financial assistance include: 1) Failure to maintain the required GWA, 2) Dropping out without proper notice, 3) Carrying fewer units than prescribed, 4) Failure to comply with reapplication requirements, and 5) Violation of university rules and regulations."),
+    Rule('canned.student_assistant_hours', CANNED_ANSWER, [['maximum number of hours'], ['student assistant']],
+         payload="Student assistants receive ₱25.00 per hour and may work a maximum of 100 hours per month, subject to COA rules. Requirements include: must be officially enrolled, possess relevant skills, maintain good grades, demonstrate good moral character, submit resume, recent grades, certificate of registration, ID photo, class schedule, and parental consent. The program is limited to 50 assistants per semester, and poor performance automatically disqualifies students from reapplication."),
+    Rule('canned.liquor_first_offense', CANNED_ANSWER, [['penalty'], ['liquor'], ['first offense']],
+         payload="First offense for being under the influence of liquor on campus results in 15 days suspension, 12 hours of transformative experience, and mandatory guidance intervention."),
+    Rule('canned.liquor_second_offense', CANNED_ANSWER, [['penalty'], ['liquor'], ['second offense']],
+         payload="Second offense for liquor-related violations at PRMSU results in 30 days suspension, 24 hours of transformative experience, and continued guidance intervention."),
+    Rule('canned.liquor_third_offense', CANNED_ANSWER, [['penalty'], ['liquor'], ['third offense']],
+         payload="Third offense for liquor-related violations at PRMSU results in one-year suspension from the university."),
+    # If no specific offense number mentioned, provide all penalties
+    Rule('canned.liquor_penalties', CANNED_ANSWER, [['penalty'], ['liquor']],
+         payload="PRMSU liquor-related offenses carry progressive penalties: First offense: 15 days suspension, 12 hours transformative experience, mandatory guidance intervention. Second offense: 30 days suspension, 24 hours transformative experience, continued guidance intervention. Third offense: One-year suspension."),
+    Rule('canned.graduation_honors_gwa', CANNED_ANSWER, [['honors'], ['graduating'], ['gwa']],
+         payload="Three honors are awarded to graduating students: 1) Summa Cum Laude requires 1.0-1.25 GWA with no grade below 1.5, 2) Magna Cum Laude requires 1.26-1.5 GWA with no grade below 1.75, and 3) Cum Laude requires 1.51-1.75 GWA with no grade below 2.0."),
+    # Advanced question handlers
+    Rule('canned.student_assistant_semester_hours', CANNED_ANSWER, [['maximum number of hours'], ['semester'], ['student assistant']],
+         payload="Student assistants work a maximum of 100 hours per month. In a typical 4-month semester, this equals approximately 400 hours per semester (100 hours/month × 4 months = 400 hours/semester)."),
+    Rule('canned.deficiency_clearance', CANNED_ANSWER, [['deficiencies'], ['cleared'], ['council']],
+         payload="All deficiencies must be cleared three (3) working days before the University-wide Academic Council meeting."),
+    Rule('canned.transferee_honors', CANNED_ANSWER, [['transferee'], ['honors'], ['residency', 'additional']],
+         payload="For transferees to graduate with honors at PRMSU, they must meet additional requirements beyond GWA: 1) Complete all academic units at PRMSU (residency requirement), 2) Carry the regular academic load throughout their studies, 3) Finish within the prescribed time frame for their program, and 4) Have no failing grades, incomplete grades, or disciplinary violations on record. Those meeting GWA requirements but not residency or load requirements receive a Certificate of Graduation with Academic Distinction instead."),
+    Rule('canned.outbound_approval', CANNED_ANSWER, [['outbound cross'], ['approve']],
+         payload="Outbound cross-enrolment requests must be approved by the Dean and Registrar. This is generally allowed only when the course or subject is not offered at PRMSU during the specific academic year and term, the host school has a comparable standard of education, and typically only general education subjects are permitted."),
+    Rule('canned.liquor_violations', CANNED_ANSWER, [['liquor'], ['related'], ['violation']],
+         payload="PRMSU's liquor-related offense policy covers multiple violations: entering the university intoxicated, possessing alcohol on campus, using alcohol on campus, selling alcohol on campus, and consuming alcohol on campus. All these violations carry progressive penalties."),
+    Rule('canned.private_scholarship_gwa', CANNED_ANSWER, [['private scholarship'], ['gwa', 'average']],
+         payload="Private scholarship applicants at PRMSU must maintain a minimum General Weighted Average (GWA) of 1.75. Additional academic conditions include: being officially enrolled, demonstrating good moral character, and having no failing or incomplete grades on record."),
+    Rule('canned.location', CANNED_ANSWER, [['where', 'located'], ['prmsu']],
+         payload="📍 **University Location:**\nPresident Ramon Magsaysay State University (PRMSU) is located in Iba, Zambales, Philippines. The university has seven campuses throughout Zambales province."),
+    Rule('canned.acronym', CANNED_ANSWER, [['stands for', 'acronym', 'what does'], ['prmsu']],
+         payload=PRMSU_ACRONYM_ANSWER),
+
+    # Answer headings used by format_user_friendly_response (first match wins)
+    Rule('category.acronym', ANSWER_CATEGORY, [['stands for', 'acronym', 'what does']]),
+    Rule('category.vision_mission', ANSWER_CATEGORY, [['vision', 'mission']]),
+    Rule('category.disciplinary', ANSWER_CATEGORY, [['penalty', 'offense', 'violation']], payload="⚖️ **Disciplinary Policy:**"),
+    Rule('category.scholarship', ANSWER_CATEGORY, [['scholarship', 'financial assistance']], payload="💰 **Scholarship Information:**"),
+    Rule('category.uniform', ANSWER_CATEGORY, [['uniform', 'dress code']], payload="👔 **Uniform Policy:**"),
+    Rule('category.admission', ANSWER_CATEGORY, [['admission', 'requirement', 'enroll']], payload="📝 **Admission Information:**"),
+    Rule('category.grading', ANSWER_CATEGORY, [['gwa', 'grade', 'grading']], payload="📊 **Academic Information:**"),
+    Rule('category.graduation', ANSWER_CATEGORY, [['graduation', 'honors', 'cum laude']], payload="🎓 **Graduation Information:**"),
+    Rule('category.location', ANSWER_CATEGORY, [['where', 'located', 'location']], payload="📍 **University Location:**"),
+    Rule('category.university', ANSWER_CATEGORY, [['campus', 'how many', 'established', 'when']], payload="🏛️ **University Information:**"),
+    Rule('category.student_assistant', ANSWER_CATEGORY, [['student assistant', 'work-study']], payload="💼 **Student Assistant Program:**"),
+
+    # Critical university information, matched against definitions in search_relevant_context
+    Rule('search.university_info', SEARCH_UNIVERSITY_INFO, [[
+        'prmsu stands for', 'what does prmsu stand for', 'prmsu meaning', 'when was prmsu established',
+        'prmsu establishment', 'how many campuses', 'number of campuses', 'campus count'
+    ]], payload=('President Ramon Magsaysay State University', 'April 20, 2018', 'seven campuses')),
+
+    # Topic prioritization in search_relevant_context (first match wins)
+    Rule('search.graduation_honors', SEARCH_TOPIC, [[
+        'summa cum laude', 'magna cum laude', 'cum laude', 'graduation honors', 'honors gwa', 'gwa for honors'
+    ]]),
+    Rule('search.grading_system', SEARCH_TOPIC, [['grade range', 'grading system', '1.0 grade', '1.75 grade', 'grade equals']]),
+    Rule('search.attendance', SEARCH_TOPIC, [['absence', 'absences', 'attendance', 'failing grade', '20%', 'percentage']]),
+    Rule('search.requirements', SEARCH_TOPIC, [['admission requirements', 'requirements', 'requirements for', 'what are the requirements']]),
+    Rule('search.admission', SEARCH_TOPIC, [['admission', 'admission policy', 'admission rules']], none_of=['requirements']),
+
+    # Explicit section references (first match wins)
+    Rule('search.section_1', SEARCH_SECTION, [['section 1', 'section1']], payload='SECTION 1'),
+    Rule('search.section_2', SEARCH_SECTION, [['section 2', 'section2']], payload='SECTION 2'),
+
+    # Special handling in apply_special_handling
+    Rule('special.cross_enrolment', SPECIAL_HANDLING, [['inbound', 'outbound', 'in campus', 'out campus']]),
+    Rule('special.sports', SPECIAL_HANDLING, [['sports', 'athlete', 'winning athletes']]),
+    Rule('special.culture_arts', SPECIAL_HANDLING, [['culture', 'arts', 'cado']]),
+    Rule('special.conditions', SPECIAL_HANDLING, [['conditions', 'requirements', 'four conditions', 'five requirements', 'beyond gpa']]),
+    Rule('special.honors_beyond_gpa', SPECIAL_HANDLING, [['honors'], ['beyond']]),
+    Rule('special.pwd_facilities', SPECIAL_HANDLING, [['facilities'], ['disability', 'pwd']]),
+    Rule('special.midyear_rationale', SPECIAL_HANDLING, [['mid-year'], ['unnecessary', 'why']]),
+
+    # Targeted extraction in extract_specific_item: payload lists the line keywords to look for
+    Rule('extract.vision_statement', EXTRACT_ITEM, [['vision statement']], payload=('university vision', 'vision')),
+    Rule('extract.vision', EXTRACT_ITEM, [['vision']], payload=('university vision', 'vision')),
+    Rule('extract.mission_statement', EXTRACT_ITEM, [['mission statement']], payload=('university mission', 'mission')),
+    Rule('extract.mission', EXTRACT_ITEM, [['mission']], payload=('university mission', 'mission')),
+    Rule('extract.quality_policy', EXTRACT_ITEM, [['quality policy']], payload=('quality policy',)),
+    Rule('extract.president', EXTRACT_ITEM, [['president']], payload=('president', 'university president')),
+    Rule('extract.acronym', EXTRACT_ITEM, [['acronym']], payload=('acronym', 'stands for')),
+    Rule('extract.establishment', EXTRACT_ITEM, [['establishment']], payload=('established', 'establishment')),
+    Rule('extract.campus_count', EXTRACT_ITEM, [['campus count']], payload=('campuses', 'campus')),
+    Rule('extract.penalty', EXTRACT_ITEM, [['penalty']], payload=('penalty', 'offense', 'suspension', 'expulsion')),
+    Rule('extract.requirements', EXTRACT_ITEM, [['requirements']], payload=('requirements', 'must submit', 'include')),
+    Rule('extract.timeframe', EXTRACT_ITEM, [['timeframe']], payload=('weeks', 'days', 'within')),
+    Rule('extract.percentage', EXTRACT_ITEM, [['percentage']], payload=('percent', '%')),
+    Rule('extract.gpa', EXTRACT_ITEM, [['gpa']], payload=('gwa', 'gpa', 'cum laude', 'magna', 'summa')),
+
+    # Question types used when judging answers
+    Rule('type.list', QUESTION_TYPE, [['requirements', 'what are', 'list', 'all', 'organizations', 'groups']]),
+    Rule('type.acronym', QUESTION_TYPE, [['stands for', 'what does', 'acronym']]),
+    Rule('type.date', QUESTION_TYPE, [['when', 'established', 'date']]),
+    Rule('type.count', QUESTION_TYPE, [['how many', 'number of', 'count']]),
+    Rule('type.university_info', QUESTION_TYPE, [['prmsu', 'establishment', 'campus', 'stands for']]),
+]
+
+ENGINE = RuleEngine(RULES)
+
+
+@lru_cache(maxsize=4096)
+def match_question(question: str) -> RuleMatch:
+    """Match a question (any case) against the rule table, memoized per question text."""
+    return ENGINE.match(question.lower())
@@ -1,33 +1,86 @@
 """
 AWS S3 utilities for storing and retrieving vector database
+
+The database folder is synced file by file. Each file is stored once under
+`<prefix>objects/<sha256 of its content>`, and `<prefix>manifest.json` maps
+the folder's relative paths to those hashes. Uploads only send files whose
+content is not in the bucket yet, and downloads only fetch files that differ
+from the local copy, so both scale with what changed instead of with the
+database size. The manifest is written last, so a reader never sees a
+half-uploaded database.
 """
 
+import fnmatch
+import hashlib
+import json
 import os
-import shutil
+import time
 import zipfile
 import boto3
+from boto3.s3.transfer import TransferConfig
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
+
+MANIFEST_VERSION = 1
+
+# Hashes of the files as last synced, so unchanged files are not hashed again
+SYNC_STATE_FILE = ".s3_sync.json"
+
+# Files in the database folder that belong to a running server rather than to the database.
+# The query embedding cache holds raw student questions and changes with every new one.
+LOCAL_ONLY_PATTERNS = (SYNC_STATE_FILE, "*.lock", "write_queue.sqlite3*", "query_embeddings.sqlite3*", "*.s3tmp")
+
+# Files above this size are transferred in parallel parts of this size
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_local_only(relative_path: str) -> bool:
+    name = os.path.basename(relative_path)
+    return any(fnmatch.fnmatch(name, pattern) for pattern in LOCAL_ONLY_PATTERNS)
 
 
 class S3DatabaseManager:
     """Manages vector database storage in AWS S3"""
-    
+
     def __init__(self):
         """Initialize S3 client with credentials from environment"""
         self.access_key = os.getenv("AWS_ACCESS_KEY_ID")
         self.secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
         self.bucket_name = os.getenv("AWS_S3_BUCKET")
         self.region = os.getenv("AWS_REGION", "us-east-1")
+        # Local S3 stand-ins (moto server, MinIO) for testing
+        self.endpoint_url = os.getenv("AWS_S3_ENDPOINT_URL") or None
+        self.prefix = os.getenv("AWS_S3_PREFIX", "vector_db/")
+        self.manifest_key = f"{self.prefix}manifest.json"
+        # Whole-folder archive written by earlier versions, still restored when no manifest exists
         self.db_key = "vector_db.zip"
-        
+        self.max_concurrency = int(os.getenv("S3_MAX_CONCURRENCY", "8"))
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_CHUNK_SIZE,
+            multipart_chunksize=MULTIPART_CHUNK_SIZE,
+            max_concurrency=self.max_concurrency
+        )
+
         # Initialize S3 client if credentials are provided
         if self.access_key and self.secret_key and self.bucket_name:
             self.s3_client = boto3.client(
                 's3',
                 aws_access_key_id=self.access_key,
                 aws_secret_access_key=self.secret_key,
-                region_name=self.region
+                region_name=self.region,
+                endpoint_url=self.endpoint_url
             )
             self.enabled = True
             print("✅ S3 storage enabled")
@@ -35,77 +88,206 @@ class S3DatabaseManager:
             self.s3_client = None
             self.enabled = False
             print("⚠️  S3 storage disabled (credentials not provided)")
-    
+
+    def _object_key(self, sha256: str) -> str:
+        return f"{self.prefix}objects/{sha256}"
+
+    def _get_manifest(self) -> Optional[Dict]:
+        """The manifest in S3, or None if the database was never uploaded this way."""
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=self.manifest_key)
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        manifest = json.loads(response["Body"].read())
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported S3 manifest version {manifest.get('version')}")
+        return manifest
+
+    @staticmethod
+    def _scan(db_path: str) -> Dict[str, Dict]:
+        """
+        Relative path -> {sha256, size, mtime_ns} for every database file. Hashes recorded at
+        the last sync are reused for files whose size and modification time are unchanged.
+        """
+        try:
+            with open(os.path.join(db_path, SYNC_STATE_FILE)) as f:
+                synced = json.load(f)
+        except (OSError, ValueError):
+            synced = {}
+
+        files = {}
+        for path in Path(db_path).rglob("*"):
+            relative_path = path.relative_to(db_path).as_posix()
+            if not path.is_file() or is_local_only(relative_path):
+                continue
+            stat = path.stat()
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            previous = synced.get(relative_path)
+            if previous and previous.get("size") == entry["size"] and previous.get("mtime_ns") == entry["mtime_ns"]:
+                entry["sha256"] = previous["sha256"]
+            else:
+                entry["sha256"] = file_sha256(str(path))
+            files[relative_path] = entry
+        return files
+
+    @staticmethod
+    def _save_state(db_path: str, files: Dict[str, Dict]):
+        state_path = os.path.join(db_path, SYNC_STATE_FILE)
+        with open(f"{state_path}.s3tmp", "w") as f:
+            json.dump(files, f)
+        os.replace(f"{state_path}.s3tmp", state_path)
+
+    def _transfer_all(self, transfer, items) -> int:
+        """Run transfer(item) for each item in parallel; returns how many there were."""
+        items = list(items)
+        if items:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="s3-sync") as executor:
+                # list() re-raises the first failed transfer
+                list(executor.map(transfer, items))
+        return len(items)
+
     def download_database(self, db_path: str = "./vector_db") -> bool:
-        """Download vector database from S3"""
+        """Download vector database from S3, fetching only files that differ from the local copy"""
         if not self.enabled:
             print("⚠️  S3 storage disabled, skipping download")
             return False
-        
+
         try:
             print(f"📥 Downloading database from S3...")
-            
+            started = time.perf_counter()
+            manifest = self._get_manifest()
+            if manifest is None:
+                return self._download_archive(db_path)
+
+            os.makedirs(db_path, exist_ok=True)
+            local_files = self._scan(db_path)
+            remote_files = manifest["files"]
+            missing = [relative_path for relative_path, entry in remote_files.items()
+                       if local_files.get(relative_path, {}).get("sha256") != entry["sha256"]]
+
+            def fetch(relative_path: str):
+                path = os.path.join(db_path, relative_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self.s3_client.download_file(self.bucket_name, self._object_key(remote_files[relative_path]["sha256"]),
+                                             f"{path}.s3tmp", Config=self.transfer_config)
+                os.replace(f"{path}.s3tmp", path)
+
+            self._transfer_all(fetch, missing)
+
+            # Files the uploaded database no longer has (e.g. segments of a dropped collection)
+            for relative_path in set(local_files) - set(remote_files):
+                os.remove(os.path.join(db_path, relative_path))
+            for directory in sorted(Path(db_path).rglob("*"), key=lambda p: len(p.parts), reverse=True):
+                if directory.is_dir() and not any(directory.iterdir()):
+                    directory.rmdir()
+
+            for relative_path in missing:
+                stat = os.stat(os.path.join(db_path, relative_path))
+                local_files[relative_path] = {"sha256": remote_files[relative_path]["sha256"],
+                                              "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            self._save_state(db_path, {relative_path: local_files[relative_path] for relative_path in remote_files})
+
+            fetched_bytes = sum(remote_files[relative_path]["size"] for relative_path in missing)
+            print(f"✅ Database restored from S3: fetched {len(missing)} of {len(remote_files)} files "
+                  f"({fetched_bytes / 1e6:.1f} MB) in {time.perf_counter() - started:.2f}s")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error downloading database: {e}")
+            return False
+
+    def _download_archive(self, db_path: str) -> bool:
+        """Restore the whole-folder zip uploaded by earlier versions."""
+        try:
             # Download zip file
             zip_path = f"{db_path}.zip"
             self.s3_client.download_file(
                 self.bucket_name,
                 self.db_key,
-                zip_path
+                zip_path,
+                Config=self.transfer_config
             )
             print(f"✅ Downloaded {zip_path}")
-            
+
             # Extract zip file
             with zipfile.ZipFile(zip_path, 'r') as zip_ref:
                 zip_ref.extractall(db_path)
             print(f"✅ Extracted to {db_path}")
-            
+
             # Remove zip file
             os.remove(zip_path)
-            print(f"✅ Database restored from S3")
+            print(f"✅ Database restored from S3 archive; the next upload switches it to per-file sync")
             return True
-            
-        except self.s3_client.exceptions.NoSuchKey:
-            print("⚠️  Database not found in S3 (first deployment)")
-            return False
+
         except Exception as e:
-            print(f"❌ Error downloading database: {e}")
-            return False
-    
+            # A missing archive is a 404 from download_file
+            if getattr(e, "response", {}).get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                print("⚠️  Database not found in S3 (first deployment)")
+                return False
+            raise
+
     def upload_database(self, db_path: str = "./vector_db") -> bool:
-        """Upload vector database to S3"""
+        """Upload vector database to S3, sending only files whose content is not there yet"""
         if not self.enabled:
             print("⚠️  S3 storage disabled, skipping upload")
             return False
-        
+
         try:
             if not os.path.exists(db_path):
                 print(f"⚠️  Database path not found: {db_path}")
                 return False
-            
+
             print(f"📤 Uploading database to S3...")
-            
-            # Create zip file
-            zip_path = f"{db_path}.zip"
-            shutil.make_archive(db_path, 'zip', db_path)
-            print(f"✅ Created {zip_path}")
-            
-            # Upload to S3
-            self.s3_client.upload_file(
-                zip_path,
-                self.bucket_name,
-                self.db_key
-            )
-            print(f"✅ Uploaded to S3")
-            
-            # Remove zip file
-            os.remove(zip_path)
-            print(f"✅ Database backed up to S3")
+            started = time.perf_counter()
+            previous = self._get_manifest()
+            previous_files = previous["files"] if previous else {}
+            stored_hashes = {entry["sha256"] for entry in previous_files.values()}
+
+            local_files = self._scan(db_path)
+            # One upload per distinct new content, whichever file has it
+            new_objects = {entry["sha256"]: relative_path for relative_path, entry in local_files.items()
+                           if entry["sha256"] not in stored_hashes}
+
+            def send(item):
+                sha256, relative_path = item
+                self.s3_client.upload_file(os.path.join(db_path, relative_path), self.bucket_name,
+                                           self._object_key(sha256), Config=self.transfer_config)
+
+            self._transfer_all(send, new_objects.items())
+
+            manifest = {
+                "version": MANIFEST_VERSION,
+                "files": {relative_path: {"sha256": entry["sha256"], "size": entry["size"]}
+                          for relative_path, entry in local_files.items()}
+            }
+            self.s3_client.put_object(Bucket=self.bucket_name, Key=self.manifest_key,
+                                      Body=json.dumps(manifest).encode(), ContentType="application/json")
+            self._save_state(db_path, local_files)
+
+            # Objects of the previous manifest stay for servers still downloading it
+            self._remove_unreferenced_objects(stored_hashes | {entry["sha256"] for entry in local_files.values()})
+
+            sent_bytes = sum(local_files[relative_path]["size"] for relative_path in new_objects.values())
+            print(f"✅ Database backed up to S3: sent {len(new_objects)} of {len(local_files)} files "
+                  f"({sent_bytes / 1e6:.1f} MB) in {time.perf_counter() - started:.2f}s")
             return True
-            
+
         except Exception as e:
             print(f"❌ Error uploading database: {e}")
             return False
 
+    def _remove_unreferenced_objects(self, keep_hashes):
+        object_prefix = self._object_key("")
+        stale = []
+        for page in self.s3_client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket_name,
+                                                                             Prefix=object_prefix):
+            for item in page.get("Contents", []):
+                if item["Key"][len(object_prefix):] not in keep_hashes:
+                    stale.append({"Key": item["Key"]})
+        # delete_objects accepts up to 1000 keys per call
+        for start in range(0, len(stale), 1000):
+            self.s3_client.delete_objects(Bucket=self.bucket_name, Delete={"Objects": stale[start:start + 1000]})
+
 
 # Global S3 manager instance
 s3_manager: Optional[S3DatabaseManager] = None
@@ -117,4 +299,3 @@ def get_s3_manager() -> S3DatabaseManager:
     if s3_manager is None:
         s3_manager = S3DatabaseManager()
     return s3_manager
-
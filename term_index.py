@@ -0,0 +1,129 @@
+"""
+Exact term lookup
+
+Maps each chunk's normalized term, plus a few aliases, to chunk IDs in an
+in-memory dictionary. A question that names a term outright ("define Cross
+Enrolment", "what is grade range 1.75?") is then answered with one hash
+lookup and no embedding or nearest-neighbour query. The index is built from
+the collection at load time and kept in sync through DefinitionChunker
+change notifications.
+"""
+
+import re
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+# Bumped whenever normalized_fields() in definition_chunker changes, so older stored fields are recomputed
+NORMALIZED_VERSION = 1
+
+# Question phrasing removed before comparing a query with term names
+QUERY_PREFIXES = ('what is ', 'what are ', 'define ', 'the ', 'tell me about ', '?')
+
+# Words, numbers and dotted abbreviations ("1.75", "i.d", "mid-year")
+TERM_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.'’-][a-z0-9]+)*")
+
+# "TERM – definition text" and "TERM -" headings: the term is the part before the dash
+TERM_HEAD_PATTERN = re.compile(r"\s+[–—-](?:\s+|$)")
+PARENTHETICAL_PATTERN = re.compile(r"\s*\(([^)]*)\)")
+
+
+def clean_query(query: str) -> str:
+    """Lowercased query without question phrasing, for comparing with term names."""
+    query_clean = query.lower()
+    for phrase in QUERY_PREFIXES:
+        query_clean = query_clean.replace(phrase, '')
+    return query_clean.strip()
+
+
+def normalize_term(text: str) -> str:
+    """Lookup key: lowercase tokens without punctuation or "the"."""
+    return " ".join(token for token in TERM_TOKEN_PATTERN.findall(text.lower()) if token != "the")
+
+
+def term_aliases(term: str) -> Set[str]:
+    """Keys a term is found under: the full term, its heading before a dash, and that heading without or as its parenthetical."""
+    aliases = {normalize_term(term)}
+    head = TERM_HEAD_PATTERN.split(term, maxsplit=1)[0]
+    aliases.add(normalize_term(head))
+    without_parenthetical = PARENTHETICAL_PATTERN.sub("", head)
+    aliases.add(normalize_term(without_parenthetical))
+    # Single-word abbreviations such as "(LOA)"
+    for inner in PARENTHETICAL_PATTERN.findall(head):
+        if len(inner.split()) == 1:
+            aliases.add(normalize_term(inner))
+    aliases.discard("")
+    return aliases
+
+
+class TermIndex:
+    """Thread-safe dictionary from normalized term and aliases to chunk IDs."""
+
+    def __init__(self, collection, page_size: int = 1000):
+        self.collection = collection
+        self.page_size = page_size
+        self._lock = threading.RLock()
+        # key -> chunk IDs in insertion order (dict used as an ordered set)
+        self._ids: Dict[str, Dict[str, None]] = {}
+        self._doc_keys: Dict[str, Set[str]] = {}
+        self.rebuild()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def rebuild(self):
+        """Re-read all chunk terms from the collection."""
+        with self._lock:
+            self._ids, self._doc_keys = {}, {}
+            offset = 0
+            while True:
+                page = self.collection.get(limit=self.page_size, offset=offset, include=["metadatas"])
+                if not page["ids"]:
+                    break
+                offset += len(page["ids"])
+                for doc_id, metadata in zip(page["ids"], page["metadatas"] or []):
+                    self._add(doc_id, metadata)
+        print(f"✅ Built term index with {len(self._ids)} terms")
+
+    def _add(self, doc_id: str, metadata: Optional[Dict[str, Any]]):
+        self._remove(doc_id)
+        metadata = metadata or {}
+        if metadata.get("normalized_version") == NORMALIZED_VERSION and "term_keys" in metadata:
+            keys = set(filter(None, str(metadata["term_keys"]).split("|")))
+        else:
+            keys = term_aliases(str(metadata.get("term", "")))
+        self._doc_keys[doc_id] = keys
+        for key in keys:
+            self._ids.setdefault(key, {})[doc_id] = None
+
+    def _remove(self, doc_id: str):
+        for key in self._doc_keys.pop(doc_id, ()):
+            ids = self._ids.get(key)
+            if ids is not None:
+                ids.pop(doc_id, None)
+                if not ids:
+                    del self._ids[key]
+
+    def on_change(self, event: str, ids: List[str]):
+        """DefinitionChunker change listener keeping the index in sync with the collection."""
+        with self._lock:
+            if event == "clear":
+                self._ids, self._doc_keys = {}, {}
+            elif event == "reload":
+                self.rebuild()
+            elif event == "delete":
+                for doc_id in ids:
+                    self._remove(doc_id)
+            elif event == "add":
+                ids = list(ids)
+                for start in range(0, len(ids), self.page_size):
+                    added = self.collection.get(ids=ids[start:start + self.page_size], include=["metadatas"])
+                    for doc_id, metadata in zip(added["ids"], added["metadatas"] or []):
+                        self._add(doc_id, metadata)
+
+    def lookup(self, text: str) -> List[str]:
+        """IDs of chunks whose term (or an alias of it) equals `text` after normalization."""
+        key = normalize_term(text)
+        if not key:
+            return []
+        with self._lock:
+            return list(self._ids.get(key, ()))
@@ -0,0 +1,66 @@
+"""BoundedThreadPool queue accounting."""
+
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from thread_pool import BoundedThreadPool, PoolSaturatedError
+
+
+def test_cancel_while_queued_frees_the_queue_slot():
+    async def scenario():
+        pool = BoundedThreadPool(max_workers=1, max_queue=4)
+        release = threading.Event()
+        blocker = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+
+        # These wait behind the blocker and are cancelled before a thread picks them up
+        waiting = [asyncio.ensure_future(pool.run(lambda: "never")) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        assert pool.stats()["queue_depth"] == 4
+        try:
+            await pool.run(lambda: "rejected")
+        except PoolSaturatedError:
+            pass
+        else:
+            raise AssertionError("a full queue should reject new jobs")
+
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        assert pool.stats()["queue_depth"] == 0
+
+        release.set()
+        await blocker
+        assert await pool.run(lambda: "ok") == "ok"
+        stats = pool.stats()
+        assert stats["queue_depth"] == 0 and stats["running"] == 0 and stats["completed"] == 2
+        pool.shutdown(wait=True)
+
+    asyncio.run(scenario())
+
+
+def test_cancel_while_running_lets_the_job_finish():
+    async def scenario():
+        pool = BoundedThreadPool(max_workers=1, max_queue=4)
+        started, release, finished = threading.Event(), threading.Event(), threading.Event()
+
+        def job():
+            started.set()
+            release.wait()
+            finished.set()
+
+        task = asyncio.ensure_future(pool.run(job))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        release.set()
+        await asyncio.get_running_loop().run_in_executor(None, finished.wait)
+        pool.shutdown(wait=True)
+        stats = pool.stats()
+        assert stats["queue_depth"] == 0 and stats["running"] == 0 and stats["completed"] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,93 @@
+"""
+Bounded thread pool for running blocking chatbot work from async endpoints
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the pool queue is full and a new job cannot be accepted."""
+
+
+class BoundedThreadPool:
+    """Runs blocking callables (Chroma queries, Cohere calls) off the event loop."""
+
+    def __init__(self, max_workers: int = 32, max_queue: int = 256, name: str = "chatbot"):
+        """Create a pool with at most `max_workers` threads and `max_queue` waiting jobs (0 = unbounded)."""
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run `func(*args, **kwargs)` on the pool and await its result."""
+        with self._lock:
+            if self.max_queue and self._queued >= self.max_queue:
+                self._rejected += 1
+                raise PoolSaturatedError(f"{self._queued} jobs already waiting for a worker")
+            self._queued += 1
+
+        # Carry context variables (e.g. per-request state) into the worker thread
+        context = contextvars.copy_context()
+        started = False
+
+        def call():
+            nonlocal started
+            with self._lock:
+                started = True
+                self._queued -= 1
+                self._running += 1
+            try:
+                return context.run(func, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        try:
+            job = self._executor.submit(call)
+        except RuntimeError:
+            # Pool already shut down
+            with self._lock:
+                self._queued -= 1
+            raise
+        try:
+            return await asyncio.wrap_future(job)
+        except asyncio.CancelledError:
+            # The caller went away (client disconnect, timeout). A job still waiting for a thread
+            # never runs call(), so it leaves the queue count here; a running one finishes normally.
+            if job.cancel():
+                with self._lock:
+                    if not started:
+                        started = True
+                        self._queued -= 1
+            raise
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs submitted but not yet picked up by a worker."""
+        return self._queued
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of pool utilisation for health and metrics endpoints."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting work and release the worker threads."""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,180 @@
+"""
+Per-request timing spans for the chat pipeline
+
+Code marks its stages with `with span("embed"):` or `@timed("rerank")`.
+While a request is being timed (see request_timings) every span adds its own
+time, not counting nested spans, to the request's breakdown; outside a request
+spans do nothing. Finished requests feed in-process histograms that /metrics
+renders in Prometheus text format, so no metrics service is needed.
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def metric_lines(name: str, kind: str, help_text: str, samples: List[Tuple[str, Dict[str, str], float]]) -> List[str]:
+    """Prometheus text exposition lines for one metric: (suffix, labels, value) samples."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for suffix, labels, value in samples:
+        label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+        lines.append(f"{name}{suffix}{{{label_text}}} {value:g}" if label_text else f"{name}{suffix} {value:g}")
+    return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """Thread-safe cumulative histogram with a fixed set of label names."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # label values -> (per-bucket counts, sum, count)
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                labels = dict(zip(self.label_names, key))
+                for bound, bucket_count in zip(self.buckets, counts):
+                    samples.append(("_bucket", {**labels, "le": f"{bound:g}"}, bucket_count))
+                samples.append(("_bucket", {**labels, "le": "+Inf"}, count))
+                samples.append(("_sum", labels, total))
+                samples.append(("_count", labels, count))
+        return metric_lines(self.name, "histogram", self.help_text, samples)
+
+
+STAGE_SECONDS = Histogram(
+    "chat_stage_duration_seconds",
+    "Time one request spent in each chat pipeline stage (nested stages excluded)",
+    ("endpoint", "stage")
+)
+REQUEST_SECONDS = Histogram(
+    "chat_request_duration_seconds",
+    "Total time taken to answer a chat request",
+    ("endpoint", "served_by")
+)
+
+
+class RequestTimings:
+    """Stage durations collected for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stages: Dict[str, float] = {}
+        self.total: Optional[float] = None
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self._stages[stage] = self._stages.get(stage, 0.0) + seconds
+
+    def as_ms(self) -> Dict[str, float]:
+        """Stage durations in milliseconds, in the order the stages first ran, plus the total."""
+        with self._lock:
+            timings = {stage: round(seconds * 1000, 3) for stage, seconds in self._stages.items()}
+        total = self.total if self.total is not None else time.perf_counter() - self.started
+        timings["total"] = round(total * 1000, 3)
+        return timings
+
+    def server_timing(self) -> str:
+        """Value for the Server-Timing response header."""
+        return ", ".join(f"{stage};dur={ms}" for stage, ms in self.as_ms().items())
+
+    def finish(self, endpoint: str, served_by: str):
+        """Stop the clock and add this request to the histograms."""
+        self.total = time.perf_counter() - self.started
+        with self._lock:
+            stages = dict(self._stages)
+        for stage, seconds in stages.items():
+            STAGE_SECONDS.observe(seconds, endpoint=endpoint, stage=stage)
+        REQUEST_SECONDS.observe(self.total, endpoint=endpoint, served_by=served_by)
+
+
+class _Span:
+    __slots__ = ("children",)
+
+    def __init__(self):
+        self.children = 0.0
+
+
+_current_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "current_timings", default=None)
+_current_span: contextvars.ContextVar[Optional[_Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+@contextmanager
+def request_timings() -> Iterator[RequestTimings]:
+    """Time the spans run by this request, including work it hands to the thread pool."""
+    timings = RequestTimings()
+    previous = _current_timings.get()
+    _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.set(previous)
+
+
+@contextmanager
+def span(stage: str):
+    """Add the time spent in this block (minus nested spans) to the current request's `stage`."""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+
+    parent = _current_span.get()
+    current = _Span()
+    _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        # Restored by value, not token: generators may resume in a different context
+        _current_span.set(parent)
+        if parent is not None:
+            parent.children += elapsed
+        timings.add(stage, max(elapsed - current.children, 0.0))
+
+
+def timed(stage: str) -> Callable:
+    """Decorator form of span()."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_metrics() -> List[str]:
+    """Exposition lines for the timing histograms."""
+    return STAGE_SECONDS.render() + REQUEST_SECONDS.render()
@@ -0,0 +1,527 @@
+"""
+In-process vector index for small collections
+
+Keeps every embedding of a Chroma collection in one contiguous float32 matrix
+(memory-mapped from sidecar files next to the database) and answers top-k
+queries with a single matrix-vector product plus argpartition.
+"""
+
+import contextlib
+import hashlib
+import json
+import mmap
+import os
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+# Distances match the Chroma/hnswlib definitions for each space
+SUPPORTED_SPACES = ("l2", "cosine", "ip")
+
+
+def collection_space(collection) -> str:
+    """Distance space a Chroma collection was created with (defaults to l2)."""
+    configuration = getattr(collection, "configuration", None) or {}
+    space = ((configuration.get("hnsw") or {}).get("space")
+             or (collection.metadata or {}).get("hnsw:space")
+             or "l2")
+    return space if space in SUPPORTED_SPACES else "l2"
+
+
+
+def embedding_distances(query_embedding: List[float], embeddings: List[List[float]], space: str = "l2") -> List[float]:
+    """Distances from one query to a few stored embeddings, as Chroma would report them."""
+    if not len(embeddings):
+        return []
+    query = np.asarray(query_embedding, dtype=np.float32)
+    rows = np.asarray(embeddings, dtype=np.float32)
+    if space == "l2":
+        distances = np.einsum("ij,ij->i", rows - query, rows - query)
+    elif space == "ip":
+        distances = 1.0 - rows @ query
+    else:
+        norms = np.linalg.norm(rows, axis=1) * (np.linalg.norm(query) or 1.0)
+        norms[norms == 0] = 1.0
+        distances = 1.0 - (rows @ query) / norms
+    return [float(d) for d in np.maximum(distances, 0.0)]
+
+def _id_hash(doc_id: str) -> int:
+    return int.from_bytes(hashlib.sha256(doc_id.encode("utf-8")).digest()[:16], "big")
+
+
+def _ids_digest(ids: Iterable[str], digest: int = 0) -> int:
+    """
+    Order-independent fingerprint of a set of chunk IDs: the XOR of their hashes. XOR-ing an
+    ID in again removes it, so adds and deletes update the fingerprint without all the IDs.
+    """
+    for doc_id in ids:
+        digest ^= _id_hash(doc_id)
+    return digest
+
+
+@contextlib.contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """Exclusive lock shared by every process using `path` (no-op where fcntl is unavailable)."""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# Sidecar layout written by this version; manifests of other layouts trigger a rebuild
+SIDECAR_FORMAT = 2
+
+# Rewrite the sidecar without deleted rows once they exceed this share of all rows
+COMPACT_FRACTION = 0.25
+
+
+class _IndexView:
+    """
+    One mapped sidecar state. Never modified after creation, so a search can take the
+    current view under the index lock and do its matrix work and row decoding without it.
+    """
+
+    def __init__(self, generation: int, version: int, matrix: np.ndarray, offsets: np.ndarray, rows: Any,
+                 space: str, deleted: Optional[np.ndarray] = None, sq_norms: Optional[np.ndarray] = None):
+        self.generation = generation
+        self.version = version
+        self.count = len(matrix)
+        self.matrix = matrix
+        self.offsets = offsets
+        self.rows = rows
+        self.space = space
+        # Boolean mask of rows that were deleted or replaced since the generation was written
+        self.deleted = deleted if deleted is not None and deleted.any() else None
+        self.live = self.count - (int(self.deleted.sum()) if self.deleted is not None else 0)
+        # Precomputed so l2 needs only the query product: |x - q|^2 = |x|^2 - 2 x.q + |q|^2
+        if sq_norms is None:
+            sq_norms = np.einsum("ij,ij->i", matrix, matrix) if self.count else np.zeros(0, dtype=np.float32)
+        self.sq_norms = sq_norms
+        self.row_norms = None
+        if space == "cosine" and self.count:
+            self.row_norms = np.sqrt(self.sq_norms)
+            self.row_norms[self.row_norms == 0] = 1.0
+
+    def row(self, i: int) -> List[Any]:
+        """[id, document, metadata] of row `i`, decoded from the mapped rows file."""
+        return json.loads(self.record(i))
+
+    def record(self, i: int) -> bytes:
+        return self.rows[int(self.offsets[i]):int(self.offsets[i + 1])]
+
+    def distances(self, queries: np.ndarray) -> np.ndarray:
+        """Distance matrix of shape (n_queries, n_rows); deleted rows are infinitely far."""
+        scores = queries @ self.matrix.T
+        if self.space == "l2":
+            distances = self.sq_norms[None, :] - 2 * scores + np.einsum("ij,ij->i", queries, queries)[:, None]
+        elif self.space == "ip":
+            distances = 1.0 - scores
+        else:
+            query_norms = np.linalg.norm(queries, axis=1)
+            query_norms[query_norms == 0] = 1.0
+            distances = 1.0 - scores / (query_norms[:, None] * self.row_norms[None, :])
+        if self.deleted is not None:
+            distances[:, self.deleted] = np.inf
+        return distances
+
+
+class NumpyVectorIndex:
+    """
+    Exact top-k search over a collection's embeddings held in memory.
+
+    The sidecar is written in numbered generations: a raw float32 matrix, the
+    rows' IDs, documents and metadata as JSON records with an offsets array, and
+    a small manifest replaced last. Adds append to the current generation's
+    files and deletes only mark rows in a tombstone bitmap; each such update
+    bumps the manifest's version. Once tombstones pass COMPACT_FRACTION, the
+    live rows are written out as the next generation. Every file is
+    memory-mapped read-only, so processes serving the same database share one
+    copy through the page cache; refresh() maps a newer version written by
+    another process.
+    """
+
+    def __init__(self, collection, index_dir: str, space: Optional[str] = None):
+        """Index `collection`, keeping sidecar files in `index_dir`."""
+        self.collection = collection
+        self.space = space or collection_space(collection)
+        self.index_dir = index_dir
+        self.prefix = f"{collection.name}_index"
+        self.manifest_path = os.path.join(index_dir, f"{self.prefix}.json")
+        self._lock = threading.RLock()
+        # (mtime, size, inode) of the manifest last mapped, for a stat-only staleness check
+        self._signature: Optional[Tuple[int, int, int]] = None
+        # Set when a write had to map another process's newer version first; reported by refresh()
+        self._reload_pending = False
+        self._manifest: Dict[str, Any] = {}
+        self._view = _IndexView(0, 0, np.zeros((0, 0), dtype=np.float32), np.zeros(1, dtype=np.int64), b"", self.space)
+        # Live chunk ID -> row, for deletes; built on first use, valid for the (generation, version) it was built at
+        self._id_rows: Optional[Dict[str, int]] = None
+        self._id_rows_state: Optional[Tuple[int, int]] = None
+        self.load()
+
+    def __len__(self) -> int:
+        return self._view.live
+
+    @property
+    def generation(self) -> int:
+        return self._view.generation
+
+    @property
+    def _count(self) -> int:
+        return self._view.live
+
+    def _state(self) -> Tuple[int, int]:
+        return self._view.generation, self._view.version
+
+    def load(self):
+        """Memory-map the sidecar files, rebuilding them if they don't match the collection."""
+        with self._lock, _file_lock(os.path.join(self.index_dir, f"{self.prefix}.lock")):
+            # Several worker processes may start at once: the first rebuilds, the rest map its result
+            if self._load_sidecar():
+                print(f"✅ Loaded vector index with {self._count} embeddings")
+                return
+            self._rebuild_locked()
+
+    def _read_manifest(self, any_format: bool = False) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if any_format:
+            return manifest
+        if manifest.get("format") != SIDECAR_FORMAT or manifest.get("space") != self.space:
+            return None
+        return manifest
+
+    def _load_sidecar(self) -> bool:
+        manifest = self._read_manifest()
+        if not manifest:
+            return False
+        try:
+            # Cheap ID-only read to make sure nobody changed the collection behind our back
+            current_ids = self.collection.get(include=[])["ids"]
+            if format(_ids_digest(current_ids), "x") != manifest.get("ids_digest"):
+                return False
+            self._map(manifest)
+        except Exception as e:
+            print(f"⚠️  Could not load vector index sidecar: {e}")
+            return False
+        return True
+
+    def rebuild(self):
+        """Load all embeddings and metadata from the collection and write a new sidecar generation."""
+        with self._lock, _file_lock(os.path.join(self.index_dir, f"{self.prefix}.lock")):
+            self._rebuild_locked()
+
+    def _rebuild_locked(self):
+        results = self.collection.get(include=["embeddings", "documents", "metadatas"])
+        matrix = np.asarray(results["embeddings"], dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        records = [self._encode(doc_id, document, metadata) for doc_id, document, metadata
+                   in zip(results["ids"], results["documents"] or [], results["metadatas"] or [])]
+        self._write_generation(records, matrix, _ids_digest(results["ids"]))
+        print(f"✅ Built vector index with {self._count} embeddings")
+
+    @staticmethod
+    def _encode(doc_id: str, document: str, metadata: Optional[Dict[str, Any]]) -> bytes:
+        return json.dumps([doc_id, document, dict(metadata or {})]).encode("utf-8")
+
+    def _path(self, generation: int, suffix: str) -> str:
+        return os.path.join(self.index_dir, f"{self.prefix}.{generation}.{suffix}")
+
+    def _map(self, manifest: Dict[str, Any], deleted: Optional[np.ndarray] = None,
+             sq_norms: Optional[np.ndarray] = None):
+        """
+        Point this index at the state a manifest describes. The writer passes the tombstone
+        mask and norms it already has; other processes read and compute them.
+        """
+        generation, version = int(manifest["generation"]), int(manifest["version"])
+        count, dim = int(manifest["count"]), int(manifest["dim"])
+        offsets = np.memmap(self._path(generation, "offsets"), dtype=np.int64, mode="r", shape=(count + 1,))
+        # Zero-length files can't be memory-mapped
+        if count and dim:
+            matrix = np.memmap(self._path(generation, "f32"), dtype=np.float32, mode="r", shape=(count, dim))
+        else:
+            matrix = np.zeros((count, dim), dtype=np.float32)
+        rows: Any = b""
+        if offsets[-1] > 0:
+            with open(self._path(generation, "rows"), "rb") as f:
+                # Only the manifest's rows: later appends are not part of this state
+                rows = mmap.mmap(f.fileno(), int(offsets[-1]), access=mmap.ACCESS_READ)
+        if deleted is None and manifest.get("mask") is not None:
+            packed = np.fromfile(self._path(generation, f"{manifest['mask']}.mask"), dtype=np.uint8)
+            deleted = np.unpackbits(packed, count=count).astype(bool)
+        stat = os.stat(self.manifest_path)
+        view = _IndexView(generation, version, matrix, offsets, rows, self.space, deleted=deleted, sq_norms=sq_norms)
+
+        self._signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        self._manifest = manifest
+        # Searches holding the previous view keep using it (its files stay mapped) until they finish
+        self._view = view
+
+    def _publish(self, manifest: Dict[str, Any], **view_state):
+        manifest_tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(manifest_tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        # The manifest switch is what readers see: the files it names are complete by now
+        os.replace(manifest_tmp, self.manifest_path)
+        self._map(manifest, **view_state)
+
+    def _live_id_rows(self) -> Dict[str, int]:
+        """Live chunk ID -> row of the current view (decodes every row once per outside change)."""
+        if self._id_rows is None or self._id_rows_state != self._state():
+            view = self._view
+            self._id_rows = {view.row(i)[0]: i for i in range(view.count)
+                             if view.deleted is None or not view.deleted[i]}
+            self._id_rows_state = self._state()
+        return self._id_rows
+
+    def _updated_in_place(self, state: Tuple[int, int]) -> bool:
+        """
+        Whether the last write appended a version to the generation of `state`, so the ID map
+        can be patched instead of decoded again (it is dropped after compaction or failure).
+        """
+        generation, version = state
+        if self._id_rows is not None and self._state() == (generation, version + 1):
+            return True
+        self._id_rows = None
+        return False
+
+    def _write_generation(self, records: List[bytes], matrix: np.ndarray, ids_digest: int):
+        """Write the rows as the next sidecar generation, switch to it and remove generations before the last."""
+        # Numbered past whatever manifest is there, even one of an older layout
+        manifest = self._read_manifest(any_format=True) or {}
+        generation = max(self._view.generation, int(manifest.get("generation", 0))) + 1
+        try:
+            os.makedirs(self.index_dir or ".", exist_ok=True)
+            matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+            matrix.tofile(self._path(generation, "f32"))
+            offsets = [0]
+            with open(self._path(generation, "rows"), "wb") as f:
+                for record in records:
+                    f.write(record)
+                    offsets.append(offsets[-1] + len(record))
+            np.asarray(offsets, dtype=np.int64).tofile(self._path(generation, "offsets"))
+
+            self._publish({"format": SIDECAR_FORMAT, "space": self.space, "generation": generation, "version": 0,
+                           "count": len(records), "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+                           "mask": None, "ids_digest": format(ids_digest, "x")})
+            self._id_rows = None
+            self._remove_files(keep=(generation, generation - 1))
+        except Exception as e:
+            print(f"⚠️  Could not save vector index sidecar: {e}")
+
+    def _update(self, records: List[bytes], new_rows: np.ndarray, removed_rows: List[int], ids_digest: int):
+        """
+        Append rows to the current generation and tombstone `removed_rows`, as a new version.
+        Cost follows the change, apart from the tombstone bitmap (one bit per row).
+        """
+        view = self._view
+        dim = int(new_rows.shape[1]) if len(new_rows) else int(view.matrix.shape[1])
+        if not view.generation or (view.count and dim != view.matrix.shape[1]):
+            # No sidecar to append to yet, or a new embedding size
+            self._rebuild_locked()
+            return
+        count = view.count + len(records)
+        deleted = np.zeros(count, dtype=bool)
+        if view.deleted is not None:
+            deleted[:view.count] = view.deleted
+        deleted[removed_rows] = True
+        if deleted.sum() > COMPACT_FRACTION * count:
+            # Compact: live rows become the next generation, their records copied without decoding
+            live = np.flatnonzero(~deleted[:view.count])
+            matrix = np.concatenate([view.matrix[live], new_rows]) if len(new_rows) else view.matrix[live]
+            self._write_generation([view.record(i) for i in live] + records, matrix, ids_digest)
+            return
+
+        generation, version = view.generation, view.version + 1
+        try:
+            if records:
+                # Drop bytes a crashed writer may have appended beyond the manifest's rows
+                offsets_end = int(view.offsets[-1])
+                with open(self._path(generation, "f32"), "ab") as f:
+                    f.truncate(view.count * dim * 4)
+                    f.write(np.ascontiguousarray(new_rows, dtype=np.float32).tobytes())
+                with open(self._path(generation, "rows"), "ab") as f:
+                    f.truncate(offsets_end)
+                    new_offsets = []
+                    for record in records:
+                        f.write(record)
+                        offsets_end += len(record)
+                        new_offsets.append(offsets_end)
+                with open(self._path(generation, "offsets"), "ab") as f:
+                    f.truncate((view.count + 1) * 8)
+                    f.write(np.asarray(new_offsets, dtype=np.int64).tobytes())
+            mask = None
+            if deleted.any():
+                mask = version
+                np.packbits(deleted).tofile(self._path(generation, f"{version}.mask"))
+
+            new_norms = np.einsum("ij,ij->i", new_rows, new_rows) if len(new_rows) else np.zeros(0, np.float32)
+            self._publish({"format": SIDECAR_FORMAT, "space": self.space, "generation": generation,
+                           "version": version, "count": count, "dim": dim, "mask": mask,
+                           "ids_digest": format(ids_digest, "x")},
+                          deleted=deleted, sq_norms=np.concatenate([view.sq_norms, new_norms]))
+            self._remove_files(keep=(generation, generation - 1), mask_versions=(version, version - 1))
+        except Exception as e:
+            print(f"⚠️  Could not save vector index sidecar: {e}")
+
+    def _remove_files(self, keep: Tuple[int, ...], mask_versions: Tuple[int, ...] = ()):
+        """
+        Delete generations other than `keep` (the previous one stays for readers that are still
+        switching) and, within the current generation, tombstone masks other than `mask_versions`.
+        """
+        for name in os.listdir(self.index_dir):
+            if name == f"{self.prefix}.npy":
+                # Matrix of the single-file sidecar format used before generations
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(self.index_dir, name))
+                continue
+            parts = name[len(self.prefix) + 1:].split(".") if name.startswith(self.prefix + ".") else []
+            if len(parts) < 2 or not parts[0].isdigit():
+                continue
+            generation = int(parts[0])
+            stale_mask = (generation == keep[0] and parts[-1] == "mask" and parts[1].isdigit()
+                          and mask_versions and int(parts[1]) not in mask_versions)
+            if generation not in keep or stale_mask:
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(self.index_dir, name))
+
+    def refresh(self) -> bool:
+        """
+        Map the newest sidecar version if another process wrote one since this
+        index was loaded. Costs one stat() when nothing changed; returns True after a reload.
+        """
+        if self._reload_pending:
+            with self._lock:
+                self._reload_pending = False
+            return True
+        try:
+            stat = os.stat(self.manifest_path)
+        except OSError:
+            return False
+        if (stat.st_mtime_ns, stat.st_size, stat.st_ino) == self._signature:
+            return False
+        with self._lock:
+            manifest = self._read_manifest()
+            if not manifest:
+                return False
+            if (int(manifest["generation"]), int(manifest["version"])) == self._state():
+                self._signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+                return False
+            try:
+                self._map(manifest)
+            except (OSError, ValueError) as e:
+                # Replaced again while we were switching; the next call picks up the newer one
+                print(f"⚠️  Could not map vector index generation {manifest['generation']}: {e}")
+                return False
+            print(f"🔄 Reloaded vector index generation {self.generation}.{self._view.version} "
+                  f"({self._count} embeddings)")
+            return True
+
+    def _catch_up_locked(self):
+        """Map the version another process wrote since our last refresh, so a write builds on it."""
+        manifest = self._read_manifest()
+        if not manifest:
+            return
+        if (int(manifest["generation"]), int(manifest["version"])) == self._state():
+            return
+        try:
+            self._map(manifest)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not map vector index generation {manifest['generation']}: {e}")
+            self._rebuild_locked()
+        self._reload_pending = True
+        print(f"🔄 Reloaded vector index generation {self.generation}.{self._view.version} "
+              f"({self._count} embeddings)")
+
+    def on_change(self, event: str, ids: List[str]):
+        """DefinitionChunker change listener keeping the index in sync with the collection."""
+        with self._lock, _file_lock(os.path.join(self.index_dir, f"{self.prefix}.lock")):
+            # Another process may have written since this one last looked
+            self._catch_up_locked()
+            digest = int(self._manifest.get("ids_digest", "0"), 16)
+            if event == "clear":
+                self._write_generation([], np.zeros((0, 0), dtype=np.float32), 0)
+            elif event == "delete":
+                id_rows = self._live_id_rows()
+                removed = {doc_id: id_rows[doc_id] for doc_id in dict.fromkeys(ids) if doc_id in id_rows}
+                if not removed:
+                    return
+                state = self._state()
+                self._update([], np.zeros((0, 0), dtype=np.float32), list(removed.values()),
+                             _ids_digest(removed, digest))
+                if self._updated_in_place(state):
+                    for doc_id in removed:
+                        del id_rows[doc_id]
+                    self._id_rows_state = self._state()
+            elif event == "add":
+                added = self.collection.get(ids=list(ids), include=["embeddings", "documents", "metadatas"])
+                if not added["ids"]:
+                    return
+                id_rows = self._live_id_rows()
+                # Re-adding an existing ID (upsert) tombstones its old row
+                replaced = [doc_id for doc_id in added["ids"] if doc_id in id_rows]
+                digest = _ids_digest(added["ids"], _ids_digest(replaced, digest))
+                state, first_row = self._state(), self._view.count
+                self._update([self._encode(*row) for row in zip(added["ids"], added["documents"], added["metadatas"])],
+                             np.asarray(added["embeddings"], dtype=np.float32),
+                             [id_rows[doc_id] for doc_id in replaced], digest)
+                if self._updated_in_place(state):
+                    for offset, doc_id in enumerate(added["ids"]):
+                        id_rows[doc_id] = first_row + offset
+                    self._id_rows_state = self._state()
+
+    def query(self, query_embedding: List[float], n_results: int = 5) -> Dict[str, List]:
+        """
+        Top-k nearest rows for a query embedding.
+        Returns a single-query result dict shaped like Chroma's collection.query().
+        """
+        return self.query_batch([query_embedding], n_results=n_results)
+
+    def query_batch(self, query_embeddings: List[List[float]], n_results: int = 5) -> Dict[str, List]:
+        """Top-k nearest rows for several query embeddings with one matrix product, in input order."""
+        # Only taking the current view needs the lock; concurrent searches then run in parallel
+        with self._lock:
+            view = self._view
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if not view.live or n_results <= 0:
+            for key in results:
+                results[key] = [[] for _ in query_embeddings]
+            return results
+
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        distances = view.distances(queries)
+        # Deleted rows are infinitely far, so the k nearest never include them
+        k = min(n_results, view.live)
+        if k < distances.shape[1]:
+            top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(distances.shape[1]), (len(queries), 1))
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_distances = np.maximum(np.take_along_axis(top_distances, order, axis=1), 0.0)
+
+        for rows, row_distances in zip(top, top_distances):
+            # Only the returned rows are decoded from the shared rows file
+            records = [view.row(i) for i in rows]
+            results["ids"].append([record[0] for record in records])
+            results["documents"].append([record[1] for record in records])
+            results["metadatas"].append([record[2] for record in records])
+            results["distances"].append([float(d) for d in row_distances])
+        return results
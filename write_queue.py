@@ -0,0 +1,171 @@
+"""
+Single-writer queue for multi-worker servers
+
+Several API worker processes can read the same database, but Chroma keeps its
+vector index in process memory, so only one process may write to it. Workers
+put write jobs in a small SQLite table next to the database; whichever worker
+holds the writer lock (an flock on `writer.lock`) applies them in order, and
+the others wait for the result. If the writer exits, its lock is released and
+another worker takes over within about a second.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, run with a single worker
+    fcntl = None
+
+QUEUE_FILE = "write_queue.sqlite3"
+WRITER_LOCK_FILE = "writer.lock"
+
+# Seconds between queue polls (writer) and election attempts (other workers)
+POLL_INTERVAL = 0.05
+ELECTION_INTERVAL = 1.0
+# Finished jobs nobody collected (the submitter timed out) are dropped after this long
+DONE_RETENTION = 3600
+
+
+class WriteQueueError(Exception):
+    """A queued write failed in the writer process or was not applied in time."""
+
+
+class WriteQueue:
+    """SQLite-backed job queue applied by one elected writer process."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.queue_path = os.path.join(db_path, QUEUE_FILE)
+        self.lock_path = os.path.join(db_path, WRITER_LOCK_FILE)
+        self._local = threading.local()
+        self._lock_file = None
+        self._handlers: Dict[str, Callable[[Any], Any]] = {}
+        self._on_elected: Optional[Callable[[], None]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    op TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    result TEXT,
+                    created REAL NOT NULL
+                )""")
+
+    @property
+    def is_writer(self) -> bool:
+        return self._lock_file is not None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.queue_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def start(self, handlers: Dict[str, Callable[[Any], Any]], on_elected: Optional[Callable[[], None]] = None):
+        """
+        Register job handlers (operation name -> function of the JSON payload) and start the
+        background thread that applies jobs while this process is the writer. `on_elected` runs
+        once when this process becomes the writer, before its first job.
+        """
+        self._handlers = dict(handlers)
+        self._on_elected = on_elected
+        self._try_elect()
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop applying jobs and give up the writer lock."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _try_elect(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, "a+")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+        if self._on_elected is not None:
+            try:
+                self._on_elected()
+            except Exception:
+                lock_file.close()
+                raise
+        self._lock_file = lock_file
+        print(f"✍️  Process {os.getpid()} is the database writer")
+        return True
+
+    def _run(self):
+        last_cleanup = 0.0
+        while not self._stop.is_set():
+            try:
+                if not self._try_elect():
+                    self._stop.wait(ELECTION_INTERVAL)
+                    continue
+                if not self._apply_next():
+                    if time.time() - last_cleanup > DONE_RETENTION / 10:
+                        last_cleanup = time.time()
+                        self._connect().execute(
+                            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND created < ?",
+                            (time.time() - DONE_RETENTION,))
+                    self._stop.wait(POLL_INTERVAL)
+            except Exception as e:
+                print(f"⚠️  Write queue error: {e}")
+                self._stop.wait(ELECTION_INTERVAL)
+
+    def _apply_next(self) -> bool:
+        """Apply the oldest pending job; False if there was none."""
+        conn = self._connect()
+        # A job left 'running' by a writer that died is picked up again
+        row = conn.execute("SELECT id, op, payload FROM jobs WHERE status IN ('pending', 'running') "
+                           "ORDER BY id LIMIT 1").fetchone()
+        if row is None:
+            return False
+        job_id, operation, payload = row
+        conn.execute("UPDATE jobs SET status = 'running' WHERE id = ?", (job_id,))
+        try:
+            handler = self._handlers[operation]
+            status, result = "done", handler(json.loads(payload))
+        except Exception as e:
+            status, result = "failed", f"{type(e).__name__}: {e}"
+        conn.execute("UPDATE jobs SET status = ?, result = ? WHERE id = ?",
+                     (status, json.dumps(result), job_id))
+        return True
+
+    def submit(self, operation: str, payload: Any, timeout: float = 60.0) -> Any:
+        """Queue a job and block until the writer has applied it; returns the handler's result."""
+        conn = self._connect()
+        cursor = conn.execute("INSERT INTO jobs (op, payload, created) VALUES (?, ?, ?)",
+                              (operation, json.dumps(payload), time.time()))
+        job_id = cursor.lastrowid
+        deadline = time.monotonic() + timeout
+        while True:
+            status, result = conn.execute("SELECT status, result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if status in ("done", "failed"):
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+                if status == "failed":
+                    raise WriteQueueError(json.loads(result))
+                return json.loads(result)
+            if time.monotonic() > deadline:
+                # Withdraw the job unless the writer already started on it
+                if conn.execute("DELETE FROM jobs WHERE id = ? AND status = 'pending'", (job_id,)).rowcount:
+                    raise WriteQueueError(f"No database writer applied '{operation}' within {timeout:.0f}s")
+                deadline = time.monotonic() + timeout
+            time.sleep(POLL_INTERVAL)